@@ -1,13 +1,21 @@
 """Alembic environment configuration."""
 from __future__ import annotations
 
+import sys
 from logging.config import fileConfig
+from pathlib import Path
 
 from alembic import context
 from sqlalchemy import engine_from_config, pool
 
 from pv.models.base import Base
 
+# Data migrations import their pinned helpers from migration_support.py,
+# which lives next to this file.
+_here = str(Path(__file__).resolve().parent)
+if _here not in sys.path:
+    sys.path.append(_here)
+
 config = context.config
 
 if config.config_file_name is not None:
@@ -0,0 +1,215 @@
+"""Frozen copies of the code the data migrations depend on.
+
+A migration must do the same thing however the application changes later,
+so migrations never import ``pv``: the storage formats they read and the
+derived data they backfill are pinned here as they were when the
+migrations were written.  Never change what a function here returns; a
+migration that needs new behaviour gets a new function.
+
+``env.py`` puts this directory on ``sys.path``; migrations import this
+module inside ``upgrade``/``downgrade``, which only run through it.
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import struct
+import zlib
+from collections import OrderedDict
+from collections.abc import Sequence
+from itertools import groupby, repeat
+
+import sqlalchemy as sa
+
+# ------------------------------------------------------------------
+# Blob payloads: compression (0004) and deltas (0003)
+# ------------------------------------------------------------------
+
+_COPY = 0x00
+_INSERT = 0x01
+
+
+def decompress(data: bytes, codec: str, dictionary: bytes | None = None) -> bytes:
+    """Decompress a ``content_blobs.data`` payload stored with *codec*."""
+    if codec == "none":
+        return data
+    if codec == "zlib":
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+    if codec == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError(
+                "This database holds zstd-compressed blobs; migrating it requires the"
+                " 'zstandard' package (pip install 'prompt-version-control[zstd]')."
+            ) from None
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data)
+    raise ValueError(f"Unknown codec '{codec}'.")
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild the body a delta payload encodes on top of *base*."""
+    base_len, pos = _read_varint(delta, 0)
+    if base_len != len(base):
+        raise ValueError("Delta does not apply: base length mismatch.")
+    target_len, pos = _read_varint(delta, pos)
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op == _COPY:
+            offset, pos = _read_varint(delta, pos)
+            length, pos = _read_varint(delta, pos)
+            out.extend(base[offset : offset + length])
+        elif op == _INSERT:
+            length, pos = _read_varint(delta, pos)
+            out.extend(delta[pos : pos + length])
+            pos += length
+        else:
+            raise ValueError(f"Delta is corrupt: unknown opcode {op:#x}.")
+    if len(out) != target_len:
+        raise ValueError("Delta does not apply: target length mismatch.")
+    return bytes(out)
+
+
+class BlobReader:
+    """Decodes ``content_blobs`` bodies by hash, as stored from 0004 on.
+
+    Backfills visit the versions of a prompt in order, so a delta's base is
+    almost always one of the last few bodies decoded; those are cached.
+    """
+
+    def __init__(self, conn: sa.Connection, cache_size: int = 256) -> None:
+        self._conn = conn
+        self._cache_size = cache_size
+        self._cache: OrderedDict[str, bytes] = OrderedDict()
+        self._dictionaries = dict(
+            conn.execute(sa.text("SELECT id, data FROM compression_dicts")).all()
+        )
+
+    def raw(self, digest: str) -> bytes:
+        """Return the UTF-8 body stored under *digest*."""
+        chain: list[tuple[str, bytes]] = []
+        body: bytes | None = None
+        current: str | None = digest
+        while current is not None:
+            if current in self._cache:
+                self._cache.move_to_end(current)
+                body = self._cache[current]
+                break
+            data, codec, dict_id, base_hash = self._conn.execute(
+                sa.text(
+                    "SELECT data, codec, dict_id, base_hash FROM content_blobs"
+                    " WHERE content_hash = :h"
+                ),
+                {"h": current},
+            ).one()
+            chain.append((current, decompress(data, codec, self._dictionaries.get(dict_id))))
+            current = base_hash
+        for link, payload in reversed(chain):
+            body = payload if body is None else apply_delta(body, payload)
+            self._cache[link] = body
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        assert body is not None
+        return body
+
+    def text(self, digest: str) -> str:
+        """Return the body stored under *digest* as text."""
+        return self.raw(digest).decode("utf-8")
+
+
+# ------------------------------------------------------------------
+# MinHash signatures and LSH bands (0008)
+# ------------------------------------------------------------------
+
+_NUM_BINS = 128
+_BANDS = 16
+_ROWS = _NUM_BINS // _BANDS
+_SHINGLE_SIZE = 5
+_SIGNATURE = struct.Struct(f"<{_NUM_BINS}I")
+_EMPTY = 1 << 32
+_OFFSET = 0x9E3779B1
+
+
+def minhash_signature(content: str) -> bytes | None:
+    """Return the 0008 MinHash signature of *content*, ``None`` if it is blank."""
+    data = " ".join(content.lower().split()).encode("utf-8")
+    if len(data) <= _SHINGLE_SIZE:
+        shingles = {data} if data else set()
+    else:
+        shingles = {data[i : i + _SHINGLE_SIZE] for i in range(len(data) - _SHINGLE_SIZE + 1)}
+    if not shingles:
+        return None
+    digests = sorted(
+        (int.from_bytes(hashlib.blake2b(s, digest_size=8).digest(), "little") for s in shingles),
+        reverse=True,
+    )
+    smallest = {digest % _NUM_BINS: digest >> 32 for digest in digests}
+    bins = [smallest.get(i, _EMPTY) for i in range(_NUM_BINS)]
+    if _EMPTY in bins:
+        source = list(bins)
+        for i in range(_NUM_BINS):
+            distance = 0
+            while source[(i + distance) % _NUM_BINS] == _EMPTY:
+                distance += 1
+            bins[i] = (source[(i + distance) % _NUM_BINS] + distance * _OFFSET) & 0xFFFFFFFF
+    return _SIGNATURE.pack(*bins)
+
+
+def band_buckets(sig: bytes) -> list[int]:
+    """Return the 0008 ``minhash_bands`` bucket of each band of *sig*."""
+    width = _ROWS * 4
+    return [
+        int.from_bytes(
+            hashlib.blake2b(sig[i : i + width], digest_size=8).digest(), "little", signed=True
+        )
+        for i in range(0, len(sig), width)
+    ]
+
+
+# ------------------------------------------------------------------
+# Line-origin maps (0010)
+# ------------------------------------------------------------------
+
+_RUN = struct.Struct("<II")
+
+
+def advance_origins(
+    old_lines: Sequence[str], old_origins: Sequence[int], new_lines: Sequence[str], number: int
+) -> list[int]:
+    """Carry a line-origin map through one edit, attributing new lines to *number*.
+
+    Uses :mod:`difflib` rather than the application's differ: any correct
+    line diff yields a valid map, and this one cannot change under us.
+    """
+    if not old_lines:
+        return [number] * len(new_lines)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    origins: list[int] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            origins.extend(old_origins[i1:i2])
+        else:
+            origins.extend(repeat(number, j2 - j1))
+    return origins
+
+
+def encode_origins(origins: Sequence[int]) -> bytes:
+    """Run-length encode a line-origin map as ``(origin, count)`` uint32 pairs."""
+    return b"".join(_RUN.pack(number, len(list(run))) for number, run in groupby(origins))
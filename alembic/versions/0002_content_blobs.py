@@ -0,0 +1,68 @@
+"""content-addressed blob store
+
+Moves prompt bodies out of ``prompt_versions.content`` into a
+``content_blobs`` table keyed by ``content_hash`` so identical bodies are
+stored once.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-06-01 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "content_blobs",
+        sa.Column("content_hash", sa.String(64), primary_key=True),
+        sa.Column("data", sa.LargeBinary, nullable=False),
+        sa.Column("size", sa.Integer, nullable=False),
+    )
+    # Rows sharing a hash share a body, so any one of them can seed the blob.
+    op.execute(
+        """
+        INSERT INTO content_blobs (content_hash, data, size)
+        SELECT content_hash, CAST(content AS BLOB), length(CAST(content AS BLOB))
+        FROM prompt_versions
+        GROUP BY content_hash
+        """
+    )
+    with op.batch_alter_table("prompt_versions") as batch_op:
+        batch_op.drop_column("content")
+        batch_op.create_index("ix_prompt_versions_content_hash", ["content_hash"])
+        batch_op.create_foreign_key(
+            "fk_prompt_versions_content_hash",
+            "content_blobs",
+            ["content_hash"],
+            ["content_hash"],
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("prompt_versions") as batch_op:
+        batch_op.add_column(sa.Column("content", sa.Text, nullable=False, server_default=""))
+    op.execute(
+        """
+        UPDATE prompt_versions
+        SET content = (
+            SELECT CAST(data AS TEXT) FROM content_blobs
+            WHERE content_blobs.content_hash = prompt_versions.content_hash
+        )
+        """
+    )
+    with op.batch_alter_table("prompt_versions") as batch_op:
+        batch_op.drop_constraint("fk_prompt_versions_content_hash", type_="foreignkey")
+        batch_op.drop_index("ix_prompt_versions_content_hash")
+        batch_op.alter_column("content", server_default=None)
+    op.drop_table("content_blobs")
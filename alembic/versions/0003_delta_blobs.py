@@ -0,0 +1,69 @@
+"""delta-encoded content blobs
+
+Lets a content blob be stored as a delta against another blob.  ``depth``
+counts the deltas back to the nearest full keyframe.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-06-15 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("content_blobs") as batch_op:
+        batch_op.add_column(sa.Column("base_hash", sa.String(64), nullable=True))
+        batch_op.add_column(
+            sa.Column("depth", sa.Integer, nullable=False, server_default="0")
+        )
+        batch_op.create_index("ix_content_blobs_base_hash", ["base_hash"])
+        batch_op.create_foreign_key(
+            "fk_content_blobs_base_hash",
+            "content_blobs",
+            ["base_hash"],
+            ["content_hash"],
+        )
+
+
+def downgrade() -> None:
+    from migration_support import apply_delta
+
+    # Expand every delta back into a full body, shallowest first so each
+    # base is already whole by the time its dependents are rewritten.
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.text(
+            "SELECT content_hash, base_hash FROM content_blobs "
+            "WHERE base_hash IS NOT NULL ORDER BY depth"
+        )
+    ).fetchall()
+    for digest, base_hash in rows:
+        base = conn.execute(
+            sa.text("SELECT data FROM content_blobs WHERE content_hash = :h"), {"h": base_hash}
+        ).scalar_one()
+        delta = conn.execute(
+            sa.text("SELECT data FROM content_blobs WHERE content_hash = :h"), {"h": digest}
+        ).scalar_one()
+        conn.execute(
+            sa.text(
+                "UPDATE content_blobs SET data = :data, base_hash = NULL, depth = 0 "
+                "WHERE content_hash = :h"
+            ),
+            {"data": apply_delta(base, delta), "h": digest},
+        )
+    with op.batch_alter_table("content_blobs") as batch_op:
+        batch_op.drop_constraint("fk_content_blobs_base_hash", type_="foreignkey")
+        batch_op.drop_index("ix_content_blobs_base_hash")
+        batch_op.drop_column("depth")
+        batch_op.drop_column("base_hash")
@@ -0,0 +1,59 @@
+"""compressed content blobs with shared dictionaries
+
+Adds a ``codec`` and optional ``dict_id`` to each content blob, plus a
+``compression_dicts`` table holding trained dictionaries.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-07-01 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "compression_dicts",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("codec", sa.String(16), nullable=False),
+        sa.Column("data", sa.LargeBinary, nullable=False),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now(), nullable=False),
+    )
+    with op.batch_alter_table("content_blobs") as batch_op:
+        batch_op.add_column(
+            sa.Column("codec", sa.String(16), nullable=False, server_default="none")
+        )
+        batch_op.add_column(sa.Column("dict_id", sa.Integer, nullable=True))
+        batch_op.create_foreign_key(
+            "fk_content_blobs_dict_id", "compression_dicts", ["dict_id"], ["id"]
+        )
+
+
+def downgrade() -> None:
+    from migration_support import decompress
+
+    conn = op.get_bind()
+    dictionaries = dict(conn.execute(sa.text("SELECT id, data FROM compression_dicts")).all())
+    rows = conn.execute(
+        sa.text("SELECT content_hash, data, codec, dict_id FROM content_blobs WHERE codec != 'none'")
+    ).fetchall()
+    for digest, data, codec, dict_id in rows:
+        conn.execute(
+            sa.text("UPDATE content_blobs SET data = :data WHERE content_hash = :h"),
+            {"data": decompress(data, codec, dictionaries.get(dict_id)), "h": digest},
+        )
+    with op.batch_alter_table("content_blobs") as batch_op:
+        batch_op.drop_constraint("fk_content_blobs_dict_id", type_="foreignkey")
+        batch_op.drop_column("dict_id")
+        batch_op.drop_column("codec")
+    op.drop_table("compression_dicts")
@@ -0,0 +1,55 @@
+"""unique version numbers per prompt
+
+Adds a unique ``(prompt_id, version_number)`` index.  It serves the
+next-version lookup in ``add_version`` and makes a concurrent writer that
+picked an already-used number fail instead of creating a duplicate.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-07-15 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Earlier racing writers may already have produced duplicates.  The
+    # oldest row keeps its number; the others move to the end of the history.
+    conn = op.get_bind()
+    duplicates = conn.execute(
+        sa.text(
+            "SELECT v.id, v.prompt_id FROM prompt_versions v "
+            "JOIN prompt_versions w ON w.prompt_id = v.prompt_id "
+            "AND w.version_number = v.version_number AND w.id < v.id "
+            "GROUP BY v.id ORDER BY v.id"
+        )
+    ).fetchall()
+    for version_id, prompt_id in duplicates:
+        conn.execute(
+            sa.text(
+                "UPDATE prompt_versions SET version_number = ("
+                "SELECT max(version_number) + 1 FROM prompt_versions WHERE prompt_id = :p"
+                ") WHERE id = :v"
+            ),
+            {"p": prompt_id, "v": version_id},
+        )
+    op.create_index(
+        "uq_prompt_versions_prompt_version",
+        "prompt_versions",
+        ["prompt_id", "version_number"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_prompt_versions_prompt_version", table_name="prompt_versions")
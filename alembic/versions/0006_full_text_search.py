@@ -0,0 +1,86 @@
+"""full-text search indexes
+
+Adds two FTS5 tables.  ``note_fts`` indexes ``prompt_versions.note`` as an
+external-content table kept current by triggers.  ``content_fts`` is
+contentless and keyed by version id: bodies are stored compressed or as
+deltas, which SQL cannot read, so the application feeds it and this
+migration backfills it by decoding every existing version.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-08-01 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TOKENIZE = "tokenize='unicode61 remove_diacritics 2'"
+_TRIGGERS = (
+    "prompt_versions_note_fts_insert",
+    "prompt_versions_note_fts_delete",
+    "prompt_versions_note_fts_update",
+)
+_BATCH = 500
+
+
+def upgrade() -> None:
+    op.execute(f"CREATE VIRTUAL TABLE content_fts USING fts5(content, content='', {_TOKENIZE})")
+    op.execute(
+        "CREATE VIRTUAL TABLE note_fts USING fts5("
+        f"note, content='prompt_versions', content_rowid='id', {_TOKENIZE})"
+    )
+    op.execute(
+        "CREATE TRIGGER prompt_versions_note_fts_insert"
+        " AFTER INSERT ON prompt_versions WHEN new.note IS NOT NULL BEGIN"
+        " INSERT INTO note_fts(rowid, note) VALUES (new.id, new.note); END"
+    )
+    op.execute(
+        "CREATE TRIGGER prompt_versions_note_fts_delete"
+        " AFTER DELETE ON prompt_versions WHEN old.note IS NOT NULL BEGIN"
+        " INSERT INTO note_fts(note_fts, rowid, note) VALUES ('delete', old.id, old.note); END"
+    )
+    op.execute(
+        "CREATE TRIGGER prompt_versions_note_fts_update"
+        " AFTER UPDATE OF note ON prompt_versions BEGIN"
+        " INSERT INTO note_fts(note_fts, rowid, note)"
+        " SELECT 'delete', old.id, old.note WHERE old.note IS NOT NULL;"
+        " INSERT INTO note_fts(rowid, note) SELECT new.id, new.note WHERE new.note IS NOT NULL;"
+        " END"
+    )
+    op.execute("INSERT INTO note_fts(note_fts) VALUES ('rebuild')")
+    _backfill_content(op.get_bind())
+
+
+def _backfill_content(conn: sa.Connection) -> None:
+    from migration_support import BlobReader
+
+    blobs = BlobReader(conn)
+
+    versions = conn.execute(
+        sa.text("SELECT id, content_hash FROM prompt_versions ORDER BY prompt_id, version_number")
+    ).fetchall()
+    insert = sa.text("INSERT INTO content_fts(rowid, content) VALUES (:id, :content)")
+    for start in range(0, len(versions), _BATCH):
+        conn.execute(
+            insert,
+            [
+                {"id": version_id, "content": blobs.text(digest)}
+                for version_id, digest in versions[start : start + _BATCH]
+            ],
+        )
+
+
+def downgrade() -> None:
+    for trigger in _TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS note_fts")
+    op.execute("DROP TABLE IF EXISTS content_fts")
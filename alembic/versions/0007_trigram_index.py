@@ -0,0 +1,54 @@
+"""trigram index for substring and regex search
+
+Adds ``content_trigram``, a contentless FTS5 table using the trigram
+tokenizer and keyed by version id, and backfills it by decoding every
+existing version like 0006 does for ``content_fts``.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-08-15 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_BATCH = 500
+
+
+def upgrade() -> None:
+    op.execute(
+        "CREATE VIRTUAL TABLE content_trigram USING fts5(content, content='', tokenize='trigram')"
+    )
+    _backfill(op.get_bind())
+
+
+def _backfill(conn: sa.Connection) -> None:
+    from migration_support import BlobReader
+
+    blobs = BlobReader(conn)
+
+    versions = conn.execute(
+        sa.text("SELECT id, content_hash FROM prompt_versions ORDER BY prompt_id, version_number")
+    ).fetchall()
+    insert = sa.text("INSERT INTO content_trigram(rowid, content) VALUES (:id, :content)")
+    for start in range(0, len(versions), _BATCH):
+        conn.execute(
+            insert,
+            [
+                {"id": version_id, "content": blobs.text(digest)}
+                for version_id, digest in versions[start : start + _BATCH]
+            ],
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS content_trigram")
@@ -0,0 +1,89 @@
+"""minhash signatures and LSH band index
+
+Adds ``content_blobs.minhash`` and the ``minhash_bands`` table, one row per
+band of each signature, then computes signatures for existing blobs.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-09-01 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_BATCH = 500
+
+
+def upgrade() -> None:
+    op.add_column("content_blobs", sa.Column("minhash", sa.LargeBinary, nullable=True))
+    op.create_table(
+        "minhash_bands",
+        sa.Column("band", sa.Integer, primary_key=True),
+        sa.Column("bucket", sa.Integer, primary_key=True),
+        sa.Column(
+            "content_hash",
+            sa.String(64),
+            sa.ForeignKey("content_blobs.content_hash", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sqlite_with_rowid=False,
+    )
+    op.create_index("ix_minhash_bands_content_hash", "minhash_bands", ["content_hash"])
+    _backfill(op.get_bind())
+
+
+def _backfill(conn: sa.Connection) -> None:
+    from migration_support import BlobReader, band_buckets, minhash_signature
+
+    blobs = BlobReader(conn)
+
+    # Blobs in version order first, so delta bases are usually cached, then
+    # any blob only kept as a base.
+    digests = dict.fromkeys(
+        conn.execute(
+            sa.text("SELECT content_hash FROM prompt_versions ORDER BY prompt_id, version_number")
+        ).scalars()
+    )
+    digests.update(
+        dict.fromkeys(conn.execute(sa.text("SELECT content_hash FROM content_blobs")).scalars())
+    )
+    ordered = list(digests)
+    for start in range(0, len(ordered), _BATCH):
+        signatures = [
+            (digest, sig)
+            for digest in ordered[start : start + _BATCH]
+            if (sig := minhash_signature(blobs.text(digest))) is not None
+        ]
+        if not signatures:
+            continue
+        conn.execute(
+            sa.text("UPDATE content_blobs SET minhash = :sig WHERE content_hash = :h"),
+            [{"sig": sig, "h": digest} for digest, sig in signatures],
+        )
+        conn.execute(
+            sa.text(
+                "INSERT INTO minhash_bands (band, bucket, content_hash)"
+                " VALUES (:band, :bucket, :h)"
+            ),
+            [
+                {"band": band, "bucket": bucket, "h": digest}
+                for digest, sig in signatures
+                for band, bucket in enumerate(band_buckets(sig))
+            ],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_minhash_bands_content_hash", table_name="minhash_bands")
+    op.drop_table("minhash_bands")
+    with op.batch_alter_table("content_blobs") as batch_op:
+        batch_op.drop_column("minhash")
@@ -0,0 +1,53 @@
+"""diff cache
+
+Adds ``diff_cache``, which holds compressed diff hunks between two content
+blobs for each algorithm and context size.  It starts empty.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-09-15 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "diff_cache",
+        sa.Column(
+            "hash_a",
+            sa.String(64),
+            sa.ForeignKey("content_blobs.content_hash", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "hash_b",
+            sa.String(64),
+            sa.ForeignKey("content_blobs.content_hash", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("algorithm", sa.String(16), primary_key=True),
+        sa.Column("context", sa.Integer, primary_key=True),
+        sa.Column("codec", sa.String(16), nullable=False),
+        sa.Column("data", sa.LargeBinary, nullable=False),
+        sa.Column("size", sa.Integer, nullable=False),
+        sa.Column("used_at", sa.Float, nullable=False),
+    )
+    op.create_index("ix_diff_cache_hash_b", "diff_cache", ["hash_b"])
+    op.create_index("ix_diff_cache_used_at", "diff_cache", ["used_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_diff_cache_used_at", table_name="diff_cache")
+    op.drop_index("ix_diff_cache_hash_b", table_name="diff_cache")
+    op.drop_table("diff_cache")
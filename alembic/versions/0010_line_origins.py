@@ -0,0 +1,72 @@
+"""line-origin maps for blame
+
+Adds ``line_origins``, one run-length encoded map per version giving the
+version that introduced each line, and builds the maps by replaying every
+prompt's history once.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2024-10-01 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_BATCH = 500
+
+
+def upgrade() -> None:
+    op.create_table(
+        "line_origins",
+        sa.Column(
+            "version_id",
+            sa.Integer,
+            sa.ForeignKey("prompt_versions.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("data", sa.LargeBinary, nullable=False),
+    )
+    _backfill(op.get_bind())
+
+
+def _backfill(conn: sa.Connection) -> None:
+    from migration_support import BlobReader, advance_origins, encode_origins
+
+    blobs = BlobReader(conn)
+
+    versions = conn.execute(
+        sa.text(
+            "SELECT id, prompt_id, version_number, content_hash FROM prompt_versions"
+            " ORDER BY prompt_id, version_number"
+        )
+    ).fetchall()
+    insert = sa.text("INSERT INTO line_origins (version_id, data) VALUES (:id, :data)")
+    pending = []
+    prompt_id = None
+    lines: list[str] = []
+    origins: list[int] = []
+    for version_id, owner, number, digest in versions:
+        if owner != prompt_id:
+            prompt_id, lines, origins = owner, [], []
+        new_lines = blobs.text(digest).splitlines()
+        origins = advance_origins(lines, origins, new_lines, number)
+        lines = new_lines
+        pending.append({"id": version_id, "data": encode_origins(origins)})
+        if len(pending) >= _BATCH:
+            conn.execute(insert, pending)
+            pending = []
+    if pending:
+        conn.execute(insert, pending)
+
+
+def downgrade() -> None:
+    op.drop_table("line_origins")
@@ -0,0 +1,31 @@
+"""tag to version index
+
+Adds a ``(tag_id, version_id)`` index on ``prompt_version_tags``.  The
+composite primary key is ``(version_id, tag_id)`` and only serves lookups
+by version; resolving a tag to the versions carrying it needs the reverse.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2024-10-15 00:00:00.000000
+
+"""
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_prompt_version_tags_tag_version", "prompt_version_tags", ["tag_id", "version_id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_prompt_version_tags_tag_version", table_name="prompt_version_tags")
@@ -0,0 +1,26 @@
+"""Entry point for the ``pv`` script and ``python -m pv``.
+
+Commands a running ``pv daemon`` can serve are forwarded to it before the
+CLI module (and typer with it) is imported at all.
+"""
+
+from __future__ import annotations
+
+import sys
+
+
+def main() -> None:
+    """Forward to a running daemon when possible, otherwise run the CLI."""
+    from pv.daemon import forward
+
+    exit_code = forward(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+    from pv.cli import app
+
+    app(prog_name="pv")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,29 @@
-"""pv - prompt version control CLI."""
+"""pv - prompt version control CLI.
+
+Only typer is imported up front.  SQLAlchemy, the service layer and Rich's
+console/table machinery are imported inside the commands that use them, so
+``pv --version`` and ``pv --help`` never load them and read commands skip
+whatever they do not need.
+"""
 
 from __future__ import annotations
 
 import sys
 from pathlib import Path
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated
 
 import typer
 from rich import print as rprint
-from rich.console import Console
-from rich.table import Table
-from sqlalchemy.orm import Session
 
 from pv import __version__
-from pv.config import default_db_path
-from pv.database import get_session_factory, init_db, reset_engine
-from pv.services.prompt_service import PromptService
+
+if TYPE_CHECKING:
+    from rich.console import Console
+    from rich.text import Text
+    from sqlalchemy.orm import Session, sessionmaker
+
+    from pv.diffing import TokenDiff
+    from pv.services.prompt_service import PromptService
 
 
 def _version_callback(value: bool) -> None:
@@ -47,7 +55,12 @@ def main(
     """prompt-version-control: version your prompts locally."""
 
 
-console = Console()
+def _console() -> Console:
+    # The global console shared with rprint, so ``pv daemon`` can redirect both.
+    from rich import get_console
+
+    return get_console()
+
 
 DbOption = Annotated[
     Path | None,
@@ -56,17 +69,74 @@ DbOption = Annotated[
 
 
 def _db_path(db: Path | None) -> Path:
-    return db if db is not None else default_db_path()
+    if db is not None:
+        return db
+    from pv.config import default_db_path
+
+    return default_db_path()
+
+
+# Set while ``pv daemon`` is serving: its session factory is reused by every
+# command instead of building a new engine per call.
+_warm: sessionmaker[Session] | None = None
+
+
+def enter_warm_mode(factory: sessionmaker[Session]) -> None:
+    """Make commands reuse *factory* rather than opening the database themselves."""
+    global _warm
+    _warm = factory
+
+
+def leave_warm_mode() -> None:
+    """Undo :func:`enter_warm_mode`."""
+    global _warm
+    _warm = None
 
 
 def _get_service(db: Path | None) -> tuple[PromptService, Session]:
     """Return (service, session) after ensuring the database exists."""
+    from pv.config import storage_settings
+    from pv.services.prompt_service import PromptService
+
+    if _warm is not None:
+        # The daemon socket is keyed by database path, so *db* is its database.
+        # Settings are still read per command: the daemon applies the client's
+        # environment around each request.
+        session = _warm()
+        return PromptService(session, storage_settings()), session
+
+    from pv.database import get_session_factory, init_db, reset_engine
+
     path = _db_path(db)
     reset_engine()
     init_db(path)
     factory = get_session_factory(path)
     session = factory()
-    return PromptService(session), session
+    return PromptService(session, storage_settings()), session
+
+
+def _begin_write(session: Session) -> int:
+    """Take the write lock for *session*'s transaction; return the retries it took."""
+    from pv.config import write_settings
+    from pv.database import begin_write
+
+    return begin_write(session, write_settings())
+
+
+def _report_retries(retries: int) -> None:
+    # On stderr, so it never mixes into JSON output.
+    if retries:
+        noun = "retry" if retries == 1 else "retries"
+        typer.echo(f"Database was busy: took the write lock after {retries} {noun}.", err=True)
+
+
+def _close(session: Session) -> None:
+    """Close *session* and dispose of the engine opened by :func:`_get_service`."""
+    from pv.database import reset_engine
+
+    session.close()
+    if _warm is None:
+        reset_engine()
 
 
 # ------------------------------------------------------------------
@@ -77,6 +147,8 @@ def _get_service(db: Path | None) -> tuple[PromptService, Session]:
 @app.command()
 def init(db: DbOption = None) -> None:
     """Initialize the pv database."""
+    from pv.database import init_db, reset_engine
+
     path = _db_path(db)
     reset_engine()
     init_db(path)
@@ -126,8 +198,10 @@ def add(
 
     service, session = _get_service(db)
     try:
+        retries = _begin_write(session)
         version = service.add_version(name, content, tags=tag or [], note=note)
         session.commit()
+        _report_retries(retries)
         rprint(
             f"[green]✓[/green] Added [bold]{name}[/bold] v{version.version_number}"
             f" (hash: {version.content_hash[:12]}…)"
@@ -137,8 +211,80 @@ def add(
         rprint(f"[red]Error:[/red] {exc}")
         raise typer.Exit(1) from None
     finally:
-        session.close()
-        reset_engine()
+        _close(session)
+
+
+# ------------------------------------------------------------------
+# add-many
+# ------------------------------------------------------------------
+
+
+@app.command("add-many")
+def add_many(
+    file: Annotated[
+        str,
+        typer.Argument(help="JSONL file of {name, content, tags, note} records, or - for stdin."),
+    ] = "-",
+    as_json: Annotated[bool, typer.Option("--json", help="Print results as JSON lines.")] = False,
+    db: DbOption = None,
+) -> None:
+    """Add many prompt versions from JSON lines in one transaction.
+
+    Valid records are committed together; invalid ones are reported and
+    skipped, and the command exits with status 1 if there were any.
+    """
+    import contextlib
+
+    with contextlib.ExitStack() as stack:
+        try:
+            stream = (
+                sys.stdin if file == "-" else stack.enter_context(open(file, encoding="utf-8"))
+            )
+        except OSError as exc:
+            rprint(f"[red]Error:[/red] Cannot read {file}: {exc.strerror}")
+            raise typer.Exit(1) from None
+
+        service, session = _get_service(db)
+        try:
+            retries = _begin_write(session)
+            results = service.add_many(stream)
+            session.commit()
+            _report_retries(retries)
+        except ValueError as exc:
+            session.rollback()
+            rprint(f"[red]Error:[/red] {exc}")
+            raise typer.Exit(1) from None
+        finally:
+            _close(session)
+
+    failed = sum(not result.ok for result in results)
+    if as_json:
+        import json
+        from dataclasses import asdict
+
+        for result in results:
+            sys.stdout.write(json.dumps(asdict(result)) + "\n")
+    else:
+        from rich.table import Table
+
+        table = Table(title="Added")
+        table.add_column("#", justify="right")
+        table.add_column("Name", style="bold")
+        table.add_column("Version", justify="right")
+        table.add_column("Result")
+        for result in results:
+            table.add_row(
+                str(result.index),
+                result.name or "",
+                f"v{result.version_number}" if result.ok else "",
+                f"[green]✓[/green] {result.content_hash[:12]}…"
+                if result.ok and result.content_hash
+                else f"[red]{result.error}[/red]",
+            )
+        _console().print(table)
+        rprint(f"{len(results) - failed} added, {failed} failed")
+    if failed:
+        raise typer.Exit(1)
 
 
 # ------------------------------------------------------------------
@@ -156,43 +302,40 @@ def list_prompts(
 
     service, session = _get_service(db)
     try:
-        prompts = service.list_prompts()
-        if not prompts:
+        summaries = service.list_prompt_summaries()
+        if not summaries:
             rprint("[dim]No prompts found.[/dim]")
             return
 
         if json_output:
-            data = []
-            for p in prompts:
-                versions = service.list_versions(p.name)
-                data.append(
-                    {
-                        "name": p.name,
-                        "versions": len(versions),
-                        "latest": versions[-1].version_number if versions else None,
-                        "created_at": p.created_at.isoformat() if p.created_at else None,
-                    }
-                )
+            data = [
+                {
+                    "name": s.name,
+                    "versions": s.versions,
+                    "latest": s.latest,
+                    "created_at": s.created_at.isoformat() if s.created_at else None,
+                }
+                for s in summaries
+            ]
             rprint(json.dumps(data, indent=2))
         else:
+            from rich.table import Table
+
             table = Table(title="Prompts")
             table.add_column("Name", style="cyan")
             table.add_column("Versions", justify="right")
             table.add_column("Latest", justify="right")
             table.add_column("Created", style="dim")
-            for p in prompts:
-                versions = service.list_versions(p.name)
-                latest = str(versions[-1].version_number) if versions else "-"
+            for s in summaries:
                 table.add_row(
-                    p.name,
-                    str(len(versions)),
-                    latest,
-                    str(p.created_at.strftime("%Y-%m-%d %H:%M")) if p.created_at else "",
+                    s.name,
+                    str(s.versions),
+                    str(s.latest) if s.latest is not None else "-",
+                    str(s.created_at.strftime("%Y-%m-%d %H:%M")) if s.created_at else "",
                 )
-            console.print(table)
+            _console().print(table)
     finally:
-        session.close()
-        reset_engine()
+        _close(session)
 
 
 # ------------------------------------------------------------------
@@ -229,6 +372,8 @@ def log(
             ]
             rprint(json.dumps(data, indent=2))
         else:
+            from rich.table import Table
+
             table = Table(title=f"Versions of '{name}'")
             table.add_column("Version", justify="right", style="cyan")
             table.add_column("Hash", style="dim")
@@ -243,13 +388,12 @@ def log(
                     v.note or "-",
                     v.created_at.strftime("%Y-%m-%d %H:%M") if v.created_at else "",
                 )
-            console.print(table)
+            _console().print(table)
     except ValueError as exc:
         rprint(f"[red]Error:[/red] {exc}")
         raise typer.Exit(1) from None
     finally:
-        session.close()
-        reset_engine()
+        _close(session)
 
 
 # ------------------------------------------------------------------
@@ -264,16 +408,25 @@ def show(
         int | None,
         typer.Option("--version", "-v", help="Version number (default: latest)."),
     ] = None,
+    tag: Annotated[
+        str | None, typer.Option("--tag", "-t", help="Show the latest version with this tag.")
+    ] = None,
     db: DbOption = None,
     json_output: Annotated[bool, typer.Option("--json", help="Output as JSON.")] = False,
 ) -> None:
     """Show the content of a prompt version."""
     import json
 
+    if version is not None and tag is not None:
+        rprint("[red]Error:[/red] Use --version or --tag, not both.")
+        raise typer.Exit(1) from None
+
     service, session = _get_service(db)
     try:
         if version is not None:
             ver = service.get_version(name, version)
+        elif tag is not None:
+            ver = service.get_tagged_version(name, tag)
         else:
             ver = service.get_latest_version(name)
 
@@ -301,8 +454,7 @@ def show(
         rprint(f"[red]Error:[/red] {exc}")
         raise typer.Exit(1) from None
     finally:
-        session.close()
-        reset_engine()
+        _close(session)
 
 
 # ------------------------------------------------------------------
@@ -313,14 +465,62 @@ def show(
 @app.command()
 def diff(
     name: Annotated[str, typer.Argument(help="Prompt name")],
-    v1: Annotated[int, typer.Argument(help="First version number")],
-    v2: Annotated[int, typer.Argument(help="Second version number")],
+    v1: Annotated[str, typer.Argument(help="First version: a number or a tag")],
+    v2: Annotated[str, typer.Argument(help="Second version: a number or a tag")],
+    algorithm: Annotated[
+        str | None,
+        typer.Option(
+            "--algorithm",
+            "-a",
+            help="myers, linear, patience, histogram or difflib (default from config)",
+        ),
+    ] = None,
+    granularity: Annotated[
+        str,
+        typer.Option(
+            "--granularity",
+            "-g",
+            help="line (unified diff), or word, char or token (inline changes)",
+        ),
+    ] = "line",
+    context: Annotated[
+        int, typer.Option("--context", "-U", help="Lines of context in unified diffs.")
+    ] = 3,
+    json_output: Annotated[bool, typer.Option("--json", help="Output opcodes as JSON.")] = False,
     db: DbOption = None,
 ) -> None:
-    """Show a unified diff between two versions of a prompt."""
+    """Show the differences between two versions of a prompt.
+
+    Each version is a version number or a tag, which selects the latest
+    version carrying it.
+    """
+    import json
+    from dataclasses import replace
+
+    from pv.config import diff_settings
+
     service, session = _get_service(db)
     try:
-        result = service.diff_versions(name, v1, v2)
+        old = service.resolve_version(name, v1).version_number
+        new = service.resolve_version(name, v2).version_number
+        settings = diff_settings()
+        if algorithm is not None:
+            settings = replace(settings, algorithm=algorithm)
+        if json_output or granularity != "line":
+            changes = service.diff_tokens(name, old, new, granularity, settings)
+            if json_output:
+                rprint(
+                    json.dumps(
+                        {"name": name, "from": old, "to": new, **changes.to_dict()}, indent=2
+                    )
+                )
+            elif all(op[0] == "equal" for op in changes.opcodes):
+                rprint("[dim]No differences.[/dim]")
+            else:
+                _console().print(_inline_diff(changes), soft_wrap=True, highlight=False)
+            return
+        result = service.diff_versions(name, old, new, settings, context)
+        session.commit()
         if not result:
             rprint("[dim]No differences.[/dim]")
         else:
@@ -340,8 +540,358 @@ def diff(
         rprint(f"[red]Error:[/red] {exc}")
         raise typer.Exit(1) from None
     finally:
-        session.close()
-        reset_engine()
+        _close(session)
+
+
+def _inline_diff(changes: TokenDiff, context: int = 3) -> Text:
+    """Render *changes* as one text: deletions struck out in red, insertions in green.
+
+    Unchanged stretches keep *context* lines next to each change and elide
+    the rest.
+    """
+    from rich.text import Text
+
+    out = Text()
+    chunks = list(changes.chunks())
+    for index, (tag, old, new) in enumerate(chunks):
+        if tag != "equal":
+            out.append(old, "red strike")
+            out.append(new, "bold green")
+            continue
+        lines = old.split("\n")
+        head = lines[: context + 1] if index > 0 else []
+        tail = lines[-context - 1 :] if index < len(chunks) - 1 else []
+        if len(lines) <= len(head) + len(tail):
+            out.append(old)
+            continue
+        if head:
+            out.append("\n".join(head) + "\n")
+        out.append("⋯", "dim")
+        if tail:
+            out.append("\n" + "\n".join(tail))
+    return out
+
+
+# ------------------------------------------------------------------
+# blame
+# ------------------------------------------------------------------
+
+
+@app.command()
+def blame(
+    name: Annotated[str, typer.Argument(help="Prompt name")],
+    version: Annotated[
+        int | None,
+        typer.Option("--version", "-v", help="Version number (default: latest)."),
+    ] = None,
+    json_output: Annotated[bool, typer.Option("--json", help="Output as JSON.")] = False,
+    db: DbOption = None,
+) -> None:
+    """Show which version introduced each line of a prompt version."""
+    import json
+
+    service, session = _get_service(db)
+    try:
+        lines = service.blame(name, version)
+        session.commit()
+        if json_output:
+            data = [
+                {
+                    "line_number": b.line_number,
+                    "version": b.version_number,
+                    "created_at": b.created_at.isoformat() if b.created_at else None,
+                    "line": b.line,
+                }
+                for b in lines
+            ]
+            rprint(json.dumps(data, indent=2))
+            return
+
+        from rich.text import Text
+
+        console = _console()
+        width = len(f"v{max((b.version_number for b in lines), default=0)}")
+        for b in lines:
+            created = b.created_at.strftime("%Y-%m-%d") if b.created_at else "?"
+            prefix = Text.assemble(
+                (f"v{b.version_number}".ljust(width), "magenta"),
+                " ",
+                (created, "dim"),
+                " ",
+                (f"{b.line_number:>4} ", "dim"),
+            )
+            console.print(prefix + Text(b.line), soft_wrap=True, highlight=False)
+    except ValueError as exc:
+        rprint(f"[red]Error:[/red] {exc}")
+        raise typer.Exit(1) from None
+    finally:
+        _close(session)
+
+
+# ------------------------------------------------------------------
+# find
+# ------------------------------------------------------------------
+
+
+@app.command()
+def find(
+    tags: Annotated[
+        list[str] | None,
+        typer.Option(
+            "--tag",
+            "-t",
+            help="Versions must carry this tag (repeatable; put the rarest first).",
+        ),
+    ] = None,
+    any_tags: Annotated[
+        list[str] | None,
+        typer.Option("--any-tag", help="Versions must carry at least one of these (repeatable)."),
+    ] = None,
+    latest_only: Annotated[
+        bool,
+        typer.Option("--latest", "--latest-only", help="Only match each prompt's latest version."),
+    ] = False,
+    prefix: Annotated[
+        str | None, typer.Option("--prefix", help="Only prompts whose name starts with this.")
+    ] = None,
+    db: DbOption = None,
+    json_output: Annotated[bool, typer.Option("--json", help="Output as JSON.")] = False,
+) -> None:
+    """List the versions matching tag and name filters."""
+    import json
+
+    service, session = _get_service(db)
+    try:
+        found = service.find_versions(
+            tags_all=tags or (),
+            tags_any=any_tags or (),
+            latest_only=latest_only,
+            name_prefix=prefix,
+        )
+        if json_output:
+            data = [
+                {
+                    "name": f.name,
+                    "version": f.version_number,
+                    "tags": list(f.tags),
+                    "created_at": f.created_at.isoformat() if f.created_at else None,
+                }
+                for f in found
+            ]
+            rprint(json.dumps(data, indent=2))
+        elif not found:
+            rprint("[dim]No matches.[/dim]")
+        else:
+            from rich.table import Table
+
+            table = Table(title="Versions")
+            table.add_column("Name", style="cyan")
+            table.add_column("Version", justify="right")
+            table.add_column("Tags", style="yellow")
+            table.add_column("Created", style="dim")
+            for f in found:
+                table.add_row(
+                    f.name,
+                    str(f.version_number),
+                    ", ".join(f.tags),
+                    f.created_at.strftime("%Y-%m-%d %H:%M") if f.created_at else "",
+                )
+            _console().print(table)
+    finally:
+        _close(session)
+
+
+# ------------------------------------------------------------------
+# search
+# ------------------------------------------------------------------
+
+
+@app.command()
+def search(
+    query: Annotated[str, typer.Argument(help="Search terms (FTS5 query syntax).")],
+    latest_only: Annotated[
+        bool, typer.Option("--latest-only", help="Only match each prompt's latest version.")
+    ] = False,
+    tags: Annotated[
+        list[str] | None,
+        typer.Option("--tag", "-t", help="Only match versions with this tag (repeatable)."),
+    ] = None,
+    limit: Annotated[int, typer.Option("--limit", "-n", min=1, help="Maximum hits.")] = 20,
+    db: DbOption = None,
+    json_output: Annotated[bool, typer.Option("--json", help="Output as JSON.")] = False,
+) -> None:
+    """Full-text search over version contents and notes, best matches first."""
+    import json
+
+    service, session = _get_service(db)
+    try:
+        hits = service.search(query, latest_only=latest_only, tags=tags or (), limit=limit)
+        if json_output:
+            data = [
+                {
+                    "name": hit.name,
+                    "version": hit.version_number,
+                    "score": round(hit.score, 4),
+                    "field": hit.field,
+                    "snippet": hit.snippet,
+                }
+                for hit in hits
+            ]
+            rprint(json.dumps(data, indent=2))
+        elif not hits:
+            rprint("[dim]No matches.[/dim]")
+        else:
+            from rich.table import Table
+            from rich.text import Text
+
+            from pv.services.search import query_terms
+
+            words = query_terms(query)
+            table = Table(title=f"Search: {query}")
+            table.add_column("Name", style="cyan")
+            table.add_column("Version", justify="right")
+            table.add_column("Score", justify="right", style="dim")
+            table.add_column("Match")
+            for hit in hits:
+                snippet = Text(hit.snippet, style="dim italic" if hit.field == "note" else "")
+                snippet.highlight_words(words, style="bold yellow", case_sensitive=False)
+                table.add_row(hit.name, str(hit.version_number), f"{hit.score:.2f}", snippet)
+            _console().print(table)
+    except ValueError as exc:
+        rprint(f"[red]Error:[/red] {exc}")
+        raise typer.Exit(1) from None
+    finally:
+        _close(session)
+
+
+# ------------------------------------------------------------------
+# grep
+# ------------------------------------------------------------------
+
+
+@app.command()
+def grep(
+    pattern: Annotated[str, typer.Argument(help="Regular expression to look for.")],
+    ignore_case: Annotated[
+        bool, typer.Option("--ignore-case", "-i", help="Match case-insensitively.")
+    ] = False,
+    fixed: Annotated[
+        bool, typer.Option("--fixed-strings", "-F", help="Treat PATTERN as a plain string.")
+    ] = False,
+    latest_only: Annotated[
+        bool, typer.Option("--latest-only", help="Only search each prompt's latest version.")
+    ] = False,
+    tags: Annotated[
+        list[str] | None,
+        typer.Option("--tag", "-t", help="Only search versions with this tag (repeatable)."),
+    ] = None,
+    db: DbOption = None,
+    json_output: Annotated[bool, typer.Option("--json", help="Output as JSON.")] = False,
+) -> None:
+    """Print the lines of stored versions that match a regular expression."""
+    import json
+
+    service, session = _get_service(db)
+    try:
+        matches = service.grep(
+            pattern,
+            ignore_case=ignore_case,
+            fixed=fixed,
+            latest_only=latest_only,
+            tags=tags or (),
+        )
+        if json_output:
+            data = [
+                {
+                    "name": m.name,
+                    "version": m.version_number,
+                    "line_number": m.line_number,
+                    "line": m.line,
+                    "spans": [list(span) for span in m.spans],
+                }
+                for m in matches
+            ]
+            rprint(json.dumps(data, indent=2))
+            return
+
+        from rich.text import Text
+
+        console = _console()
+        found = False
+        for m in matches:
+            found = True
+            line = Text(m.line)
+            for start, end in m.spans:
+                line.stylize("bold red", start, end)
+            prefix = Text.assemble(
+                (m.name, "cyan"), " ", (f"v{m.version_number}", "magenta"), f":{m.line_number}: "
+            )
+            console.print(prefix + line, soft_wrap=True, highlight=False)
+        if not found:
+            rprint("[dim]No matches.[/dim]")
+    except ValueError as exc:
+        rprint(f"[red]Error:[/red] {exc}")
+        raise typer.Exit(1) from None
+    finally:
+        _close(session)
+
+
+# ------------------------------------------------------------------
+# dupes
+# ------------------------------------------------------------------
+
+
+@app.command()
+def dupes(
+    threshold: Annotated[
+        float,
+        typer.Option("--threshold", min=0.0, max=1.0, help="Minimum estimated similarity (0-1]."),
+    ] = 0.9,
+    db: DbOption = None,
+    json_output: Annotated[bool, typer.Option("--json", help="Output as JSON.")] = False,
+) -> None:
+    """List clusters of near-duplicate versions across different prompts."""
+    import json
+
+    service, session = _get_service(db)
+    try:
+        clusters = service.find_duplicates(threshold)
+        if json_output:
+            data = [
+                {
+                    "similarity": round(c.similarity, 4),
+                    "prompts": c.prompts,
+                    "versions": [{"name": n, "version": v} for n, v in c.versions],
+                }
+                for c in clusters
+            ]
+            rprint(json.dumps(data, indent=2))
+        elif not clusters:
+            rprint("[dim]No near-duplicates found.[/dim]")
+        else:
+            from rich.table import Table
+
+            table = Table(title=f"Near-duplicates (similarity >= {threshold:g})")
+            table.add_column("Cluster", justify="right")
+            table.add_column("Similarity", justify="right")
+            table.add_column("Prompt", style="cyan")
+            table.add_column("Versions")
+            for number, c in enumerate(clusters, start=1):
+                for i, name in enumerate(c.prompts):
+                    versions = [str(v) for n, v in c.versions if n == name]
+                    table.add_row(
+                        str(number) if i == 0 else "",
+                        f"{c.similarity:.2f}" if i == 0 else "",
+                        name,
+                        ", ".join(versions),
+                        end_section=i == len(c.prompts) - 1,
+                    )
+            _console().print(table)
+    except ValueError as exc:
+        rprint(f"[red]Error:[/red] {exc}")
+        raise typer.Exit(1) from None
+    finally:
+        _close(session)
 
 
 # ------------------------------------------------------------------
@@ -358,8 +908,10 @@ def rollback(
     """Rollback a prompt to a previous version (creates a new version)."""
     service, session = _get_service(db)
     try:
+        retries = _begin_write(session)
         new_ver = service.rollback(name, version)
         session.commit()
+        _report_retries(retries)
         rprint(
             f"[green]✓[/green] Rolled back [bold]{name}[/bold] to v{version} → "
             f"new v{new_ver.version_number}"
@@ -369,8 +921,7 @@ def rollback(
         rprint(f"[red]Error:[/red] {exc}")
         raise typer.Exit(1) from None
     finally:
-        session.close()
-        reset_engine()
+        _close(session)
 
 
 # ------------------------------------------------------------------
@@ -399,19 +950,17 @@ def tag(
 
     service, session = _get_service(db)
     try:
-        for t in add_tags or []:
-            service.add_tag(name, version, t)
-        for t in remove_tags or []:
-            service.remove_tag(name, version, t)
+        retries = _begin_write(session)
+        service.apply_tags(name, version, add=add_tags or [], remove=remove_tags or [])
         session.commit()
+        _report_retries(retries)
         rprint(f"[green]✓[/green] Updated tags on [bold]{name}[/bold] v{version}")
     except ValueError as exc:
         session.rollback()
         rprint(f"[red]Error:[/red] {exc}")
         raise typer.Exit(1) from None
     finally:
-        session.close()
-        reset_engine()
+        _close(session)
 
 
 # ------------------------------------------------------------------
@@ -421,27 +970,182 @@ def tag(
 
 @app.command()
 def export(
-    name: Annotated[str, typer.Argument(help="Prompt name")],
+    name: Annotated[str | None, typer.Argument(help="Prompt name")] = None,
     output: Annotated[
         Path | None,
-        typer.Option("--output", "-o", help="Write to file instead of stdout."),
+        typer.Option(
+            "--output",
+            "-o",
+            help="Write to file instead of stdout. With --all: a directory, .zip or .tar[.gz].",
+        ),
+    ] = None,
+    all_prompts: Annotated[
+        bool, typer.Option("--all", help="Export every prompt, one file each.")
+    ] = False,
+    since: Annotated[
+        str | None,
+        typer.Option(
+            "--since",
+            help="With --all, only prompts changed at or after this ISO timestamp (UTC if naive).",
+        ),
+    ] = None,
+    workers: Annotated[
+        int, typer.Option("--workers", help="Threads serializing and writing files.", min=1)
+    ] = 4,
+    format: Annotated[
+        str, typer.Option("--format", help="Output format: json, ndjson or msgpack.")
+    ] = "json",
+    compress: Annotated[
+        str | None, typer.Option("--compress", help="Compress the output: gzip or zstd.")
+    ] = None,
+    tag: Annotated[
+        str | None,
+        typer.Option("--tag", "-t", help="Export only the latest version with this tag."),
     ] = None,
     db: DbOption = None,
 ) -> None:
-    """Export all versions of a prompt as JSON."""
+    """Export all versions of a prompt as JSON, NDJSON or msgpack."""
+    if all_prompts == (name is not None):
+        rprint("[red]Error:[/red] Provide a prompt name or --all.")
+        raise typer.Exit(1) from None
+    if all_prompts and output is None:
+        rprint("[red]Error:[/red] --all needs --output.")
+        raise typer.Exit(1) from None
+    if since is not None and not all_prompts:
+        rprint("[red]Error:[/red] --since only applies to --all.")
+        raise typer.Exit(1) from None
+    if tag is not None and all_prompts:
+        rprint("[red]Error:[/red] --tag does not apply to --all.")
+        raise typer.Exit(1) from None
+
+    from pv.export_formats import is_binary
+
+    if output is None and is_binary(format, compress) and sys.stdout.isatty():
+        rprint("[red]Error:[/red] Refusing to write binary output to a terminal; use --output.")
+        raise typer.Exit(1) from None
+
     service, session = _get_service(db)
     try:
-        if output:
-            service.export_to_file(name, output)
+        if name is not None and output is not None:
+            service.export_to_file(name, output, format, compress, tag)
             rprint(f"[green]✓[/green] Exported [bold]{name}[/bold] to {output}")
+        elif name is not None:
+            # Straight to stdout: Rich would re-wrap the JSON and read
+            # brackets in prompt text as markup.
+            sys.stdout.flush()
+            service.write_export(name, sys.stdout.buffer, format, compress, tag)
+            if format == "json" and compress is None:
+                sys.stdout.buffer.write(b"\n")
+            sys.stdout.buffer.flush()
+        elif output is not None:
+            import datetime
+
+            try:
+                cutoff = datetime.datetime.fromisoformat(since) if since else None
+            except ValueError:
+                raise ValueError(f"Invalid --since timestamp '{since}'.") from None
+            stats = service.export_all(
+                output, since=cutoff, workers=workers, format=format, compress=compress
+            )
+            rprint(
+                f"[green]✓[/green] Exported {stats.prompts} prompts"
+                f" ({stats.versions} versions) to {output}"
+            )
+    except ValueError as exc:
+        rprint(f"[red]Error:[/red] {exc}")
+        raise typer.Exit(1) from None
+    finally:
+        _close(session)
+
+
+# ------------------------------------------------------------------
+# import
+# ------------------------------------------------------------------
+
+
+def _expand_import_paths(files: list[str]) -> list[str]:
+    """Replace directories (e.g. from ``pv export --all``) with their export files."""
+    from pv.export_formats import format_of
+
+    expanded: list[str] = []
+    for file in files:
+        if file != "-" and Path(file).is_dir():
+            expanded.extend(
+                str(path) for path in sorted(Path(file).iterdir()) if format_of(path.name)
+            )
         else:
-            rprint(service.export_prompt(name))
+            expanded.append(file)
+    return expanded
+
+
+@app.command("import")
+def import_(
+    files: Annotated[
+        list[str] | None,
+        typer.Argument(help="Export files or directories of them, or - for stdin (the default)."),
+    ] = None,
+    batch_size: Annotated[
+        int,
+        typer.Option("--batch-size", help="Versions written per transaction.", min=1),
+    ] = 1000,
+    format: Annotated[
+        str | None,
+        typer.Option(
+            "--format",
+            help="json, ndjson or msgpack (default: from the file suffix, else json).",
+        ),
+    ] = None,
+    db: DbOption = None,
+) -> None:
+    """Import prompts from pv export files, preserving version numbers.
+
+    gzip and zstd compression are detected automatically.  Files are read
+    incrementally and committed in batches.  Versions that
+    are already present with the same content are skipped, so an
+    interrupted import can simply be run again.
+    """
+    import contextlib
+
+    from pv.export_formats import format_of
+
+    service, session = _get_service(db)
+    versions = prompts = skipped = retries = 0
+    try:
+        # Each batch commits and then takes the lock again for the next one.
+        retries += _begin_write(session)
+        for file in _expand_import_paths(files or ["-"]):
+            imported = 0
+            try:
+                with contextlib.ExitStack() as stack:
+                    stream = (
+                        sys.stdin.buffer if file == "-" else stack.enter_context(open(file, "rb"))
+                    )
+                    file_format = format or format_of(file) or "json"
+                    for stats in service.import_prompts(stream, batch_size, file_format):
+                        session.commit()
+                        imported = stats.versions
+                        retries += _begin_write(session)
+                    prompts += stats.prompts
+                    skipped += stats.skipped
+            except OSError as exc:
+                raise ValueError(f"Cannot read {file}: {exc.strerror}") from None
+            except ValueError as exc:
+                raise ValueError(f"{file}: {exc}") from None
+            finally:
+                versions += imported
     except ValueError as exc:
+        session.rollback()
         rprint(f"[red]Error:[/red] {exc}")
+        if versions:
+            rprint(f"[dim]{versions} versions were committed before the error.[/dim]")
         raise typer.Exit(1) from None
     finally:
-        session.close()
-        reset_engine()
+        _close(session)
+    _report_retries(retries)
+    rprint(
+        f"[green]✓[/green] Imported {versions} versions ({prompts} new prompts,"
+        f" {skipped} versions already present)"
+    )
 
 
 # ------------------------------------------------------------------
@@ -464,13 +1168,110 @@ def delete(
 
     service, session = _get_service(db)
     try:
+        retries = _begin_write(session)
         service.delete_prompt(name)
         session.commit()
+        _report_retries(retries)
         rprint(f"[green]✓[/green] Deleted [bold]{name}[/bold]")
     except ValueError as exc:
         session.rollback()
         rprint(f"[red]Error:[/red] {exc}")
         raise typer.Exit(1) from None
     finally:
-        session.close()
-        reset_engine()
+        _close(session)
+
+
+# ------------------------------------------------------------------
+# maintain
+# ------------------------------------------------------------------
+
+
+@app.command()
+def maintain(
+    recompress: Annotated[
+        bool,
+        typer.Option("--recompress", help="Re-encode every stored body with the codec."),
+    ] = False,
+    train_dict: Annotated[
+        bool,
+        typer.Option("--train-dict", help="Train a new shared dictionary from stored bodies."),
+    ] = False,
+    codec: Annotated[
+        str | None,
+        typer.Option(
+            "--codec", help="Codec to use: none, zlib or zstd (default: PV_COMPRESSION)."
+        ),
+    ] = None,
+    dict_size: Annotated[
+        int,
+        typer.Option("--dict-size", help="Maximum dictionary size in bytes."),
+    ] = 16 * 1024,
+    db: DbOption = None,
+) -> None:
+    """Run storage maintenance tasks on the database."""
+    if not recompress and not train_dict:
+        rprint("[red]Error:[/red] Provide --recompress and/or --train-dict.")
+        raise typer.Exit(1) from None
+
+    from pv.config import storage_settings
+    from pv.services.blob_store import BlobStore
+
+    _, session = _get_service(db)
+    try:
+        retries = _begin_write(session)
+        blobs = BlobStore(session, storage_settings())
+        if train_dict:
+            dictionary = blobs.train_dictionary(codec, size=dict_size)
+            rprint(
+                f"[green]✓[/green] Trained {dictionary.codec} dictionary #{dictionary.id}"
+                f" ({len(dictionary.data)} bytes)"
+            )
+        if recompress:
+            stats = blobs.recompress(codec)
+            rprint(
+                f"[green]✓[/green] Recompressed {stats.blobs} blobs:"
+                f" {stats.bytes_before} → {stats.bytes_after} bytes"
+            )
+        session.commit()
+        _report_retries(retries)
+    except ValueError as exc:
+        session.rollback()
+        rprint(f"[red]Error:[/red] {exc}")
+        raise typer.Exit(1) from None
+    finally:
+        _close(session)
+
+
+# ------------------------------------------------------------------
+# daemon
+# ------------------------------------------------------------------
+
+
+@app.command()
+def daemon(
+    stop: Annotated[bool, typer.Option("--stop", help="Stop the running daemon.")] = False,
+    db: DbOption = None,
+) -> None:
+    """Serve commands from a warm database connection over a Unix socket.
+
+    While it runs, show, log, list, add, diff and tag for the same database
+    are forwarded to it automatically.  Set PV_NO_DAEMON=1 to bypass it.
+    """
+    from pv import daemon as pv_daemon
+
+    path = _db_path(db)
+    if stop:
+        if pv_daemon.shutdown(path):
+            rprint(f"[green]✓[/green] Stopped daemon for [bold]{path}[/bold]")
+        else:
+            rprint("[dim]No daemon running.[/dim]")
+        return
+
+    def _ready(sock: Path) -> None:
+        rprint(f"[green]✓[/green] Serving [bold]{path}[/bold] on {sock}")
+
+    try:
+        pv_daemon.serve(path, on_ready=_ready)
+    except (OSError, ValueError) as exc:
+        rprint(f"[red]Error:[/red] {exc}")
+        raise typer.Exit(1) from None
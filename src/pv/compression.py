@@ -0,0 +1,107 @@
+"""Compression codecs for stored prompt bodies.
+
+``zlib`` is always available.  ``zstd`` needs the optional ``zstandard``
+package (``pip install 'prompt-version-control[zstd]'``).  Both accept a
+shared dictionary trained from existing bodies, which is where most of the
+win comes from on short prompts full of common boilerplate.
+"""
+
+from __future__ import annotations
+
+import zlib
+from collections import Counter
+from collections.abc import Sequence
+from types import ModuleType
+
+CODECS = ("none", "zlib", "zstd")
+
+# zlib only looks back 32 KiB, so a larger preset dictionary is wasted.
+_ZLIB_MAX_DICT = 32 * 1024
+
+
+def require_zstd() -> ModuleType:
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError(
+            "zstd compression requires the 'zstandard' package "
+            "(pip install 'prompt-version-control[zstd]')."
+        ) from None
+    return zstandard
+
+
+def check_codec(codec: str) -> None:
+    """Raise ``ValueError`` if *codec* is unknown or not installed."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}'. Expected one of: {', '.join(CODECS)}.")
+    if codec == "zstd":
+        require_zstd()
+
+
+def compress(data: bytes, codec: str, dictionary: bytes | None = None) -> bytes:
+    """Compress *data* with *codec*, optionally primed with *dictionary*."""
+    if codec == "none":
+        return data
+    if codec == "zlib":
+        if dictionary:
+            compressor = zlib.compressobj(level=9, zdict=dictionary)
+        else:
+            compressor = zlib.compressobj(level=9)
+        return compressor.compress(data) + compressor.flush()
+    if codec == "zstd":
+        zstandard = require_zstd()
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdCompressor(level=19, dict_data=dict_data).compress(data)
+    raise ValueError(f"Unknown codec '{codec}'.")
+
+
+def decompress(data: bytes, codec: str, dictionary: bytes | None = None) -> bytes:
+    """Reverse :func:`compress`."""
+    if codec == "none":
+        return data
+    if codec == "zlib":
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+    if codec == "zstd":
+        zstandard = require_zstd()
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data)
+    raise ValueError(f"Unknown codec '{codec}'.")
+
+
+def train_dictionary(samples: Sequence[bytes], codec: str, size: int = 16 * 1024) -> bytes:
+    """Build a shared dictionary of at most *size* bytes from *samples*.
+
+    For zstd this is the library's trainer.  zlib has no trainer, so the
+    dictionary is the most frequent repeated lines, most valuable last
+    because zlib favours matches closest to the data.
+    """
+    check_codec(codec)
+    if codec == "none":
+        raise ValueError("Codec 'none' does not use a dictionary.")
+    if codec == "zstd":
+        zstandard = require_zstd()
+        try:
+            trained = zstandard.train_dictionary(size, list(samples))
+        except zstandard.ZstdError as exc:
+            raise ValueError(f"Could not train a zstd dictionary: {exc}") from None
+        return bytes(trained.as_bytes())
+
+    counts: Counter[bytes] = Counter()
+    for sample in samples:
+        counts.update(set(sample.splitlines(keepends=True)))
+    ranked = sorted(
+        (line for line, n in counts.items() if n > 1 and len(line) > 3),
+        key=lambda line: counts[line] * len(line),
+    )
+    budget = min(size, _ZLIB_MAX_DICT)
+    chosen: list[bytes] = []
+    used = 0
+    for line in reversed(ranked):
+        if used + len(line) > budget:
+            continue
+        chosen.append(line)
+        used += len(line)
+    if not chosen:
+        raise ValueError("Could not train a zlib dictionary: no repeated content found.")
+    return b"".join(reversed(chosen))
@@ -1,16 +1,229 @@
-"""Platform-aware default paths for the pv database."""
+"""Platform-aware default paths and runtime settings for pv.
+
+Settings come from environment variables first, then from an optional TOML
+config file (``PV_CONFIG``, or ``config.toml`` in the platform config
+directory), then from built-in defaults::
+
+    [database]
+    profile = "fast"
+    write_timeout = 30.0
+    retry_backoff = 0.002
+
+    [storage]
+    mode = "delta"
+    keyframe_interval = 32
+    compression = "zstd"
+
+    [diff]
+    algorithm = "histogram"
+    timeout = 5.0
+    max_lines = 200000
+    cache_size = 67108864
+"""
 
 from __future__ import annotations
 
+import os
+import tomllib
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
+
+from platformdirs import user_config_dir, user_data_dir
 
-from platformdirs import user_data_dir
+from pv.compression import check_codec
+from pv.diffing import check_algorithm
 
 _DB_FILENAME = "pv.db"
+_CONFIG_FILENAME = "config.toml"
 _APP_NAME = "pv"
 
+STORAGE_MODES = ("full", "delta")
+DEFAULT_DB_PROFILE = "safe"
+
 
 def default_db_path() -> Path:
     """Return the platform-appropriate default database path."""
     data_dir = Path(user_data_dir(_APP_NAME))
     return data_dir / _DB_FILENAME
+
+
+def config_path() -> Path:
+    """Return the config file path (``PV_CONFIG`` or the platform default)."""
+    override = os.environ.get("PV_CONFIG")
+    if override:
+        return Path(override)
+    return Path(user_config_dir(_APP_NAME)) / _CONFIG_FILENAME
+
+
+def load_config() -> dict[str, Any]:
+    """Parse the config file, returning an empty mapping if there is none."""
+    path = config_path()
+    try:
+        with path.open("rb") as fh:
+            return tomllib.load(fh)
+    except FileNotFoundError:
+        return {}
+    except tomllib.TOMLDecodeError as exc:
+        raise ValueError(f"Invalid config file {path}: {exc}") from None
+
+
+def _setting(config: dict[str, Any], env_var: str, section: str, key: str, default: Any) -> Any:
+    value = os.environ.get(env_var)
+    if value:
+        return value
+    return config.get(section, {}).get(key, default)
+
+
+def db_profile() -> str:
+    """Return the SQLite profile name from ``PV_DB_PROFILE`` or the config file."""
+    return str(_setting(load_config(), "PV_DB_PROFILE", "database", "profile", DEFAULT_DB_PROFILE))
+
+
+@dataclass(frozen=True)
+class StorageSettings:
+    """How new prompt bodies are written to the blob store.
+
+    ``mode`` is ``"full"`` (every body stored whole) or ``"delta"`` (bodies
+    stored as a delta against the prompt's previous version).  In delta mode
+    a full keyframe is written every ``keyframe_interval`` versions, so
+    reading any version applies at most ``keyframe_interval - 1`` deltas.
+    ``compression`` names the codec applied on top (see :mod:`pv.compression`).
+    """
+
+    mode: str = "full"
+    keyframe_interval: int = 16
+    compression: str = "zlib"
+
+    def __post_init__(self) -> None:
+        if self.mode not in STORAGE_MODES:
+            raise ValueError(
+                f"Unknown storage mode '{self.mode}'. Expected one of: {', '.join(STORAGE_MODES)}."
+            )
+        if self.keyframe_interval < 1:
+            raise ValueError("Keyframe interval must be at least 1.")
+        check_codec(self.compression)
+
+
+def storage_settings() -> StorageSettings:
+    """Read storage settings from the environment and config file.
+
+    Honours ``PV_STORAGE_MODE``, ``PV_KEYFRAME_INTERVAL`` and ``PV_COMPRESSION``,
+    falling back to the ``[storage]`` table of the config file.
+    """
+    config = load_config()
+    defaults = StorageSettings()
+    interval = _setting(
+        config, "PV_KEYFRAME_INTERVAL", "storage", "keyframe_interval", defaults.keyframe_interval
+    )
+    try:
+        keyframe_interval = int(interval)
+    except ValueError:
+        raise ValueError(f"Keyframe interval must be an integer, got '{interval}'.") from None
+    return StorageSettings(
+        mode=str(_setting(config, "PV_STORAGE_MODE", "storage", "mode", defaults.mode)),
+        keyframe_interval=keyframe_interval,
+        compression=str(
+            _setting(config, "PV_COMPRESSION", "storage", "compression", defaults.compression)
+        ),
+    )
+
+
+@dataclass(frozen=True)
+class DiffSettings:
+    """How ``pv diff`` compares two versions.
+
+    ``algorithm`` is one of :data:`pv.diffing.ALGORITHMS`.  A diff of more
+    than ``max_lines`` lines in total, or one still running after
+    ``timeout`` seconds, falls back to a coarse diff instead of hanging.
+    Line diffs are cached in the database up to ``cache_size`` compressed
+    bytes; 0 disables the cache.
+    """
+
+    algorithm: str = "histogram"
+    timeout: float = 5.0
+    max_lines: int = 200_000
+    cache_size: int = 64 * 1024 * 1024
+
+    def __post_init__(self) -> None:
+        check_algorithm(self.algorithm)
+        if self.timeout <= 0:
+            raise ValueError("Diff timeout must be positive.")
+        if self.max_lines < 1:
+            raise ValueError("Diff max lines must be at least 1.")
+        if self.cache_size < 0:
+            raise ValueError("Diff cache size must not be negative.")
+
+
+def diff_settings() -> DiffSettings:
+    """Read diff settings from the environment and config file.
+
+    Honours ``PV_DIFF_ALGORITHM``, ``PV_DIFF_TIMEOUT``, ``PV_DIFF_MAX_LINES`` and
+    ``PV_DIFF_CACHE_SIZE``, falling back to the ``[diff]`` table of the config file.
+    """
+    config = load_config()
+    defaults = DiffSettings()
+    timeout = _setting(config, "PV_DIFF_TIMEOUT", "diff", "timeout", defaults.timeout)
+    max_lines = _setting(config, "PV_DIFF_MAX_LINES", "diff", "max_lines", defaults.max_lines)
+    cache_size = _setting(config, "PV_DIFF_CACHE_SIZE", "diff", "cache_size", defaults.cache_size)
+    try:
+        timeout = float(timeout)
+    except ValueError:
+        raise ValueError(f"Diff timeout must be a number, got '{timeout}'.") from None
+    try:
+        max_lines = int(max_lines)
+    except ValueError:
+        raise ValueError(f"Diff max lines must be an integer, got '{max_lines}'.") from None
+    try:
+        cache_size = int(cache_size)
+    except ValueError:
+        raise ValueError(f"Diff cache size must be an integer, got '{cache_size}'.") from None
+    return DiffSettings(
+        algorithm=str(
+            _setting(config, "PV_DIFF_ALGORITHM", "diff", "algorithm", defaults.algorithm)
+        ),
+        timeout=timeout,
+        max_lines=max_lines,
+        cache_size=cache_size,
+    )
+
+
+@dataclass(frozen=True)
+class WriteSettings:
+    """How write commands wait for SQLite's write lock.
+
+    A busy lock is retried for up to ``timeout`` seconds.  Each wait is
+    drawn uniformly from zero to ``backoff`` seconds doubled per retry
+    (capped; see :func:`pv.database.begin_write`), so concurrent writers
+    spread out instead of polling in step.
+    """
+
+    timeout: float = 30.0
+    backoff: float = 0.002
+
+    def __post_init__(self) -> None:
+        if self.timeout < 0:
+            raise ValueError("Write timeout must not be negative.")
+        if self.backoff <= 0:
+            raise ValueError("Retry backoff must be positive.")
+
+
+def write_settings() -> WriteSettings:
+    """Read write-lock settings from the environment and config file.
+
+    Honours ``PV_WRITE_TIMEOUT`` and ``PV_RETRY_BACKOFF``, falling back to the
+    ``[database]`` table of the config file.
+    """
+    config = load_config()
+    defaults = WriteSettings()
+    timeout = _setting(config, "PV_WRITE_TIMEOUT", "database", "write_timeout", defaults.timeout)
+    backoff = _setting(config, "PV_RETRY_BACKOFF", "database", "retry_backoff", defaults.backoff)
+    try:
+        timeout = float(timeout)
+    except ValueError:
+        raise ValueError(f"Write timeout must be a number, got '{timeout}'.") from None
+    try:
+        backoff = float(backoff)
+    except ValueError:
+        raise ValueError(f"Retry backoff must be a number, got '{backoff}'.") from None
+    return WriteSettings(timeout=timeout, backoff=backoff)
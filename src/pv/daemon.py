@@ -0,0 +1,285 @@
+"""Long-lived ``pv daemon`` serving CLI commands over a Unix socket.
+
+The daemon keeps one engine and session factory open for a single database,
+so commands it serves skip interpreter start-up, migrations checks and
+engine construction.  ``pv`` forwards the commands in :data:`SERVED_COMMANDS`
+to a running daemon for the same database and falls back to running them
+directly when there is none.
+
+The protocol is one JSON object per line in each direction.  A request is
+``{"argv", "cwd", "env", "stdin", "width", "color"}`` and a response is
+``{"exit_code", "stdout", "stderr"}``; ``{"shutdown": true}`` stops the daemon.
+``env`` holds the client's ``PV_*`` variables, with ``PV_CONFIG`` always set
+to the config file the client would read, and is applied for the duration of
+the command, so settings resolve exactly as they would without a daemon.
+A request whose database profile differs from the one the daemon's engine
+was opened with gets ``{"fallback": true}`` and the client runs the command
+itself.
+
+This module is imported on every ``pv`` invocation, so it must stay cheap:
+the CLI and database layers are only imported by :func:`serve`.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+SERVED_COMMANDS = frozenset(
+    {"show", "log", "list", "add", "diff", "blame", "tag", "search", "grep", "dupes", "find"}
+)
+
+_MAX_LINE = 256 * 1024 * 1024
+
+
+def runtime_dir() -> Path:
+    """Return the directory holding daemon sockets, creating it if needed.
+
+    ``PV_RUNTIME_DIR`` overrides the platform runtime directory.
+    """
+    override = os.environ.get("PV_RUNTIME_DIR")
+    if override:
+        path = Path(override)
+    else:
+        from platformdirs import user_runtime_dir
+
+        path = Path(user_runtime_dir("pv"))
+    try:
+        path.mkdir(parents=True, exist_ok=True, mode=0o700)
+    except OSError:
+        path = Path(tempfile.gettempdir()) / f"pv-{os.getuid()}"
+        path.mkdir(parents=True, exist_ok=True, mode=0o700)
+    return path
+
+
+def socket_path(db_path: Path) -> Path:
+    """Return the socket a daemon for *db_path* listens on."""
+    digest = hashlib.sha256(str(db_path.resolve()).encode("utf-8")).hexdigest()[:16]
+    return runtime_dir() / f"{digest}.sock"
+
+
+def _requested_db(argv: list[str]) -> Path:
+    """Resolve the database a command line targets, as the CLI would."""
+    for i, arg in enumerate(argv):
+        if arg == "--db" and i + 1 < len(argv):
+            return Path(argv[i + 1])
+        if arg.startswith("--db="):
+            return Path(arg.removeprefix("--db="))
+    if os.environ.get("PV_DB"):
+        return Path(os.environ["PV_DB"])
+    from pv.config import default_db_path
+
+    return default_db_path()
+
+
+def _exchange(path: Path, request: dict[str, Any]) -> dict[str, Any]:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(path))
+        with sock.makefile("rwb") as stream:
+            stream.write(json.dumps(request).encode("utf-8") + b"\n")
+            stream.flush()
+            line = stream.readline(_MAX_LINE)
+    if not line:
+        raise ConnectionError("Daemon closed the connection without replying.")
+    response: dict[str, Any] = json.loads(line)
+    return response
+
+
+def forward(argv: list[str]) -> int | None:
+    """Run *argv* on a daemon for its database, returning the exit code.
+
+    Returns ``None`` when the command should run directly instead: it is
+    not one the daemon serves, ``PV_NO_DAEMON`` is set, or no daemon is
+    listening for that database.
+    """
+    if not argv or argv[0] not in SERVED_COMMANDS or os.environ.get("PV_NO_DAEMON"):
+        return None
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = socket_path(_requested_db(argv))
+    if not path.exists():
+        return None
+    stdin = sys.stdin.read() if _reads_stdin(argv) and not sys.stdin.isatty() else None
+    request = {
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": _client_env(),
+        "stdin": stdin,
+        "width": _terminal_width(),
+        "color": sys.stdout.isatty(),
+    }
+    try:
+        response = _exchange(path, request)
+    except (ConnectionError, FileNotFoundError, PermissionError):
+        # A stale socket from a daemon that died, or one we may not use;
+        # run the command directly.
+        response = {"fallback": True}
+    if response.get("fallback"):
+        if stdin is not None:
+            # The direct run must see the input this one already consumed.
+            sys.stdin = io.StringIO(stdin)
+        return None
+    sys.stdout.write(response["stdout"])
+    sys.stdout.flush()
+    sys.stderr.write(response["stderr"])
+    sys.stderr.flush()
+    return int(response["exit_code"])
+
+
+def _reads_stdin(argv: list[str]) -> bool:
+    """Whether *argv* names stdin as an input, as ``-`` or ``--option=-``."""
+    return any(arg == "-" or arg.endswith("=-") for arg in argv)
+
+
+def _client_env() -> dict[str, str]:
+    """Return the ``PV_*`` variables a forwarded command must run with."""
+    from pv.config import config_path
+
+    env = {key: value for key, value in os.environ.items() if key.startswith("PV_")}
+    env["PV_CONFIG"] = str(config_path().absolute())
+    return env
+
+
+def _terminal_width() -> int:
+    try:
+        return os.get_terminal_size(sys.stdout.fileno()).columns
+    except (OSError, ValueError):
+        return 80
+
+
+def shutdown(db_path: Path) -> bool:
+    """Ask the daemon for *db_path* to exit. Returns ``False`` if none is running."""
+    path = socket_path(db_path)
+    if not path.exists():
+        return False
+    try:
+        _exchange(path, {"shutdown": True})
+    except (ConnectionError, FileNotFoundError, PermissionError):
+        path.unlink(missing_ok=True)
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def _environment(env: dict[str, str]) -> Iterator[None]:
+    """Replace the process's ``PV_*`` variables with *env* for the block."""
+    saved = {key: value for key, value in os.environ.items() if key.startswith("PV_")}
+    for key in saved:
+        del os.environ[key]
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for key in [key for key in os.environ if key.startswith("PV_")]:
+            del os.environ[key]
+        os.environ.update(saved)
+
+
+def serve(db_path: Path, on_ready: Callable[[Path], None] | None = None) -> None:
+    """Serve commands for *db_path* until shut down.
+
+    Requests are handled one at a time: commands share the process's
+    working directory, ``PV_*`` environment, standard streams and the Rich
+    console, which are swapped per request.
+    """
+    import signal
+    import socketserver
+    import threading
+
+    import rich
+    import typer
+
+    from pv import cli
+    from pv.config import db_profile
+    from pv.database import get_session_factory, init_db, reset_engine
+
+    reset_engine()
+    init_db(db_path)
+    profile = db_profile()
+    cli.enter_warm_mode(get_session_factory(db_path))
+    command = typer.main.get_command(cli.app)
+    path = socket_path(db_path)
+    path.unlink(missing_ok=True)
+    stop = threading.Event()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            line = self.rfile.readline(_MAX_LINE)
+            if not line:
+                return
+            request = json.loads(line)
+            if request.get("shutdown"):
+                self._reply({"exit_code": 0, "stdout": "", "stderr": ""})
+                stop.set()
+                return
+            with _environment(request.get("env") or {}):
+                self._reply(self._run(request) if self._compatible() else {"fallback": True})
+
+        def _compatible(self) -> bool:
+            # Pragmas are fixed when the engine connects, so a client asking
+            # for another profile (or with a broken config) runs by itself.
+            try:
+                return db_profile() == profile
+            except ValueError:
+                return False
+
+        def _run(self, request: dict[str, Any]) -> dict[str, Any]:
+            out = io.StringIO()
+            err = io.StringIO()
+            rich.reconfigure(
+                file=out,
+                width=request.get("width") or 80,
+                force_terminal=bool(request.get("color")),
+                color_system="standard" if request.get("color") else None,
+            )
+            prev_cwd = os.getcwd()
+            prev_stdin = sys.stdin
+            exit_code: Any = 0
+            try:
+                os.chdir(request["cwd"])
+                sys.stdin = io.StringIO(request.get("stdin") or "")
+                with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                    command.main(args=request["argv"], prog_name="pv")
+            except SystemExit as exc:
+                exit_code = exc.code
+            except Exception as exc:
+                err.write(f"Error: {exc}\n")
+                exit_code = 1
+            finally:
+                sys.stdin = prev_stdin
+                os.chdir(prev_cwd)
+            if exit_code is None:
+                exit_code = 0
+            elif not isinstance(exit_code, int):
+                err.write(f"{exit_code}\n")
+                exit_code = 1
+            return {"exit_code": exit_code, "stdout": out.getvalue(), "stderr": err.getvalue()}
+
+        def _reply(self, response: dict[str, Any]) -> None:
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+    server = socketserver.UnixStreamServer(str(path), Handler)
+    server.timeout = 0.2
+    os.chmod(path, 0o600)
+    signal.signal(signal.SIGTERM, lambda _signum, _frame: stop.set())
+    try:
+        if on_ready is not None:
+            on_ready(path)
+        while not stop.is_set():
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+        cli.leave_warm_mode()
+        reset_engine()
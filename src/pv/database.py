@@ -2,20 +2,70 @@
 
 from __future__ import annotations
 
+import random
+import sqlite3
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-from alembic import command as alembic_command
-from alembic.config import Config as AlembicConfig
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session, sessionmaker
 
+from pv.config import WriteSettings, db_profile
+
+if TYPE_CHECKING:
+    from alembic.config import Config as AlembicConfig
+
+# Revision of the newest migration in alembic/versions.  init_db compares it
+# with the database's alembic_version and only loads Alembic when they differ.
+SCHEMA_HEAD = "0011"
+
+# Ceiling of one wait between attempts to take the write lock, in seconds.
+_MAX_BACKOFF = 0.1
+
 _engine: Engine | None = None
 _session_factory: sessionmaker[Session] | None = None
 
+# Connection pragmas per profile, applied in order on every new connection.
+# ``safe`` keeps full durability; ``fast`` trades the last few commits on
+# power loss (never corruption) for far fewer fsyncs; ``readonly`` refuses
+# writes and leaves the journal mode alone.  A negative cache_size is KiB.
+PROFILES: dict[str, dict[str, Any]] = {
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "mmap_size": 0,
+        "cache_size": -8_000,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5_000,
+        "foreign_keys": "ON",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64_000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10_000,
+        "foreign_keys": "ON",
+    },
+    "readonly": {
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64_000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10_000,
+        "foreign_keys": "ON",
+        "query_only": "ON",
+    },
+}
+
 
 def _alembic_cfg(db_url: str) -> AlembicConfig:
     """Build an Alembic Config pointing at the bundled migrations."""
+    from alembic.config import Config as AlembicConfig
+
     # alembic.ini lives at the project root; find it relative to this file
     pkg_dir = Path(__file__).resolve().parent  # src/pv
     project_root = pkg_dir.parent.parent  # repo root
@@ -26,15 +76,40 @@ def _alembic_cfg(db_url: str) -> AlembicConfig:
     return cfg
 
 
-def get_engine(db_path: str | Path) -> Engine:
-    """Create or return a cached SQLAlchemy engine."""
+def _install_pragmas(engine: Engine, profile: str) -> None:
+    """Apply the *profile* pragmas to every connection *engine* opens."""
+    try:
+        pragmas = PROFILES[profile]
+    except KeyError:
+        raise ValueError(
+            f"Unknown database profile '{profile}'. Expected one of: {', '.join(PROFILES)}."
+        ) from None
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection: Any, _record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+def get_engine(db_path: str | Path, profile: str | None = None) -> Engine:
+    """Create or return a cached SQLAlchemy engine.
+
+    New connections are configured with the pragmas of *profile*, which
+    defaults to ``PV_DB_PROFILE`` or the config file (see :mod:`pv.config`).
+    """
     global _engine
     if _engine is not None:
         return _engine
     db_path = Path(db_path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
     url = f"sqlite:///{db_path}"
-    _engine = create_engine(url, echo=False)
+    engine = create_engine(url, echo=False)
+    _install_pragmas(engine, profile or db_profile())
+    _engine = engine
     return _engine
 
 
@@ -48,19 +123,38 @@ def get_session_factory(db_path: str | Path) -> sessionmaker[Session]:
     return _session_factory
 
 
+def schema_revision(engine: Engine) -> str | None:
+    """Return the database's Alembic revision, or ``None`` if it has none."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except OperationalError:
+        return None
+
+
 def init_db(db_path: str | Path) -> None:
     """Initialise the database by running Alembic migrations to head.
 
     This is idempotent - safe to call multiple times.  It creates parent
     directories and the SQLite file as needed, then applies any pending
-    Alembic migrations so that ``alembic_version`` is always present.
+    Alembic migrations so that ``alembic_version`` is always present.  A
+    database already at :data:`SCHEMA_HEAD` is detected with one query and
+    Alembic is not imported at all.
     """
-    import logging
-
     db_path = Path(db_path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    get_engine(db_path)
-    db_url = f"sqlite:///{db_path}"
+    engine = get_engine(db_path)
+    if schema_revision(engine) == SCHEMA_HEAD:
+        return
+    _run_migrations(f"sqlite:///{db_path}")
+
+
+def _run_migrations(db_url: str) -> None:
+    """Upgrade the database at *db_url* to the newest Alembic revision."""
+    import logging
+
+    from alembic import command as alembic_command
+
     cfg = _alembic_cfg(db_url)
     # Silence Alembic's INFO logging so it doesn't pollute CLI output.
     alembic_logger = logging.getLogger("alembic")
@@ -72,6 +166,65 @@ def init_db(db_path: str | Path) -> None:
         alembic_logger.setLevel(prev_level)
 
 
+def is_busy(exc: Exception) -> bool:
+    """Whether *exc*, from SQLAlchemy or sqlite3, reports a lock held by another connection."""
+    error = getattr(exc, "orig", exc)
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        # Extended codes such as SQLITE_BUSY_SNAPSHOT keep the primary code in the low byte.
+        return code & 0xFF == sqlite3.SQLITE_BUSY
+    return "database is locked" in str(exc)
+
+
+def begin_write(session: Session, settings: WriteSettings | None = None) -> int:
+    """Start *session*'s transaction with ``BEGIN IMMEDIATE``; return the retries it took.
+
+    Taking the write lock up front means everything the transaction reads
+    (the next version number, say) stays current until it commits, and a
+    writer never has to upgrade a read transaction, which fails at once
+    with ``database is locked`` under WAL when another writer got there
+    first.  SQLite's own busy handler is switched off while the lock is
+    contended: each retry instead sleeps a random time of up to
+    ``settings.backoff * 2**retry`` seconds (at most :data:`_MAX_BACKOFF`),
+    which keeps concurrent writers from waking in lockstep.  Raises
+    ``ValueError`` when the lock is still held after ``settings.timeout``
+    seconds.
+
+    The driver only opens a transaction for a write, so a session whose
+    transaction is already open holds the lock and is left alone.
+    """
+    settings = settings or WriteSettings()
+    deadline = time.monotonic() + settings.timeout
+    # Attempts go straight to the driver: a failed one through SQLAlchemy
+    # costs over ten times as much, which adds up with many writers polling.
+    raw = session.connection().connection.dbapi_connection
+    if raw is None:
+        raise ValueError("Cannot take the write lock: the database connection is closed.")
+    if raw.in_transaction:
+        return 0
+    busy_timeout = raw.execute("PRAGMA busy_timeout").fetchone()[0]
+    raw.execute("PRAGMA busy_timeout = 0")
+    retries = 0
+    try:
+        while True:
+            try:
+                raw.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as exc:
+                if not is_busy(exc):
+                    raise OperationalError("BEGIN IMMEDIATE", None, exc) from None
+            else:
+                return retries
+            if time.monotonic() >= deadline:
+                raise ValueError(
+                    f"Database is locked by another writer; gave up after {retries} retries."
+                )
+            retries += 1
+            ceiling = min(_MAX_BACKOFF, settings.backoff * 2 ** min(retries, 16))
+            time.sleep(random.uniform(0, ceiling))
+    finally:
+        raw.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+
+
 def reset_engine() -> None:
     """Reset the cached engine and session factory. Used in tests."""
     global _engine, _session_factory
@@ -0,0 +1,132 @@
+"""Binary deltas between prompt bodies.
+
+A delta is a sequence of ``COPY`` and ``INSERT`` instructions that rebuilds a
+target byte string from a base.  Matching is done on whole lines, which is
+where prompt edits almost always happen, so encoding stays linear in the
+size of both inputs.
+
+Wire format (all integers are unsigned LEB128 varints)::
+
+    base_length target_length op*
+    op := 0x00 offset length        copy base[offset:offset + length]
+        | 0x01 length bytes          insert the next ``length`` bytes
+"""
+
+from __future__ import annotations
+
+_COPY = 0x00
+_INSERT = 0x01
+
+# How many earlier occurrences of a line to try when looking for the longest
+# match; keeps pathological inputs (thousands of blank lines) linear.
+_MAX_CANDIDATES = 8
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _write_varint_op(out: bytearray, op: int, value: int) -> None:
+    out.append(op)
+    _write_varint(out, value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _line_offsets(lines: list[bytes]) -> list[int]:
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def make_delta(base: bytes, target: bytes) -> bytes:
+    """Return a delta that turns *base* into *target*."""
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    base_offsets = _line_offsets(base_lines)
+    target_offsets = _line_offsets(target_lines)
+
+    index: dict[bytes, list[int]] = {}
+    for i, line in enumerate(base_lines):
+        positions = index.setdefault(line, [])
+        if len(positions) < _MAX_CANDIDATES:
+            positions.append(i)
+
+    out = bytearray()
+    _write_varint(out, len(base))
+    _write_varint(out, len(target))
+
+    pending_start = 0  # target byte offset where the current insert run began
+
+    def flush_insert(end: int) -> None:
+        if end > pending_start:
+            _write_varint_op(out, _INSERT, end - pending_start)
+            out.extend(target[pending_start:end])
+
+    j = 0
+    while j < len(target_lines):
+        best_start, best_len = -1, 0
+        for i in index.get(target_lines[j], ()):
+            length = 0
+            while (
+                i + length < len(base_lines)
+                and j + length < len(target_lines)
+                and base_lines[i + length] == target_lines[j + length]
+            ):
+                length += 1
+            if length > best_len:
+                best_start, best_len = i, length
+        if best_len == 0:
+            j += 1
+            continue
+        flush_insert(target_offsets[j])
+        offset = base_offsets[best_start]
+        _write_varint_op(out, _COPY, offset)
+        _write_varint(out, base_offsets[best_start + best_len] - offset)
+        j += best_len
+        pending_start = target_offsets[j]
+    flush_insert(len(target))
+    return bytes(out)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild the target encoded by *delta* on top of *base*."""
+    base_len, pos = _read_varint(delta, 0)
+    if base_len != len(base):
+        raise ValueError("Delta does not apply: base length mismatch.")
+    target_len, pos = _read_varint(delta, pos)
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op == _COPY:
+            offset, pos = _read_varint(delta, pos)
+            length, pos = _read_varint(delta, pos)
+            out.extend(base[offset : offset + length])
+        elif op == _INSERT:
+            length, pos = _read_varint(delta, pos)
+            out.extend(delta[pos : pos + length])
+            pos += length
+        else:
+            raise ValueError(f"Delta is corrupt: unknown opcode {op:#x}.")
+    if len(out) != target_len:
+        raise ValueError("Delta does not apply: target length mismatch.")
+    return bytes(out)
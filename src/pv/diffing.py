@@ -0,0 +1,594 @@
+"""Line diff algorithms producing ``difflib``-compatible unified diffs.
+
+Every algorithm works on lines interned to integers and yields matching
+blocks, which become ``SequenceMatcher``-style opcodes and are formatted
+exactly like :func:`difflib.unified_diff`.
+
+``myers``
+    Greedy O(ND) shortest edit script.  Keeps every step's frontier for
+    backtracking, so memory grows with the square of the edit distance.
+``linear``
+    Myers' divide-and-conquer variant: finds the middle snake from both
+    ends and recurses, in memory linear in the input.
+``patience``
+    Anchors on lines that occur exactly once on both sides (longest
+    increasing run of them), recursing between anchors; regions without
+    such lines use ``linear``.
+``histogram``
+    Anchors on the longest common run around the rarest shared line
+    (git's heuristic), falling back to ``linear`` like ``patience``.
+    Best on long, repetitive prompts.
+``difflib``
+    :class:`difflib.SequenceMatcher`, for output identical to older
+    releases; can go quadratic on large repetitive input.
+
+A diff that exceeds the configured number of lines or runs past its time
+budget falls back to a coarse diff: common prefix and suffix plus lines
+unique on both sides, with everything between reported as replaced.
+
+The same algorithms diff finer units than lines (see :func:`tokenize`):
+words, characters, or model-style tokens.
+"""
+
+from __future__ import annotations
+
+import bisect
+import difflib
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+ALGORITHMS = ("myers", "linear", "patience", "histogram", "difflib")
+GRANULARITIES = ("line", "word", "char", "token")
+
+Opcode = tuple[str, int, int, int, int]
+_Block = tuple[int, int, int]
+_Range = tuple[int, int, int, int]
+
+# Lines occurring more often than this on the old side are never anchors
+# for histogram diff (git uses the same limit).
+_MAX_CHAIN = 64
+
+
+class _DeadlineError(Exception):
+    """The time budget ran out; the caller falls back to a coarse diff."""
+
+
+@dataclass(frozen=True)
+class TokenDiff:
+    """Opcodes between two token sequences, with the tokens they index.
+
+    ``exact`` is ``False`` when a cutoff forced a coarse diff.
+    """
+
+    granularity: str
+    old: tuple[str, ...]
+    new: tuple[str, ...]
+    opcodes: tuple[Opcode, ...]
+    exact: bool = True
+
+    def chunks(self) -> Iterator[tuple[str, str, str]]:
+        """Yield ``(tag, old text, new text)`` per opcode."""
+        for tag, i1, i2, j1, j2 in self.opcodes:
+            yield tag, "".join(self.old[i1:i2]), "".join(self.new[j1:j2])
+
+    def to_dict(self) -> dict[str, Any]:
+        """A JSON-ready form: the opcodes with their token ranges and text."""
+        return {
+            "granularity": self.granularity,
+            "exact": self.exact,
+            "opcodes": [
+                {
+                    "op": tag,
+                    "old": [i1, i2],
+                    "new": [j1, j2],
+                    "old_text": "".join(self.old[i1:i2]),
+                    "new_text": "".join(self.new[j1:j2]),
+                }
+                for tag, i1, i2, j1, j2 in self.opcodes
+            ],
+        }
+
+
+def check_algorithm(algorithm: str) -> None:
+    """Raise ``ValueError`` if *algorithm* is unknown."""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(
+            f"Unknown diff algorithm '{algorithm}'. Expected one of: {', '.join(ALGORITHMS)}."
+        )
+
+
+def diff_opcodes(
+    a: Sequence[str],
+    b: Sequence[str],
+    algorithm: str = "histogram",
+    timeout: float | None = None,
+    max_lines: int | None = None,
+) -> tuple[list[Opcode], bool]:
+    """Return ``(opcodes, exact)`` turning line list *a* into *b*.
+
+    Opcodes have the format of :meth:`difflib.SequenceMatcher.get_opcodes`.
+    *exact* is ``False`` when the input had more than *max_lines* lines in
+    total or *timeout* seconds passed, and a coarse diff was computed.
+    """
+    check_algorithm(algorithm)
+    if algorithm == "difflib":
+        return difflib.SequenceMatcher(None, a, b).get_opcodes(), True
+    ids: dict[str, int] = {}
+    x = [ids.setdefault(line, len(ids)) for line in a]
+    y = [ids.setdefault(line, len(ids)) for line in b]
+    if max_lines is not None and len(x) + len(y) > max_lines:
+        return _opcodes(_coarse_blocks(x, y), len(x), len(y)), False
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    try:
+        blocks = _blocks(x, y, _STRATEGIES[algorithm], deadline)
+    except _DeadlineError:
+        return _opcodes(_coarse_blocks(x, y), len(x), len(y)), False
+    return _opcodes(blocks, len(x), len(y)), True
+
+
+# ----------------------------------------------------------------------
+# Formatting
+# ----------------------------------------------------------------------
+
+
+def format_unified(hunks: Iterable[str], fromfile: str = "", tofile: str = "") -> Iterator[str]:
+    """Yield *hunks* (see :func:`format_hunks`) under a ``---``/``+++`` header.
+
+    Together they are byte for byte :func:`difflib.unified_diff`; nothing
+    is yielded when there are no hunks.
+    """
+    hunks = iter(hunks)
+    first = next(hunks, None)
+    if first is None:
+        return
+    yield f"--- {fromfile}\n"
+    yield f"+++ {tofile}\n"
+    yield first
+    yield from hunks
+
+
+def format_hunks(
+    a: Sequence[str], b: Sequence[str], opcodes: list[Opcode], n: int = 3
+) -> Iterator[str]:
+    """Yield the ``@@`` hunks of a unified diff, without the file header."""
+    for group in grouped_opcodes(opcodes, n):
+        first, last = group[0], group[-1]
+        old = _format_range(first[1], last[2])
+        new = _format_range(first[3], last[4])
+        yield f"@@ -{old} +{new} @@\n"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                for line in a[i1:i2]:
+                    yield " " + line
+                continue
+            if tag in {"replace", "delete"}:
+                for line in a[i1:i2]:
+                    yield "-" + line
+            if tag in {"replace", "insert"}:
+                for line in b[j1:j2]:
+                    yield "+" + line
+
+
+def grouped_opcodes(opcodes: list[Opcode], n: int = 3) -> Iterator[list[Opcode]]:
+    """Group *opcodes* into hunks with *n* lines of context, as difflib does."""
+    codes = list(opcodes) or [("equal", 0, 1, 0, 1)]
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    span = n + n
+    group: list[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        # End the current group and start a new one whenever there is a
+        # large range with no changes.
+        if tag == "equal" and i2 - i1 > span:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range(start: int, stop: int) -> str:
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return str(beginning)
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def _opcodes(blocks: list[_Block], la: int, lb: int) -> list[Opcode]:
+    """Turn sorted matching blocks into opcodes, merging adjacent blocks."""
+    merged: list[list[int]] = []
+    for i, j, size in blocks:
+        if size <= 0:
+            continue
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1][2] += size
+        else:
+            merged.append([i, j, size])
+    codes: list[Opcode] = []
+    i = j = 0
+    for ai, bj, size in [*merged, [la, lb, 0]]:
+        if i < ai and j < bj:
+            codes.append(("replace", i, ai, j, bj))
+        elif i < ai:
+            codes.append(("delete", i, ai, j, bj))
+        elif j < bj:
+            codes.append(("insert", i, ai, j, bj))
+        i, j = ai + size, bj + size
+        if size:
+            codes.append(("equal", ai, i, bj, j))
+    return codes
+
+
+# ----------------------------------------------------------------------
+# Algorithms
+# ----------------------------------------------------------------------
+
+# A strategy gets a range with no common prefix or suffix and returns the
+# matching blocks it settled plus sub-ranges still to diff.
+_Strategy = Callable[
+    [list[int], list[int], _Range, float | None], tuple[list[_Block], list[_Range]]
+]
+
+
+def _blocks(
+    a: list[int], b: list[int], strategy: _Strategy, deadline: float | None
+) -> list[_Block]:
+    blocks: list[_Block] = []
+    stack: list[_Range] = [(0, len(a), 0, len(b))]
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+        start = a_lo
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            a_lo += 1
+            b_lo += 1
+        if a_lo > start:
+            blocks.append((start, b_lo - (a_lo - start), a_lo - start))
+        end = a_hi
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+        if a_hi < end:
+            blocks.append((a_hi, b_hi, end - a_hi))
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+        found, ranges = strategy(a, b, (a_lo, a_hi, b_lo, b_hi), deadline)
+        blocks.extend(found)
+        stack.extend(ranges)
+    blocks.sort()
+    return blocks
+
+
+def _check(deadline: float | None) -> None:
+    if deadline is not None and time.monotonic() > deadline:
+        raise _DeadlineError
+
+
+def _myers(
+    a: list[int], b: list[int], rng: _Range, deadline: float | None
+) -> tuple[list[_Block], list[_Range]]:
+    a_lo, a_hi, b_lo, b_hi = rng
+    n, m = a_hi - a_lo, b_hi - b_lo
+    offset = n + m + 1
+    v = [-1] * (2 * offset + 1)
+    v[offset + 1] = 0
+    trace: list[list[int]] = []
+    for d in range(n + m + 1):
+        _check(deadline)
+        trace.append(v[offset - d - 1 : offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m, d, a_lo, b_lo), []
+    raise AssertionError("unreachable")  # pragma: no cover
+
+
+def _backtrack(
+    trace: list[list[int]], x: int, y: int, d: int, a_lo: int, b_lo: int
+) -> list[_Block]:
+    blocks: list[_Block] = []
+    for step in range(d, 0, -1):
+        # trace[step] holds diagonals -step-1 .. step+1 as they were before this step.
+        frontier = trace[step]
+        k = x - y
+        down = k == -step or (
+            k != step and frontier[k - 1 + step + 1] < frontier[k + 1 + step + 1]
+        )
+        prev_k = k + 1 if down else k - 1
+        prev_x = frontier[prev_k + step + 1]
+        prev_y = prev_x - prev_k
+        start_x, start_y = (prev_x, prev_y + 1) if down else (prev_x + 1, prev_y)
+        if x > start_x:
+            blocks.append((a_lo + start_x, b_lo + start_y, x - start_x))
+        x, y = prev_x, prev_y
+    if x > 0:
+        blocks.append((a_lo, b_lo, x))
+    return blocks
+
+
+def _linear(
+    a: list[int], b: list[int], rng: _Range, deadline: float | None
+) -> tuple[list[_Block], list[_Range]]:
+    """Split the range at the middle snake (Myers' linear-space refinement)."""
+    a_lo, a_hi, b_lo, b_hi = rng
+    n, m = a_hi - a_lo, b_hi - b_lo
+    max_d = (n + m + 1) // 2
+    offset = max_d
+    length = 2 * max_d + 2
+    forward = [-1] * length
+    forward[offset + 1] = 0
+    backward = forward[:]
+    delta = n - m
+    odd = delta % 2 != 0
+    # Shrink the diagonal window once a path runs off the edge of the grid.
+    f_start = f_end = r_start = r_end = 0
+    for d in range(max_d):
+        _check(deadline)
+        for k in range(-d + f_start, d + 1 - f_end, 2):
+            i = offset + k
+            if k == -d or (k != d and forward[i - 1] < forward[i + 1]):
+                x = forward[i + 1]
+            else:
+                x = forward[i - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a_lo + x] == b[b_lo + y]:
+                x += 1
+                y += 1
+            forward[i] = x
+            if x > n:
+                f_end += 2
+            elif y > m:
+                f_start += 2
+            elif odd:
+                j = offset + delta - k
+                if 0 <= j < length and backward[j] != -1 and x >= n - backward[j]:
+                    return _split(rng, x, y)
+        for k in range(-d + r_start, d + 1 - r_end, 2):
+            i = offset + k
+            if k == -d or (k != d and backward[i - 1] < backward[i + 1]):
+                x = backward[i + 1]
+            else:
+                x = backward[i - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a_hi - x - 1] == b[b_hi - y - 1]:
+                x += 1
+                y += 1
+            backward[i] = x
+            if x > n:
+                r_end += 2
+            elif y > m:
+                r_start += 2
+            elif not odd:
+                j = offset + delta - k
+                if 0 <= j < length and forward[j] != -1:
+                    fx = forward[j]
+                    if fx >= n - x:
+                        return _split(rng, fx, fx - (j - offset))
+    return [], []
+
+
+def _split(rng: _Range, x: int, y: int) -> tuple[list[_Block], list[_Range]]:
+    a_lo, a_hi, b_lo, b_hi = rng
+    if (x, y) in {(0, 0), (a_hi - a_lo, b_hi - b_lo)}:
+        return [], []
+    return [], [(a_lo, a_lo + x, b_lo, b_lo + y), (a_lo + x, a_hi, b_lo + y, b_hi)]
+
+
+def _unique_anchors(a: list[int], b: list[int], rng: _Range) -> list[tuple[int, int]]:
+    """Return the longest increasing run of lines unique on both sides of *rng*."""
+    a_lo, a_hi, b_lo, b_hi = rng
+    counts: dict[int, list[int]] = {}
+    for i in range(a_lo, a_hi):
+        entry = counts.setdefault(a[i], [0, 0, i, -1])
+        entry[0] += 1
+    for j in range(b_lo, b_hi):
+        entry = counts.get(b[j])
+        if entry is not None:
+            entry[1] += 1
+            entry[3] = j
+    pairs = sorted((i, j) for na, nb, i, j in counts.values() if na == 1 and nb == 1)
+    # Patience sorting for the longest increasing subsequence of j.
+    tails: list[int] = []
+    tail_index: list[int] = []
+    previous: list[int] = []
+    for index, (_, j) in enumerate(pairs):
+        pile = bisect.bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            tail_index.append(index)
+        else:
+            tails[pile] = j
+            tail_index[pile] = index
+        previous.append(tail_index[pile - 1] if pile else -1)
+    anchors: list[tuple[int, int]] = []
+    index = tail_index[-1] if tail_index else -1
+    while index != -1:
+        anchors.append(pairs[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+
+def _between(rng: _Range, anchors: list[tuple[int, int, int]]) -> list[_Range]:
+    """Ranges before, between and after ``(i, j, size)`` *anchors*."""
+    a_lo, a_hi, b_lo, b_hi = rng
+    ranges = []
+    for i, j, size in anchors:
+        ranges.append((a_lo, i, b_lo, j))
+        a_lo, b_lo = i + size, j + size
+    ranges.append((a_lo, a_hi, b_lo, b_hi))
+    return [r for r in ranges if r[0] < r[1] or r[2] < r[3]]
+
+
+def _patience(
+    a: list[int], b: list[int], rng: _Range, deadline: float | None
+) -> tuple[list[_Block], list[_Range]]:
+    _check(deadline)
+    anchors = [(i, j, 1) for i, j in _unique_anchors(a, b, rng)]
+    if not anchors:
+        return _linear(a, b, rng, deadline)
+    return anchors, _between(rng, anchors)
+
+
+def _histogram(
+    a: list[int], b: list[int], rng: _Range, deadline: float | None
+) -> tuple[list[_Block], list[_Range]]:
+    _check(deadline)
+    a_lo, a_hi, b_lo, b_hi = rng
+    positions: dict[int, list[int]] = {}
+    for i in range(a_lo, a_hi):
+        positions.setdefault(a[i], []).append(i)
+    best: tuple[int, int, int, int] | None = None  # (rarity, -size, i, j)
+    j = b_lo
+    while j < b_hi:
+        found = positions.get(b[j])
+        next_j = j + 1
+        if found is not None and len(found) <= _MAX_CHAIN:
+            for i in found:
+                start_i, start_j = i, j
+                while start_i > a_lo and start_j > b_lo and a[start_i - 1] == b[start_j - 1]:
+                    start_i -= 1
+                    start_j -= 1
+                end_i, end_j = i + 1, j + 1
+                rarity = len(found)
+                while end_i < a_hi and end_j < b_hi and a[end_i] == b[end_j]:
+                    rarity = min(rarity, len(positions[a[end_i]]))
+                    end_i += 1
+                    end_j += 1
+                candidate = (rarity, start_i - end_i, start_i, start_j)
+                if best is None or candidate < best:
+                    best = candidate
+                next_j = max(next_j, end_j)
+        j = next_j
+    if best is None:
+        return _linear(a, b, rng, deadline)
+    _, size, i, j = best
+    anchor = (i, j, -size)
+    return [anchor], _between(rng, [anchor])
+
+
+def _coarse_blocks(a: list[int], b: list[int]) -> list[_Block]:
+    """Prefix, suffix and unique-line anchors only: linearithmic, never slow."""
+    la, lb = len(a), len(b)
+    prefix = 0
+    while prefix < la and prefix < lb and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < la - prefix and suffix < lb - prefix and a[la - suffix - 1] == b[lb - suffix - 1]
+    ):
+        suffix += 1
+    blocks = [(0, 0, prefix)] if prefix else []
+    rng = (prefix, la - suffix, prefix, lb - suffix)
+    blocks.extend((i, j, 1) for i, j in _unique_anchors(a, b, rng))
+    if suffix:
+        blocks.append((la - suffix, lb - suffix, suffix))
+    return blocks
+
+
+_STRATEGIES: dict[str, _Strategy] = {
+    "myers": _myers,
+    "linear": _linear,
+    "patience": _patience,
+    "histogram": _histogram,
+}
+
+
+# ----------------------------------------------------------------------
+# Tokens
+# ----------------------------------------------------------------------
+
+_WORDS = re.compile(r"\w+|\s+|[^\w\s]")
+# GPT-2 style pre-tokenization: words and punctuation runs carry their
+# leading space, numbers split every three digits.  Boundaries land close
+# to those of BPE tokenizers without depending on one.
+_TOKENS = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+")
+
+
+def check_granularity(granularity: str) -> None:
+    """Raise ``ValueError`` if *granularity* is unknown."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(
+            f"Unknown diff granularity '{granularity}'. "
+            f"Expected one of: {', '.join(GRANULARITIES)}."
+        )
+
+
+def tokenize(text: str, granularity: str) -> list[str]:
+    """Split *text* into the units diffed at *granularity*.
+
+    Tokens always join back to *text*: ``line`` keeps line endings,
+    ``word`` yields runs of word characters, runs of whitespace and single
+    punctuation marks, ``char`` single characters, and ``token`` the
+    pieces a GPT-style tokenizer starts from.
+    """
+    check_granularity(granularity)
+    if granularity == "line":
+        return text.splitlines(keepends=True)
+    if granularity == "char":
+        return list(text)
+    return (_WORDS if granularity == "word" else _TOKENS).findall(text)
+
+
+def diff_tokens(
+    old: Sequence[str],
+    new: Sequence[str],
+    granularity: str,
+    algorithm: str = "histogram",
+    timeout: float | None = None,
+    max_lines: int | None = None,
+) -> TokenDiff:
+    """Diff two token sequences from :func:`tokenize`."""
+    opcodes, exact = diff_opcodes(old, new, algorithm, timeout, max_lines)
+    return TokenDiff(granularity, tuple(old), tuple(new), tuple(opcodes), exact)
+
+
+class TokenCache:
+    """Tokenized bodies keyed by ``(content_hash, granularity)``, least recently used out.
+
+    Bounded by the total number of tokens held, since a character-level
+    entry is far larger than a line-level one.
+    """
+
+    def __init__(self, max_tokens: int = 2_000_000) -> None:
+        self._entries: OrderedDict[tuple[str, str], tuple[str, ...]] = OrderedDict()
+        self._size = 0
+        self._max_tokens = max_tokens
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def tokens(self, digest: str, granularity: str, load: Callable[[], str]) -> tuple[str, ...]:
+        """Return the tokens of the body *digest*, calling *load* for it on a miss."""
+        key = (digest, granularity)
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            return cached
+        tokens = tuple(tokenize(load(), granularity))
+        self._entries[key] = tokens
+        self._size += len(tokens)
+        while self._size > self._max_tokens and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+        return tokens
@@ -0,0 +1,231 @@
+"""Encodings for prompt exports: JSON, NDJSON and msgpack, optionally compressed.
+
+Every format carries the same document: the prompt's ``name`` and
+``created_at`` followed by one record per version.
+
+``json``
+    The original format: one pretty-printed object with a ``versions``
+    array (see :mod:`pv.jsonstream` for reading it incrementally).
+``ndjson``
+    One compact JSON object per line: ``{"name", "created_at"}`` and then
+    one line per version.
+``msgpack``
+    The same records as ``ndjson``, as consecutive msgpack maps.  Needs the
+    optional ``msgpack`` package.
+
+Compression wraps the encoded stream, so neither writing nor reading ever
+holds a whole export in memory.  Readers detect gzip and zstd by their magic
+bytes.  A record with a ``name`` key starts a new prompt, so several
+exports may be concatenated in one stream.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import gzip
+import io
+import json
+from collections.abc import Iterable, Iterator
+from types import ModuleType
+from typing import IO, Any
+
+from pv.compression import require_zstd
+
+EXPORT_FORMATS = ("json", "ndjson", "msgpack")
+EXPORT_COMPRESSIONS = ("gzip", "zstd")
+
+_SUFFIXES = {"json": ".json", "ndjson": ".ndjson", "msgpack": ".msgpack"}
+_COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+_FORMAT_BY_SUFFIX = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".msgpack": "msgpack",
+}
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _msgpack() -> ModuleType:
+    try:
+        import msgpack
+    except ImportError:
+        raise ValueError(
+            "msgpack exports require the 'msgpack' package "
+            "(pip install 'prompt-version-control[msgpack]')."
+        ) from None
+    return msgpack
+
+
+def check_export_options(format: str, compress: str | None) -> None:
+    """Raise ``ValueError`` if *format* or *compress* is unknown or not installed."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(
+            f"Unknown export format '{format}'. Expected one of: {', '.join(EXPORT_FORMATS)}."
+        )
+    if compress is not None and compress not in EXPORT_COMPRESSIONS:
+        raise ValueError(
+            f"Unknown compression '{compress}'. Expected one of: {', '.join(EXPORT_COMPRESSIONS)}."
+        )
+    if format == "msgpack":
+        _msgpack()
+    if compress == "zstd":
+        require_zstd()
+
+
+def is_binary(format: str, compress: str | None) -> bool:
+    """Whether the encoded export is not plain text."""
+    return format == "msgpack" or compress is not None
+
+
+def export_suffix(format: str, compress: str | None) -> str:
+    """Return the file suffix for an export, e.g. ``.ndjson.gz``."""
+    return _SUFFIXES[format] + (_COMPRESSION_SUFFIXES[compress] if compress else "")
+
+
+def format_of(filename: str) -> str | None:
+    """Return the export format *filename*'s suffix names, ignoring compression."""
+    name = filename.lower()
+    for suffix in _COMPRESSION_SUFFIXES.values():
+        name = name.removesuffix(suffix)
+    for suffix, format in _FORMAT_BY_SUFFIX.items():
+        if name.endswith(suffix):
+            return format
+    return None
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+
+
+@contextlib.contextmanager
+def compressed(out: IO[bytes], compress: str | None) -> Iterator[IO[bytes]]:
+    """Yield a stream that compresses into *out*; *out* is left open."""
+    if compress is None:
+        yield out
+    elif compress == "gzip":
+        # mtime=0 keeps the output reproducible.
+        with gzip.GzipFile(fileobj=out, mode="wb", mtime=0) as sink:
+            yield sink
+    else:
+        with require_zstd().ZstdCompressor().stream_writer(out, closefd=False) as sink:
+            yield sink
+
+
+def write_document(
+    out: IO[bytes], header: dict[str, Any], entries: Iterable[dict[str, Any]], format: str
+) -> None:
+    """Encode one prompt's export to *out*, consuming *entries* lazily."""
+    if format == "json":
+        _write_json(out, header, entries)
+    elif format == "ndjson":
+        out.write(_ndjson_line(header))
+        for entry in entries:
+            out.write(_ndjson_line(entry))
+    else:
+        packer = _msgpack().Packer()
+        out.write(packer.pack(header))
+        for entry in entries:
+            out.write(packer.pack(entry))
+
+
+def _write_json(out: IO[bytes], header: dict[str, Any], entries: Iterable[dict[str, Any]]) -> None:
+    # Exactly json.dumps({**header, "versions": [...]}, indent=2), one entry at a time.
+    opening = json.dumps({**header, "versions": []}, indent=2).removesuffix("[]\n}")
+    out.write(opening.encode("utf-8") + b"[")
+    written = False
+    for entry in entries:
+        text = json.dumps(entry, indent=2)
+        # JSON strings never contain raw newlines, so this only re-indents.
+        out.write((("," if written else "") + "\n    " + text.replace("\n", "\n    ")).encode())
+        written = True
+    out.write(b"\n  ]\n}" if written else b"]\n}")
+
+
+def _ndjson_line(record: dict[str, Any]) -> bytes:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+
+
+def decompressed(stream: IO[bytes]) -> IO[bytes]:
+    """Return *stream*, transparently decompressed if it is gzip or zstd."""
+    buffered = stream if isinstance(stream, io.BufferedReader) else io.BufferedReader(stream)
+    magic = buffered.peek(4)[:4]
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=buffered, mode="rb")
+    if magic == _ZSTD_MAGIC:
+        decompressor = require_zstd().ZstdDecompressor()
+        reader: IO[bytes] = decompressor.stream_reader(buffered, read_across_frames=True)
+        return reader
+    return buffered
+
+
+def iter_documents(
+    stream: IO[bytes], format: str
+) -> Iterator[tuple[dict[str, Any], Iterator[Any]]]:
+    """Yield ``(fields, versions)`` per prompt, like :func:`pv.jsonstream.iter_exports`."""
+    stream = decompressed(stream)
+    if format == "json":
+        from pv.jsonstream import iter_exports
+
+        yield from iter_exports(io.TextIOWrapper(stream, encoding="utf-8"))
+        return
+    if format == "ndjson":
+        records: Iterator[Any] = (
+            _ndjson_record(number, line)
+            for number, line in enumerate(io.TextIOWrapper(stream, encoding="utf-8"), start=1)
+            if line.strip()
+        )
+    else:
+        unpacker = _msgpack().Unpacker(stream, raw=False)
+        records = _msgpack_records(unpacker)
+    yield from _group(records)
+
+
+def _ndjson_record(number: int, line: str) -> Any:
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"Invalid NDJSON on line {number}: {exc.msg}.") from None
+
+
+def _msgpack_records(unpacker: Any) -> Iterator[Any]:
+    try:
+        yield from unpacker
+    except ValueError as exc:
+        raise ValueError(f"Invalid msgpack export: {exc}") from None
+
+
+class _Cursor:
+    def __init__(self, records: Iterator[Any]) -> None:
+        self._records = records
+        self.head: Any = next(records, None)
+
+    def advance(self) -> None:
+        self.head = next(self._records, None)
+
+
+def _group(records: Iterator[Any]) -> Iterator[tuple[dict[str, Any], Iterator[Any]]]:
+    """Split a flat record stream into prompts: a ``name`` record, then its versions."""
+    cursor = _Cursor(records)
+
+    def versions() -> Iterator[Any]:
+        while isinstance(cursor.head, dict) and "name" not in cursor.head:
+            yield cursor.head
+            cursor.advance()
+
+    while cursor.head is not None:
+        header = cursor.head
+        if not isinstance(header, dict) or "name" not in header:
+            raise ValueError("Invalid export: expected a prompt record with a 'name'.")
+        cursor.advance()
+        pending = versions()
+        yield header, pending
+        for _ in pending:
+            pass
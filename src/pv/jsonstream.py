@@ -0,0 +1,131 @@
+"""Incremental reader for ``pv export`` JSON documents.
+
+An export is one object with ``name``, ``created_at`` and a ``versions``
+array.  :func:`iter_exports` reads a text stream in chunks and yields each
+export's top-level fields followed by its versions one at a time, so memory
+is bounded by the largest single version rather than the file size.  A
+stream may hold several export objects back to back.
+
+Only ``versions`` is streamed; every other value, and each version object,
+is decoded whole with :meth:`json.JSONDecoder.raw_decode`.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterator
+from typing import Any, TextIO
+
+CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """A forward-only cursor over a text stream with just enough lookahead."""
+
+    def __init__(self, stream: TextIO, chunk_size: int = CHUNK_SIZE) -> None:
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, at_least: int) -> bool:
+        """Read more input; returns ``False`` at end of stream."""
+        if self._eof:
+            return False
+        chunk = self._stream.read(max(self._chunk_size, at_least))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or ``""`` at the end."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill(0):
+                return ""
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(
+                f"Invalid export JSON: expected '{char}', found {found or 'end of input'!r}."
+            )
+        self._pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as exc:
+                # Probably cut off at the end of the buffer: read more (doubling,
+                # so a huge value is re-scanned a logarithmic number of times).
+                if self._fill(len(self._buf) - self._pos):
+                    continue
+                raise ValueError(f"Invalid export JSON: {exc.msg}.") from None
+            # A number running into the end of the buffer may continue in the
+            # next chunk, so only trust it once something follows it.
+            if end == len(self._buf) and isinstance(value, int | float) and self._fill(0):
+                continue
+            self._pos = end
+            return value
+
+
+def iter_exports(
+    stream: TextIO, chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[dict[str, Any], Iterator[Any]]]:
+    """Yield ``(fields, versions)`` for each export object in *stream*.
+
+    *fields* holds the export's keys that appear before ``versions``;
+    *versions* lazily yields the raw version objects and must be consumed
+    before advancing to the next export.  Raises :class:`ValueError` on
+    malformed input.
+    """
+    reader = _Reader(stream, chunk_size)
+    while reader.peek():
+        reader.expect("{")
+        fields: dict[str, Any] = {}
+        streamed = False
+        while reader.peek() != "}":
+            if fields or streamed:
+                reader.expect(",")
+            key = reader.value()
+            if not isinstance(key, str):
+                raise ValueError("Invalid export JSON: object keys must be strings.")
+            reader.expect(":")
+            if key == "versions" and not streamed:
+                streamed = True
+                versions = _array(reader)
+                yield fields, versions
+                # Drain whatever the caller left unread.
+                for _ in versions:
+                    pass
+            else:
+                fields[key] = reader.value()
+        reader.expect("}")
+        if not streamed:
+            yield fields, iter(())
+
+
+def _array(reader: _Reader) -> Iterator[Any]:
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.expect("]")
+        return
+    while True:
+        yield reader.value()
+        if reader.peek() == "]":
+            reader.expect("]")
+            return
+        reader.expect(",")
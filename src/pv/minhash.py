@@ -0,0 +1,83 @@
+"""MinHash signatures for spotting near-duplicate prompt bodies.
+
+A body is reduced to its set of overlapping five-byte shingles (of the
+lower-cased text with whitespace collapsed).  Each shingle is hashed once
+and falls into one of :data:`NUM_BINS` bins by its low bits, keeping the
+smallest value per bin ("one permutation hashing"); empty bins borrow from
+the next filled bin so short bodies still compare sensibly.  The fraction
+of equal bins between two signatures estimates the Jaccard similarity of
+their shingle sets.
+
+For locality-sensitive hashing the signature is cut into :data:`BANDS`
+bands of :data:`ROWS` values.  Bodies sharing any band bucket are
+candidates; with 16 bands of 8 rows a pair at similarity 0.9 becomes a
+candidate with probability above 0.999 and one at 0.5 only about 6% of
+the time, so thresholds below roughly 0.75 start missing pairs.
+
+Wire format: :data:`NUM_BINS` little-endian unsigned 32-bit integers.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import operator
+import struct
+
+NUM_BINS = 128
+BANDS = 16
+ROWS = NUM_BINS // BANDS
+SHINGLE_SIZE = 5
+
+_FORMAT = struct.Struct(f"<{NUM_BINS}I")
+_EMPTY = 1 << 32
+# Added once per bin skipped while densifying, so a borrowed value differs
+# from the one it was borrowed from.
+_OFFSET = 0x9E3779B1
+
+
+def _shingles(content: str) -> set[bytes]:
+    data = " ".join(content.lower().split()).encode("utf-8")
+    if len(data) <= SHINGLE_SIZE:
+        return {data} if data else set()
+    return {data[i : i + SHINGLE_SIZE] for i in range(len(data) - SHINGLE_SIZE + 1)}
+
+
+def signature(content: str) -> bytes | None:
+    """Return the MinHash signature of *content*, or ``None`` if it is blank."""
+    shingles = _shingles(content)
+    if not shingles:
+        return None
+    digests = sorted(
+        (int.from_bytes(hashlib.blake2b(s, digest_size=8).digest(), "little") for s in shingles),
+        reverse=True,
+    )
+    # Digests in one bin share their low bits, so the last one written, the
+    # smallest, also has the smallest value.
+    smallest = {digest % NUM_BINS: digest >> 32 for digest in digests}
+    bins = [smallest.get(i, _EMPTY) for i in range(NUM_BINS)]
+    if _EMPTY in bins:
+        # Rotation densification: an empty bin takes the next filled bin to
+        # its right, offset by the distance.
+        source = list(bins)
+        for i in range(NUM_BINS):
+            distance = 0
+            while source[(i + distance) % NUM_BINS] == _EMPTY:
+                distance += 1
+            bins[i] = (source[(i + distance) % NUM_BINS] + distance * _OFFSET) & 0xFFFFFFFF
+    return _FORMAT.pack(*bins)
+
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Estimate the Jaccard similarity of the bodies behind two signatures."""
+    return sum(map(operator.eq, _FORMAT.unpack(a), _FORMAT.unpack(b))) / NUM_BINS
+
+
+def band_buckets(sig: bytes) -> list[int]:
+    """Return one signed 64-bit bucket id per band of *sig*."""
+    width = ROWS * 4
+    return [
+        int.from_bytes(
+            hashlib.blake2b(sig[i : i + width], digest_size=8).digest(), "little", signed=True
+        )
+        for i in range(0, len(sig), width)
+    ]
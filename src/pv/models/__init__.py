@@ -1,4 +1,29 @@
 from pv.models.base import Base
-from pv.models.prompt import Prompt, PromptVersion, Tag, prompt_version_tags
+from pv.models.prompt import (
+    CompressionDict,
+    ContentBlob,
+    Prompt,
+    PromptVersion,
+    Tag,
+    diff_cache,
+    line_origins,
+    minhash_bands,
+    prompt_version_tags,
+)
+from pv.models.search import CONTENT_FTS, CONTENT_TRIGRAM, NOTE_FTS
 
-__all__ = ["Base", "Prompt", "PromptVersion", "Tag", "prompt_version_tags"]
+__all__ = [
+    "CONTENT_FTS",
+    "CONTENT_TRIGRAM",
+    "NOTE_FTS",
+    "Base",
+    "CompressionDict",
+    "ContentBlob",
+    "Prompt",
+    "PromptVersion",
+    "Tag",
+    "diff_cache",
+    "line_origins",
+    "minhash_bands",
+    "prompt_version_tags",
+]
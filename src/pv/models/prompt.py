@@ -2,9 +2,23 @@ from __future__ import annotations
 
 import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Table, Text, func
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Table,
+    Text,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from pv.compression import decompress
+from pv.delta import apply_delta
 from pv.models.base import Base
 
 prompt_version_tags = Table(
@@ -17,6 +31,69 @@ prompt_version_tags = Table(
         primary_key=True,
     ),
     Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_prompt_version_tags_tag_version", "tag_id", "version_id"),
+)
+
+
+# LSH index over ContentBlob.minhash: one row per band of each signature.
+# Blobs sharing a (band, bucket) are near-duplicate candidates.
+minhash_bands = Table(
+    "minhash_bands",
+    Base.metadata,
+    Column("band", Integer, primary_key=True),
+    Column("bucket", Integer, primary_key=True),
+    Column(
+        "content_hash",
+        String(64),
+        ForeignKey("content_blobs.content_hash", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Index("ix_minhash_bands_content_hash", "content_hash"),
+    sqlite_with_rowid=False,
+)
+
+
+# Blame data: for each version, the version number that introduced each of
+# its lines, run-length encoded (see pv.services.blame).
+line_origins = Table(
+    "line_origins",
+    Base.metadata,
+    Column(
+        "version_id",
+        Integer,
+        ForeignKey("prompt_versions.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column("data", LargeBinary, nullable=False),
+)
+
+
+# Rendered diff hunks between two bodies, compressed with ``codec``.  Keyed
+# by content hashes rather than versions, so prompts sharing bodies share
+# entries; ``used_at`` (Unix time) drives least-recently-used eviction.
+diff_cache = Table(
+    "diff_cache",
+    Base.metadata,
+    Column(
+        "hash_a",
+        String(64),
+        ForeignKey("content_blobs.content_hash", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "hash_b",
+        String(64),
+        ForeignKey("content_blobs.content_hash", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column("algorithm", String(16), primary_key=True),
+    Column("context", Integer, primary_key=True),
+    Column("codec", String(16), nullable=False),
+    Column("data", LargeBinary, nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("used_at", Float, nullable=False),
+    Index("ix_diff_cache_hash_b", "hash_b"),
+    Index("ix_diff_cache_used_at", "used_at"),
 )
 
 
@@ -40,22 +117,118 @@ class Prompt(Base):
         return f"<Prompt(name={self.name!r})>"
 
 
+class CompressionDict(Base):
+    """A shared compression dictionary trained from stored bodies.
+
+    Rows are never rewritten: training again adds a new row, and blobs keep
+    pointing at the dictionary they were compressed with.
+    """
+
+    __tablename__ = "compression_dicts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    codec: Mapped[str] = mapped_column(String(16), nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<CompressionDict(id={self.id}, codec={self.codec!r})>"
+
+
+class ContentBlob(Base):
+    """A prompt body, stored once per distinct SHA-256 of its text.
+
+    The stored payload is the UTF-8 body itself, or, when ``base_hash`` is
+    set, a delta (see :mod:`pv.delta`) against the blob it names.  ``data``
+    is that payload compressed with ``codec``, optionally primed with a
+    shared dictionary.  ``depth`` counts the deltas between this blob and
+    the nearest full keyframe.  ``minhash`` is the body's MinHash signature
+    (see :mod:`pv.minhash`), ``None`` for a blank body.
+    """
+
+    __tablename__ = "content_blobs"
+
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    base_hash: Mapped[str | None] = mapped_column(
+        String(64), ForeignKey("content_blobs.content_hash"), nullable=True, index=True
+    )
+    depth: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    codec: Mapped[str] = mapped_column(
+        String(16), nullable=False, default="none", server_default="none"
+    )
+    dict_id: Mapped[int | None] = mapped_column(
+        Integer, ForeignKey("compression_dicts.id"), nullable=True
+    )
+    minhash: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+
+    base: Mapped[ContentBlob | None] = relationship("ContentBlob", remote_side=[content_hash])
+    dictionary: Mapped[CompressionDict | None] = relationship("CompressionDict")
+
+    def payload(self) -> bytes:
+        """Return ``data`` decompressed: a full body or a delta."""
+        dictionary = self.dictionary.data if self.dictionary is not None else None
+        return decompress(self.data, self.codec, dictionary)
+
+    def raw(self, known: tuple[str, bytes] | None = None) -> bytes:
+        """Return the full UTF-8 body, applying deltas back to the keyframe.
+
+        Decoding happens on first access and is cached on the instance.
+        *known* is a ``(content_hash, body)`` pair the caller has already
+        decoded; when the chain reaches that blob, its body is used as is
+        rather than loaded and decoded again.
+        """
+        chain: list[ContentBlob] = []
+        blob: ContentBlob | None = self
+        raw: bytes | None = None
+        while blob is not None:
+            raw = blob.__dict__.get("_raw")
+            if raw is not None:
+                break
+            chain.append(blob)
+            if known is not None and blob.base_hash == known[0]:
+                raw = known[1]
+                break
+            blob = blob.base
+        for link in reversed(chain):
+            raw = link.payload() if raw is None else apply_delta(raw, link.payload())
+            link.__dict__["_raw"] = raw
+        assert raw is not None
+        return raw
+
+    @property
+    def text(self) -> str:
+        """Return the decoded body text."""
+        return self.raw().decode("utf-8")
+
+    def __repr__(self) -> str:
+        return f"<ContentBlob(hash={self.content_hash[:12]!r}, size={self.size})>"
+
+
 class PromptVersion(Base):
     __tablename__ = "prompt_versions"
+    __table_args__ = (
+        Index("uq_prompt_versions_prompt_version", "prompt_id", "version_number", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     prompt_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("prompts.id", ondelete="CASCADE"), nullable=False
     )
     version_number: Mapped[int] = mapped_column(Integer, nullable=False)
-    content: Mapped[str] = mapped_column(Text, nullable=False)
-    content_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    content_hash: Mapped[str] = mapped_column(
+        String(64), ForeignKey("content_blobs.content_hash"), nullable=False, index=True
+    )
     note: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime.datetime] = mapped_column(
         DateTime, server_default=func.now(), nullable=False
     )
 
     prompt: Mapped[Prompt] = relationship("Prompt", back_populates="versions")
+    blob: Mapped[ContentBlob] = relationship("ContentBlob")
     tags: Mapped[list[Tag]] = relationship(
         "Tag",
         secondary=prompt_version_tags,
@@ -63,6 +236,11 @@ class PromptVersion(Base):
         overlaps="versions",
     )
 
+    @property
+    def content(self) -> str:
+        """The prompt body, resolved through the content blob store."""
+        return self.blob.text
+
     def __repr__(self) -> str:
         return f"<PromptVersion(prompt_id={self.prompt_id}, v={self.version_number})>"
 
@@ -0,0 +1,58 @@
+"""SQLite FTS5 tables backing ``pv search`` and ``pv grep``.
+
+They are not mapped classes: the DDL below is attached to the metadata so
+``Base.metadata.create_all`` creates them next to the ORM tables, and
+migrations 0006 and 0007 create the same objects in migrated databases.
+
+``content_fts`` indexes each version's body as words and
+``content_trigram`` as overlapping three-character sequences, both under
+the version's id.  Bodies live compressed or delta-encoded in
+``content_blobs``, which SQL cannot read, so both tables are contentless
+and the service layer feeds them when it writes versions (see
+:class:`pv.services.search.SearchIndex`).
+
+``note_fts`` indexes ``prompt_versions.note`` as an external-content table
+kept in sync by triggers.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import DDL, event
+
+from pv.models.base import Base
+
+CONTENT_FTS = "content_fts"
+NOTE_FTS = "note_fts"
+CONTENT_TRIGRAM = "content_trigram"
+
+_TOKENIZE = "tokenize='unicode61 remove_diacritics 2'"
+
+SEARCH_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {CONTENT_FTS} USING fts5("
+    f"content, content='', {_TOKENIZE})",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {NOTE_FTS} USING fts5("
+    f"note, content='prompt_versions', content_rowid='id', {_TOKENIZE})",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {CONTENT_TRIGRAM} USING fts5("
+    "content, content='', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS prompt_versions_note_fts_insert"
+    " AFTER INSERT ON prompt_versions WHEN new.note IS NOT NULL BEGIN"
+    f" INSERT INTO {NOTE_FTS}(rowid, note) VALUES (new.id, new.note); END",
+    "CREATE TRIGGER IF NOT EXISTS prompt_versions_note_fts_delete"
+    " AFTER DELETE ON prompt_versions WHEN old.note IS NOT NULL BEGIN"
+    f" INSERT INTO {NOTE_FTS}({NOTE_FTS}, rowid, note) VALUES ('delete', old.id, old.note); END",
+    "CREATE TRIGGER IF NOT EXISTS prompt_versions_note_fts_update"
+    " AFTER UPDATE OF note ON prompt_versions BEGIN"
+    f" INSERT INTO {NOTE_FTS}({NOTE_FTS}, rowid, note)"
+    " SELECT 'delete', old.id, old.note WHERE old.note IS NOT NULL;"
+    f" INSERT INTO {NOTE_FTS}(rowid, note) SELECT new.id, new.note WHERE new.note IS NOT NULL;"
+    " END",
+)
+
+for _statement in SEARCH_DDL:
+    event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _table in (CONTENT_FTS, NOTE_FTS, CONTENT_TRIGRAM):
+    event.listen(
+        Base.metadata,
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {_table}").execute_if(dialect="sqlite"),
+    )
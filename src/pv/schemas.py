@@ -0,0 +1,36 @@
+"""Pydantic models for records read from outside the database."""
+
+from __future__ import annotations
+
+import datetime
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class AddRecord(BaseModel):
+    """One line of ``pv add-many`` input."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    name: str = Field(min_length=1, max_length=255)
+    content: str
+    tags: list[str] = Field(default_factory=list)
+    note: str | None = None
+
+
+class ExportPrompt(BaseModel):
+    """The top-level fields of a ``pv export`` document."""
+
+    name: str = Field(min_length=1, max_length=255)
+    created_at: datetime.datetime | None = None
+
+
+class ExportVersion(BaseModel):
+    """One entry of a ``pv export`` document's ``versions`` array."""
+
+    version_number: int = Field(ge=1)
+    content: str
+    content_hash: str = Field(pattern=r"^[0-9a-f]{64}$")
+    note: str | None = None
+    tags: list[str] = Field(default_factory=list)
+    created_at: datetime.datetime | None = None
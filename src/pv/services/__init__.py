@@ -1,3 +1,4 @@
-from pv.services.prompt_service import PromptService
+from pv.services.blob_store import BlobStore
+from pv.services.prompt_service import PromptService, PromptSummary
 
-__all__ = ["PromptService"]
+__all__ = ["BlobStore", "PromptService", "PromptSummary"]
@@ -0,0 +1,225 @@
+"""Line-origin maps behind ``pv blame``.
+
+Each version stores, for every line of its body, the number of the version
+that introduced the line.  A new version's map is its predecessor's map
+carried through one diff: unchanged lines keep their origin, inserted and
+replaced lines get the new version's number.  Maps are written with the
+versions, so blaming any version is one lookup rather than a replay of the
+history.  Versions without a map (written before maps existed, or made
+stale by importing into a gap in the history) are rebuilt from the nearest
+earlier map when first blamed.
+
+A map is stored run-length encoded as little-endian ``(origin, count)``
+pairs of unsigned 32-bit integers.
+"""
+
+from __future__ import annotations
+
+import datetime
+import struct
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from itertools import groupby, islice, repeat
+
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, joinedload
+
+from pv.database import is_busy
+from pv.diffing import diff_opcodes
+from pv.models.prompt import PromptVersion, line_origins
+from pv.services.blob_store import SequentialDecoder
+
+_RUN = struct.Struct("<II")
+_ALGORITHM = "histogram"
+_WRITE_BATCH = 500
+_REPLAY_CHUNK = 200
+
+
+@dataclass(frozen=True)
+class BlameLine:
+    """One line of a version with the version that introduced it."""
+
+    line_number: int
+    version_number: int
+    created_at: datetime.datetime | None
+    line: str
+
+
+def encode_origins(origins: Sequence[int]) -> bytes:
+    """Run-length encode a line-origin map."""
+    return b"".join(_RUN.pack(number, len(list(run))) for number, run in groupby(origins))
+
+
+def decode_origins(data: bytes) -> list[int]:
+    """Inverse of :func:`encode_origins`."""
+    origins: list[int] = []
+    for number, count in _RUN.iter_unpack(data):
+        origins.extend(repeat(number, count))
+    return origins
+
+
+def advance_origins(
+    old_lines: Sequence[str], old_origins: Sequence[int], new_lines: Sequence[str], number: int
+) -> list[int]:
+    """Return the map of *new_lines*, version *number*, given its predecessor's.
+
+    The diff runs without a deadline: maps are stored, so a coarse diff
+    taken on a busy machine would skew blame for good.
+    """
+    if not old_lines:
+        return [number] * len(new_lines)
+    opcodes, _ = diff_opcodes(old_lines, new_lines, _ALGORITHM)
+    origins: list[int] = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            origins.extend(old_origins[i1:i2])
+        else:
+            origins.extend(repeat(number, j2 - j1))
+    return origins
+
+
+class LineOrigins:
+    """Computes, stores and reads the ``line_origins`` maps."""
+
+    def __init__(self, session: Session) -> None:
+        self._session = session
+
+    def record(self, rows: Sequence[tuple[int, int, int, str]]) -> None:
+        """Store maps for new ``(version_id, prompt_id, version_number, content)`` rows.
+
+        Rows of one prompt are chained in version order, so a batch needs
+        the database only for each prompt's latest earlier version.  Rows
+        that land before an existing version of their prompt get no map and
+        the maps after them are dropped; both are rebuilt on demand.
+        """
+        by_prompt: dict[int, list[tuple[int, int, int, str]]] = {}
+        for row in rows:
+            by_prompt.setdefault(row[1], []).append(row)
+        for versions in by_prompt.values():
+            versions.sort(key=lambda row: row[2])
+        new_ids = [row[0] for row in rows]
+
+        latest = {
+            prompt_id: number
+            for prompt_id, number in self._session.execute(
+                select(PromptVersion.prompt_id, func.max(PromptVersion.version_number))
+                .where(
+                    PromptVersion.prompt_id.in_(by_prompt),
+                    PromptVersion.id.not_in(new_ids),
+                )
+                .group_by(PromptVersion.prompt_id)
+            )
+        }
+        gaps = {p for p, versions in by_prompt.items() if latest.get(p, 0) > versions[0][2]}
+        for prompt_id in gaps:
+            self.invalidate(prompt_id, after=by_prompt.pop(prompt_id)[0][2])
+        predecessors = self._load([(p, latest[p]) for p in by_prompt if p in latest])
+
+        values = []
+        for prompt_id, versions in by_prompt.items():
+            lines, origins = predecessors.get(prompt_id, ([], []))
+            for version_id, _, number, content in versions:
+                new_lines = content.splitlines()
+                origins = advance_origins(lines, origins, new_lines, number)
+                lines = new_lines
+                values.append({"version_id": version_id, "data": encode_origins(origins)})
+        self._write(values)
+
+    def blame(self, version: PromptVersion) -> list[BlameLine]:
+        """Attribute every line of *version* to the version that introduced it."""
+        lines = version.content.splitlines()
+        origins = self._origins(version.prompt_id, version.version_number)
+        created = dict(
+            self._session.execute(
+                select(PromptVersion.version_number, PromptVersion.created_at).where(
+                    PromptVersion.prompt_id == version.prompt_id,
+                    PromptVersion.version_number.in_(set(origins)),
+                )
+            ).all()
+        )
+        return [
+            BlameLine(index, origin, created.get(origin), line)
+            for index, (line, origin) in enumerate(zip(lines, origins, strict=True), start=1)
+        ]
+
+    def _origins(self, prompt_id: int, version_number: int) -> list[int]:
+        """Return the map of a version, rebuilding missing maps back to a stored one."""
+        base = self._session.execute(
+            select(PromptVersion.version_number, line_origins.c.data)
+            .join(line_origins, line_origins.c.version_id == PromptVersion.id)
+            .where(
+                PromptVersion.prompt_id == prompt_id,
+                PromptVersion.version_number <= version_number,
+            )
+            .order_by(PromptVersion.version_number.desc())
+            .limit(1)
+        ).first()
+        if base is not None and base.version_number == version_number:
+            return decode_origins(base.data)
+
+        start = base.version_number if base else 0
+        lines: list[str] = []
+        origins = decode_origins(base.data) if base else []
+        values = []
+        for version in self._stream(prompt_id, start, version_number):
+            new_lines = version.content.splitlines()
+            if version.version_number > start:
+                origins = advance_origins(lines, origins, new_lines, version.version_number)
+                values.append({"version_id": version.id, "data": encode_origins(origins)})
+            lines = new_lines
+        try:
+            self._write(values)
+        except OperationalError as exc:
+            # Read-only or busy connections still blame, they just don't keep the result.
+            if "readonly" not in str(exc) and not is_busy(exc):
+                raise
+        return origins
+
+    def _load(self, keys: list[tuple[int, int]]) -> dict[int, tuple[list[str], list[int]]]:
+        """Return ``{prompt_id: (lines, origins)}`` for ``(prompt_id, version_number)`` keys."""
+        if not keys:
+            return {}
+        loaded = {}
+        rows = self._session.execute(
+            select(PromptVersion, line_origins.c.data)
+            .outerjoin(line_origins, line_origins.c.version_id == PromptVersion.id)
+            .options(joinedload(PromptVersion.blob))
+            .where(tuple_(PromptVersion.prompt_id, PromptVersion.version_number).in_(keys))
+        )
+        for version, data in rows:
+            origins = (
+                decode_origins(data)
+                if data is not None
+                else self._origins(version.prompt_id, version.version_number)
+            )
+            loaded[version.prompt_id] = (version.content.splitlines(), origins)
+        return loaded
+
+    def _stream(self, prompt_id: int, first: int, last: int) -> Iterator[PromptVersion]:
+        decoder = SequentialDecoder()
+        for version in self._session.scalars(
+            select(PromptVersion)
+            .options(joinedload(PromptVersion.blob))
+            .where(
+                PromptVersion.prompt_id == prompt_id,
+                PromptVersion.version_number.between(first, last),
+            )
+            .order_by(PromptVersion.version_number)
+            .execution_options(yield_per=_REPLAY_CHUNK)
+        ):
+            decoder.decode(version.blob)
+            yield version
+
+    def invalidate(self, prompt_id: int, after: int = 0) -> None:
+        """Drop the maps of a prompt's versions numbered above *after*."""
+        later = select(PromptVersion.id).where(
+            PromptVersion.prompt_id == prompt_id,
+            PromptVersion.version_number > after,
+        )
+        self._session.execute(line_origins.delete().where(line_origins.c.version_id.in_(later)))
+
+    def _write(self, values: list[dict[str, object]]) -> None:
+        pending = iter(values)
+        while batch := list(islice(pending, _WRITE_BATCH)):
+            self._session.execute(insert(line_origins), batch)
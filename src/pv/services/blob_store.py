@@ -0,0 +1,321 @@
+"""Content-addressed storage for prompt bodies."""
+
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from pv.compression import check_codec, compress, train_dictionary
+from pv.config import StorageSettings
+from pv.delta import make_delta
+from pv.minhash import band_buckets, signature
+from pv.models.prompt import (
+    CompressionDict,
+    ContentBlob,
+    PromptVersion,
+    diff_cache,
+    minhash_bands,
+)
+
+_RECOMPRESS_BATCH = 500
+
+
+def content_hash(content: str) -> str:
+    """Return the SHA-256 hex digest used to address *content*."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class RecompressStats:
+    """Outcome of :meth:`BlobStore.recompress`."""
+
+    blobs: int
+    bytes_before: int
+    bytes_after: int
+
+
+class SequentialDecoder:
+    """Decodes the blobs of a stream of versions, each against the one before.
+
+    Consecutive versions of a prompt are usually stored as deltas of each
+    other.  Streaming readers load versions in chunks and let earlier ones
+    go, so the decoder keeps the last decoded body and applies the next
+    delta to it directly instead of reloading its chain.
+    """
+
+    def __init__(self) -> None:
+        self._previous: tuple[str, bytes] | None = None
+
+    def decode(self, blob: ContentBlob) -> bytes:
+        """Return the body of *blob* and remember it as the next one's base."""
+        raw = blob.raw(self._previous)
+        self._previous = (blob.content_hash, raw)
+        return raw
+
+
+class BlobStore:
+    """Stores each distinct prompt body exactly once, keyed by its hash."""
+
+    def __init__(self, session: Session, settings: StorageSettings | None = None) -> None:
+        self._session = session
+        self._settings = settings or StorageSettings()
+        self._dictionaries: dict[str, CompressionDict | None] = {}
+
+    def get(self, digest: str) -> ContentBlob | None:
+        """Return the blob for *digest*, or ``None`` if it is not stored."""
+        return self._session.get(ContentBlob, digest)
+
+    def put(self, content: str, base_hash: str | None = None) -> ContentBlob:
+        """Return the blob holding *content*, inserting it if it is new.
+
+        In delta mode a new blob is stored as a delta against *base_hash*
+        (the previous version's blob) unless that would exceed the keyframe
+        interval or the delta is no smaller than the body itself.  The
+        payload is then compressed with the configured codec.  New blobs get
+        a MinHash signature and are added to the LSH band index.
+        """
+        digest = content_hash(content)
+        blob = self.get(digest)
+        if blob is not None:
+            return blob
+        base = self.get(base_hash) if base_hash and self._settings.mode == "delta" else None
+        blob = self._build(digest, content, base)
+        self._session.add(blob)
+        self._session.flush()
+        self._add_bands([(digest, blob.minhash)])
+        return blob
+
+    def put_many(self, items: Sequence[tuple[str, str | None]]) -> list[str]:
+        """Like :meth:`put` for many ``(content, base_hash)`` pairs at once.
+
+        Existing blobs and delta bases are looked up with a single query and
+        new blobs are inserted with one executemany, bypassing the unit of
+        work.  A base may be a blob created earlier in the same call.
+        Returns the content hashes in input order.
+        """
+        delta = self._settings.mode == "delta"
+        digests = [content_hash(content) for content, _ in items]
+        wanted = set(digests)
+        if delta:
+            wanted.update(base for _, base in items if base)
+        # digest -> (raw body, depth) for every blob usable as a delta base.
+        bases: dict[str, tuple[bytes, int]] = {}
+        existing: set[str] = set()
+        for blob in self._session.execute(
+            select(ContentBlob).where(ContentBlob.content_hash.in_(wanted))
+        ).scalars():
+            existing.add(blob.content_hash)
+            if delta:
+                bases[blob.content_hash] = (blob.raw(), blob.depth)
+
+        dictionary = self.latest_dictionary()
+        rows: list[dict[str, object]] = []
+        signatures: list[tuple[str, bytes | None]] = []
+        for (content, base_hash), digest in zip(items, digests, strict=True):
+            if digest in existing:
+                continue
+            existing.add(digest)
+            data = content.encode("utf-8")
+            base = bases.get(base_hash) if base_hash else None
+            row = self._row(digest, data, base_hash, base, dictionary)
+            row["minhash"] = sig = signature(content)
+            rows.append(row)
+            signatures.append((digest, sig))
+            if delta:
+                bases[digest] = (data, base[1] + 1 if row["base_hash"] else 0)
+        if rows:
+            self._session.execute(insert(ContentBlob), rows)
+            self._add_bands(signatures)
+        return digests
+
+    def _add_bands(self, signatures: Sequence[tuple[str, bytes | None]]) -> None:
+        """Index ``(digest, minhash)`` pairs in ``minhash_bands``."""
+        rows = [
+            {"band": band, "bucket": bucket, "content_hash": digest}
+            for digest, sig in signatures
+            if sig is not None
+            for band, bucket in enumerate(band_buckets(sig))
+        ]
+        if rows:
+            self._session.execute(insert(minhash_bands), rows)
+
+    def _row(
+        self,
+        digest: str,
+        data: bytes,
+        base_hash: str | None,
+        base: tuple[bytes, int] | None,
+        dictionary: CompressionDict | None,
+    ) -> dict[str, object]:
+        """Encode *data* as a ``content_blobs`` row, as :meth:`_build` would."""
+        row: dict[str, object] = {
+            "content_hash": digest,
+            "size": len(data),
+            "base_hash": None,
+            "depth": 0,
+        }
+        payload = data
+        if base is not None and base[1] + 1 < self._settings.keyframe_interval:
+            delta = make_delta(base[0], data)
+            if len(delta) < len(data):
+                payload = delta
+                row["base_hash"], row["depth"] = base_hash, base[1] + 1
+        row["data"], row["codec"], used = self._pack(
+            payload, self._settings.compression, dictionary
+        )
+        row["dict_id"] = used.id if used is not None else None
+        return row
+
+    def _build(self, digest: str, content: str, base: ContentBlob | None) -> ContentBlob:
+        """Encode *content* as a new, not yet added, blob."""
+        data = content.encode("utf-8")
+        blob = ContentBlob(
+            content_hash=digest, size=len(data), depth=0, minhash=signature(content)
+        )
+        payload = data
+        if (
+            base is not None
+            and self._settings.mode == "delta"
+            and base.depth + 1 < self._settings.keyframe_interval
+        ):
+            delta = make_delta(base.raw(), data)
+            if len(delta) < len(data):
+                payload = delta
+                blob.base = base
+                blob.depth = base.depth + 1
+        self._encode(blob, payload, self._settings.compression, self.latest_dictionary())
+        blob.__dict__["_raw"] = data
+        return blob
+
+    @staticmethod
+    def _encode(
+        blob: ContentBlob, payload: bytes, codec: str, dictionary: CompressionDict | None
+    ) -> None:
+        """Store *payload* on *blob*, compressed only when that saves space."""
+        blob.data, blob.codec, blob.dictionary = BlobStore._pack(payload, codec, dictionary)
+
+    @staticmethod
+    def _pack(
+        payload: bytes, codec: str, dictionary: CompressionDict | None
+    ) -> tuple[bytes, str, CompressionDict | None]:
+        """Return ``(data, codec, dictionary)`` for *payload*, compressed if smaller."""
+        if dictionary is not None and dictionary.codec != codec:
+            dictionary = None
+        packed = compress(payload, codec, dictionary.data if dictionary else None)
+        if codec != "none" and len(packed) < len(payload):
+            return packed, codec, dictionary
+        return payload, "none", None
+
+    # ------------------------------------------------------------------
+    # Dictionaries and recompression
+    # ------------------------------------------------------------------
+
+    def latest_dictionary(self, codec: str | None = None) -> CompressionDict | None:
+        """Return the newest trained dictionary for *codec* (default: configured)."""
+        codec = codec or self._settings.compression
+        if codec not in self._dictionaries:
+            self._dictionaries[codec] = self._session.execute(
+                select(CompressionDict)
+                .where(CompressionDict.codec == codec)
+                .order_by(CompressionDict.id.desc())
+                .limit(1)
+            ).scalar_one_or_none()
+        return self._dictionaries[codec]
+
+    def train_dictionary(
+        self, codec: str | None = None, size: int = 16 * 1024, sample_limit: int = 2000
+    ) -> CompressionDict:
+        """Train a dictionary from up to *sample_limit* stored bodies and save it."""
+        codec = codec or self._settings.compression
+        blobs = self._session.execute(
+            select(ContentBlob).order_by(func.random()).limit(sample_limit)
+        ).scalars()
+        samples = [blob.raw() for blob in blobs]
+        dictionary = CompressionDict(codec=codec, data=train_dictionary(samples, codec, size))
+        self._session.add(dictionary)
+        self._session.flush()
+        self._dictionaries[codec] = dictionary
+        return dictionary
+
+    def recompress(
+        self, codec: str | None = None, dictionary: CompressionDict | None = None
+    ) -> RecompressStats:
+        """Re-encode every stored blob with *codec* and *dictionary*.
+
+        Payloads (full bodies or deltas) are unchanged; only their
+        compression is.  Passing no dictionary uses the latest one trained
+        for the codec.
+        """
+        codec = codec or self._settings.compression
+        check_codec(codec)
+        if dictionary is None:
+            dictionary = self.latest_dictionary(codec)
+        digests = list(self._session.execute(select(ContentBlob.content_hash)).scalars())
+        before = after = 0
+        for start in range(0, len(digests), _RECOMPRESS_BATCH):
+            batch = self._session.execute(
+                select(ContentBlob).where(
+                    ContentBlob.content_hash.in_(digests[start : start + _RECOMPRESS_BATCH])
+                )
+            ).scalars()
+            for blob in batch:
+                before += len(blob.data)
+                self._encode(blob, blob.payload(), codec, dictionary)
+                after += len(blob.data)
+            self._session.flush()
+        return RecompressStats(blobs=len(digests), bytes_before=before, bytes_after=after)
+
+    # ------------------------------------------------------------------
+    # Garbage collection
+    # ------------------------------------------------------------------
+
+    def prune(self, digests: Iterable[str]) -> int:
+        """Delete any of *digests* no longer referenced by a version.
+
+        Blobs that other blobs are stored as deltas against are kept until
+        their dependents go, at which point they are pruned as well.
+        Returns the number of blobs removed.
+        """
+        candidates = set(digests)
+        removed = 0
+        while candidates:
+            referenced = set(
+                self._session.execute(
+                    select(PromptVersion.content_hash)
+                    .where(PromptVersion.content_hash.in_(candidates))
+                    .distinct()
+                ).scalars()
+            )
+            referenced.update(
+                self._session.execute(
+                    select(ContentBlob.base_hash)
+                    .where(ContentBlob.base_hash.in_(candidates))
+                    .distinct()
+                ).scalars()
+            )
+            orphans = candidates - referenced
+            if not orphans:
+                break
+            bases = {
+                b
+                for b in self._session.execute(
+                    select(ContentBlob.base_hash).where(ContentBlob.content_hash.in_(orphans))
+                ).scalars()
+                if b is not None
+            }
+            self._session.execute(
+                delete(minhash_bands).where(minhash_bands.c.content_hash.in_(orphans))
+            )
+            self._session.execute(
+                delete(diff_cache).where(
+                    diff_cache.c.hash_a.in_(orphans) | diff_cache.c.hash_b.in_(orphans)
+                )
+            )
+            self._session.execute(delete(ContentBlob).where(ContentBlob.content_hash.in_(orphans)))
+            removed += len(orphans)
+            candidates = (candidates - orphans) | bases
+        return removed
@@ -0,0 +1,103 @@
+"""Persistent cache of rendered diffs between content blobs."""
+
+from __future__ import annotations
+
+import time
+
+from sqlalchemy import ColumnElement, Executable, func, select, text, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from pv.compression import compress, decompress
+from pv.database import is_busy
+from pv.models.prompt import diff_cache
+
+# A hit refreshes ``used_at`` only when it is older than this, in seconds, so
+# most hits stay pure reads; eviction order is that coarse.
+_TOUCH_INTERVAL = 3600.0
+
+
+class DiffCache:
+    """Stores diff hunks in ``diff_cache``, evicting least recently used entries.
+
+    Entries are keyed by ``(hash_a, hash_b, algorithm, context)`` and hold
+    the hunks without the ``---``/``+++`` header, which names the prompt, so
+    any two versions with the same bodies share an entry.  Writes are best
+    effort: on a read-only connection (the ``readonly`` profile), or while
+    another writer holds the lock, the cache is only read.  A hit writes
+    nothing unless its entry's ``used_at`` is over an hour old, so serving a
+    cached diff does not take the write lock.
+    """
+
+    def __init__(self, session: Session, codec: str = "zlib") -> None:
+        self._session = session
+        self._codec = codec
+
+    def get(self, hash_a: str, hash_b: str, algorithm: str, context: int) -> str | None:
+        """Return the cached hunks for the key, or ``None`` on a miss."""
+        key = _key(hash_a, hash_b, algorithm, context)
+        row = self._session.execute(
+            select(diff_cache.c.data, diff_cache.c.codec, diff_cache.c.used_at).where(*key)
+        ).one_or_none()
+        if row is None:
+            return None
+        now = time.time()
+        if row.used_at < now - _TOUCH_INTERVAL:
+            self._write(update(diff_cache).where(*key).values(used_at=now))
+        return decompress(row.data, row.codec).decode("utf-8")
+
+    def put(
+        self, hash_a: str, hash_b: str, algorithm: str, context: int, hunks: str, max_bytes: int
+    ) -> None:
+        """Store *hunks*, then evict the oldest entries beyond *max_bytes* in total."""
+        data = compress(hunks.encode("utf-8"), self._codec)
+        values = {
+            "codec": self._codec,
+            "data": data,
+            "size": len(data),
+            "used_at": time.time(),
+        }
+        statement = insert(diff_cache).values(
+            hash_a=hash_a, hash_b=hash_b, algorithm=algorithm, context=context, **values
+        )
+        if self._write(
+            statement.on_conflict_do_update(
+                index_elements=list(diff_cache.primary_key), set_=values
+            )
+        ):
+            self.evict(max_bytes)
+
+    def evict(self, max_bytes: int) -> None:
+        """Drop the least recently used entries until at most *max_bytes* remain."""
+        total = self._session.execute(select(func.coalesce(func.sum(diff_cache.c.size), 0)))
+        if total.scalar_one() <= max_bytes:
+            return
+        # Keep the newest entries whose running total fits the budget.
+        self._write(
+            text(
+                "DELETE FROM diff_cache WHERE rowid IN (SELECT rowid FROM ("
+                "SELECT rowid, sum(size) OVER (ORDER BY used_at DESC, rowid DESC) AS running"
+                " FROM diff_cache) WHERE running > :budget)"
+            ).bindparams(budget=max_bytes)
+        )
+
+    def _write(self, statement: Executable) -> bool:
+        try:
+            self._session.execute(statement)
+        except OperationalError as exc:
+            if "readonly" not in str(exc) and not is_busy(exc):
+                raise
+            return False
+        return True
+
+
+def _key(
+    hash_a: str, hash_b: str, algorithm: str, context: int
+) -> tuple[ColumnElement[bool], ...]:
+    return (
+        diff_cache.c.hash_a == hash_a,
+        diff_cache.c.hash_b == hash_b,
+        diff_cache.c.algorithm == algorithm,
+        diff_cache.c.context == context,
+    )
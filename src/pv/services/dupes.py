@@ -0,0 +1,165 @@
+"""Near-duplicate detection across prompts from MinHash signatures."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from itertools import islice
+
+from sqlalchemy import func, select, union
+from sqlalchemy.orm import Session
+
+from pv.minhash import similarity
+from pv.models.prompt import ContentBlob, Prompt, PromptVersion, minhash_bands
+
+_LOOKUP_BATCH = 500
+
+
+@dataclass(frozen=True)
+class DuplicateCluster:
+    """Versions of two or more prompts whose bodies are near-identical.
+
+    ``similarity`` is the lowest estimated Jaccard similarity among the
+    pairs that joined the cluster (1.0 when all bodies are identical).
+    ``versions`` holds ``(prompt name, version number)`` pairs, sorted.
+    """
+
+    similarity: float
+    versions: tuple[tuple[str, int], ...]
+
+    @property
+    def prompts(self) -> list[str]:
+        """The distinct prompt names in the cluster, sorted."""
+        return sorted({name for name, _ in self.versions})
+
+
+class DuplicateFinder:
+    """Clusters blobs through the ``minhash_bands`` LSH index."""
+
+    def __init__(self, session: Session) -> None:
+        self._session = session
+
+    def clusters(self, threshold: float = 0.9) -> list[DuplicateCluster]:
+        """Return clusters of versions spanning several prompts, largest first.
+
+        Candidate pairs are blobs sharing a band bucket, found with one
+        self-join on the band index instead of comparing every pair; each
+        candidate is confirmed against *threshold* with the full signatures
+        and confirmed pairs are merged transitively.  Versions of different
+        prompts sharing a blob always cluster.  Raises ``ValueError`` if
+        *threshold* is not in (0, 1].
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("Threshold must be greater than 0 and at most 1.")
+        parent: dict[str, str] = {}
+        weakest: dict[str, float] = {}
+
+        def find(digest: str) -> str:
+            root = parent.setdefault(digest, digest)
+            while root != parent[root]:
+                parent[root] = parent[parent[root]]
+                root = parent[root]
+            return root
+
+        for a, b, score in self._similar_pairs(threshold):
+            root_a, root_b = find(a), find(b)
+            low = min(score, weakest.get(root_a, 1.0), weakest.get(root_b, 1.0))
+            parent[root_b] = root_a
+            weakest[root_a] = low
+
+        shared = (
+            select(PromptVersion.content_hash)
+            .group_by(PromptVersion.content_hash)
+            .having(func.count(PromptVersion.prompt_id.distinct()) > 1)
+        )
+        for digest in self._session.execute(shared).scalars():
+            find(digest)
+
+        members: dict[str, list[tuple[str, int]]] = {}
+        for batch in _batches(parent):
+            rows = self._session.execute(
+                select(PromptVersion.content_hash, Prompt.name, PromptVersion.version_number)
+                .join(Prompt)
+                .where(PromptVersion.content_hash.in_(batch))
+            )
+            for digest, name, number in rows:
+                members.setdefault(find(digest), []).append((name, number))
+
+        clusters = [
+            DuplicateCluster(weakest.get(root, 1.0), tuple(sorted(versions)))
+            for root, versions in members.items()
+            if len({name for name, _ in versions}) > 1
+        ]
+        clusters.sort(key=lambda c: (-len(c.prompts), -c.similarity, c.versions))
+        return clusters
+
+    def _similar_pairs(self, threshold: float) -> Iterator[tuple[str, str, float]]:
+        """Yield ``(digest, digest, similarity)`` for confirmed candidate pairs.
+
+        Successive versions of one prompt mostly share their band buckets,
+        so pairing every blob in a bucket would be quadratic in the length
+        of a history.  Instead each prompt gets one representative blob per
+        bucket: its other blobs there are paired with that representative
+        only, and representatives of different prompts with each other.
+        Candidates are deduplicated in SQL and streamed with both
+        signatures.
+        """
+        bands = minhash_bands
+        busy = (
+            select(bands.c.band, bands.c.bucket)
+            .group_by(bands.c.band, bands.c.bucket)
+            .having(func.count() > 1)
+            .cte("busy")
+        )
+        members = (
+            select(bands.c.band, bands.c.bucket, PromptVersion.prompt_id, bands.c.content_hash)
+            .join(busy, (busy.c.band == bands.c.band) & (busy.c.bucket == bands.c.bucket))
+            .join(PromptVersion, PromptVersion.content_hash == bands.c.content_hash)
+            .distinct()
+            .cte("members")
+        )
+        reps = (
+            select(
+                members.c.band,
+                members.c.bucket,
+                members.c.prompt_id,
+                func.min(members.c.content_hash).label("rep"),
+            )
+            .group_by(members.c.band, members.c.bucket, members.c.prompt_id)
+            .cte("reps")
+        )
+        other = reps.alias("other")
+        within = select(reps.c.rep, members.c.content_hash).join(
+            members,
+            (members.c.band == reps.c.band)
+            & (members.c.bucket == reps.c.bucket)
+            & (members.c.prompt_id == reps.c.prompt_id)
+            & (members.c.content_hash != reps.c.rep),
+        )
+        across = select(func.min(reps.c.rep, other.c.rep), func.max(reps.c.rep, other.c.rep)).join(
+            other,
+            (other.c.band == reps.c.band)
+            & (other.c.bucket == reps.c.bucket)
+            & (other.c.prompt_id > reps.c.prompt_id)
+            & (other.c.rep != reps.c.rep),
+        )
+        pairs = union(within, across).subquery("pairs")
+        x, y = pairs.c
+        blob_x = ContentBlob.__table__.alias("blob_x")
+        blob_y = ContentBlob.__table__.alias("blob_y")
+        rows = self._session.execute(
+            select(x, y, blob_x.c.minhash, blob_y.c.minhash)
+            .join(blob_x, blob_x.c.content_hash == x)
+            .join(blob_y, blob_y.c.content_hash == y)
+            .execution_options(yield_per=_LOOKUP_BATCH)
+        )
+        for a, b, sig_a, sig_b in rows:
+            score = similarity(sig_a, sig_b)
+            if score >= threshold:
+                yield a, b, score
+
+
+def _batches(items: Iterable[str]) -> Iterator[list[str]]:
+    pending = iter(items)
+    while batch := list(islice(pending, _LOOKUP_BATCH)):
+        yield batch
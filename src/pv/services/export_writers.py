@@ -0,0 +1,85 @@
+"""Destinations for ``pv export --all``: a directory, a tar file or a zip file."""
+
+from __future__ import annotations
+
+import abc
+import io
+import tarfile
+import time
+import zipfile
+from pathlib import Path
+from urllib.parse import quote
+
+_TAR_MODES = {".tar": "w", ".tar.gz": "w:gz", ".tgz": "w:gz", ".tar.xz": "w:xz"}
+
+
+def export_filename(prompt_name: str, suffix: str = ".json") -> str:
+    """Return a file name for *prompt_name*'s export that is safe on any platform."""
+    return quote(prompt_name, safe=" -_.") + suffix
+
+
+class ExportWriter(abc.ABC):
+    """Receives one serialized document per prompt.
+
+    ``concurrent`` writers may be called from several threads at once;
+    the others are called from one thread, in prompt-name order.
+    """
+
+    concurrent = False
+
+    @abc.abstractmethod
+    def add(self, filename: str, data: bytes) -> None:
+        """Write *data* as *filename* in the output."""
+
+    def close(self) -> None:  # noqa: B027 - optional; writers with nothing to flush keep it
+        """Finish the output."""
+
+
+class DirectoryWriter(ExportWriter):
+    concurrent = True
+
+    def __init__(self, path: Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        self._path = path
+
+    def add(self, filename: str, data: bytes) -> None:
+        (self._path / filename).write_bytes(data)
+
+
+class TarWriter(ExportWriter):
+    def __init__(self, path: Path, mode: str) -> None:
+        self._tar = tarfile.open(path, mode)  # noqa: SIM115 - closed in close()
+        self._mtime = time.time()
+
+    def add(self, filename: str, data: bytes) -> None:
+        info = tarfile.TarInfo(filename)
+        info.size = len(data)
+        info.mtime = self._mtime
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self) -> None:
+        self._tar.close()
+
+
+class ZipWriter(ExportWriter):
+    def __init__(self, path: Path) -> None:
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+
+    def add(self, filename: str, data: bytes) -> None:
+        self._zip.writestr(filename, data)
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+def open_writer(target: Path) -> ExportWriter:
+    """Pick a writer by *target*'s suffix: a zip, a tar archive or a directory."""
+    name = target.name.lower()
+    if name.endswith(".zip"):
+        return ZipWriter(target)
+    for suffix, mode in _TAR_MODES.items():
+        if name.endswith(suffix):
+            return TarWriter(target, mode)
+    if target.exists() and not target.is_dir():
+        raise ValueError(f"{target} exists and is not a directory.")
+    return DirectoryWriter(target)
@@ -2,22 +2,181 @@
 
 from __future__ import annotations
 
-import difflib
-import hashlib
+import datetime
+import io
 import json
+from collections import deque
+from collections.abc import Collection, Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass, replace
+from itertools import islice
 from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Literal, NamedTuple, overload
 
-from sqlalchemy import select
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import ColumnElement, exists, func, insert, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
 
-from pv.models.prompt import Prompt, PromptVersion, Tag
+from pv.config import DiffSettings, StorageSettings
+from pv.database import begin_write
+from pv.diffing import (
+    TokenCache,
+    TokenDiff,
+    check_granularity,
+    diff_opcodes,
+    diff_tokens,
+    format_hunks,
+    format_unified,
+)
+from pv.models.prompt import Prompt, PromptVersion, Tag, prompt_version_tags
+from pv.services.blame import BlameLine, LineOrigins
+from pv.services.blob_store import BlobStore, SequentialDecoder, content_hash
+from pv.services.diff_cache import DiffCache
+from pv.services.dupes import DuplicateCluster, DuplicateFinder
+from pv.services.search import GrepMatch, SearchHit, SearchIndex
+
+if TYPE_CHECKING:
+    from pydantic import ValidationError
+
+    from pv.schemas import ExportPrompt
+
+# Shared by every service in the process (the daemon keeps it warm), so a
+# body diffed against many others is tokenized once per granularity.
+_token_cache = TokenCache()
+
+
+@dataclass(frozen=True)
+class PromptSummary:
+    """A prompt's name with its version count and latest version number."""
+
+    name: str
+    versions: int
+    latest: int | None
+    created_at: datetime.datetime | None
+
+
+@dataclass(frozen=True)
+class FoundVersion:
+    """A version matched by :meth:`PromptService.find_versions`, with all its tags."""
+
+    name: str
+    version_number: int
+    tags: tuple[str, ...]
+    created_at: datetime.datetime | None
+
+
+@dataclass(frozen=True)
+class AddResult:
+    """Outcome of one record passed to :meth:`PromptService.add_many`."""
+
+    index: int
+    name: str | None
+    version_number: int | None = None
+    content_hash: str | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class ImportStats:
+    """Running totals of :meth:`PromptService.import_prompts`."""
+
+    prompts: int = 0
+    versions: int = 0
+    skipped: int = 0
+
+
+@dataclass(frozen=True)
+class ExportStats:
+    """What :meth:`PromptService.export_all` wrote."""
+
+    prompts: int
+    versions: int
+    bytes: int
+
+
+class _NewVersion(NamedTuple):
+    prompt_id: int
+    version_number: int
+    content: str
+    base_hash: str | None
+    note: str | None
+    tags: list[str]
+    created_at: datetime.datetime | None = None
+
+
+def _utcnow() -> datetime.datetime:
+    # Naive UTC, matching what SQLite's CURRENT_TIMESTAMP default stores.
+    return datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
+def _naive_utc(value: datetime.datetime | None) -> datetime.datetime | None:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.UTC).replace(tzinfo=None)
+
+
+def _prefix_range(prefix: str) -> tuple[str, str | None]:
+    """Return ``(low, high)`` with ``low <= s < high`` exactly for strings starting with *prefix*.
+
+    SQLite compares text as UTF-8 bytes, which orders like code points, so
+    the range is usable on an ordinary index where ``LIKE 'prefix%'`` is
+    not.  ``high`` is ``None`` when no upper bound is needed.
+    """
+    stem = prefix
+    while stem and ord(stem[-1]) == 0x10FFFF:
+        stem = stem[:-1]
+    if not stem:
+        return prefix, None
+    following = ord(stem[-1]) + 1
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000
+    return prefix, stem[:-1] + chr(following)
+
+
+def _describe(exc: ValidationError) -> str:
+    """Flatten a pydantic error into one line."""
+    return "; ".join(
+        f"{'.'.join(map(str, e['loc'])) or 'record'}: {e['msg']}" for e in exc.errors()
+    )
+
+
+def _export_header(prompt: Prompt) -> dict[str, Any]:
+    return {
+        "name": prompt.name,
+        "created_at": prompt.created_at.isoformat() if prompt.created_at else None,
+    }
+
+
+def _export_entry(version: PromptVersion) -> dict[str, Any]:
+    return {
+        "version_number": version.version_number,
+        "content": version.content,
+        "content_hash": version.content_hash,
+        "note": version.note,
+        "tags": [t.name for t in version.tags],
+        "created_at": version.created_at.isoformat() if version.created_at else None,
+    }
+
+
+_ADD_MANY_BATCH = 500
+_IMPORT_BATCH = 1000
+_EXPORT_CHUNK = 200
+_TAG_SEPARATOR = "\x1f"
 
 
 class PromptService:
     """Service layer wrapping all prompt operations."""
 
-    def __init__(self, session: Session) -> None:
+    def __init__(self, session: Session, storage: StorageSettings | None = None) -> None:
         self._session = session
+        self._blobs = BlobStore(session, storage)
+        self._search = SearchIndex(session)
+        self._origins = LineOrigins(session)
+        self._diffs = DiffCache(session, (storage or StorageSettings()).compression)
 
     # ------------------------------------------------------------------
     # Prompt CRUD
@@ -48,11 +207,36 @@ class PromptService:
         """Return all prompts ordered by name."""
         return list(self._session.execute(select(Prompt).order_by(Prompt.name)).scalars().all())
 
+    def list_prompt_summaries(self) -> list[PromptSummary]:
+        """Return a summary of every prompt, ordered by name, in one query."""
+        rows = self._session.execute(
+            select(
+                Prompt.name,
+                func.count(PromptVersion.id),
+                func.max(PromptVersion.version_number),
+                Prompt.created_at,
+            )
+            .outerjoin(PromptVersion, PromptVersion.prompt_id == Prompt.id)
+            .group_by(Prompt.id)
+            .order_by(Prompt.name)
+        )
+        return [PromptSummary(*row) for row in rows]
+
     def delete_prompt(self, name: str) -> None:
         """Delete a prompt and all its versions."""
         prompt = self.get_prompt(name)
+        digests = set(
+            self._session.execute(
+                select(PromptVersion.content_hash).where(PromptVersion.prompt_id == prompt.id)
+            ).scalars()
+        )
+        self._search.remove(
+            (version.id, version.content) for version in self._stream_versions(prompt.id)
+        )
+        self._origins.invalidate(prompt.id)
         self._session.delete(prompt)
         self._session.flush()
+        self._blobs.prune(digests)
 
     # ------------------------------------------------------------------
     # Version CRUD
@@ -60,18 +244,7 @@ class PromptService:
 
     @staticmethod
     def _content_hash(content: str) -> str:
-        return hashlib.sha256(content.encode("utf-8")).hexdigest()
-
-    def _get_or_create_tag(self, tag_name: str) -> Tag:
-        with self._session.no_autoflush:
-            tag = self._session.execute(
-                select(Tag).where(Tag.name == tag_name)
-            ).scalar_one_or_none()
-        if tag is None:
-            tag = Tag(name=tag_name)
-            self._session.add(tag)
-            self._session.flush()
-        return tag
+        return content_hash(content)
 
     def add_version(
         self,
@@ -80,31 +253,225 @@ class PromptService:
         tags: list[str] | None = None,
         note: str | None = None,
     ) -> PromptVersion:
-        """Add a new version to a prompt, creating the prompt if needed."""
+        """Add a new version to a prompt, creating the prompt if needed.
+
+        The next version number is read under the write lock, taken first
+        if the session's transaction does not hold it yet (see
+        :func:`pv.database.begin_write`), so concurrent writers queue
+        instead of picking the same number.
+        """
+        begin_write(self._session)
         try:
             prompt = self.get_prompt(prompt_name)
         except ValueError:
             prompt = self.create_prompt(prompt_name)
 
-        # Determine next version number
-        max_ver = max((v.version_number for v in prompt.versions), default=0)
-        version_number = max_ver + 1
+        # Next version number and the predecessor's body (the delta base) come
+        # from one lookup on the (prompt_id, version_number) index.
+        previous = self._session.execute(
+            select(PromptVersion.version_number, PromptVersion.content_hash)
+            .where(PromptVersion.prompt_id == prompt.id)
+            .order_by(PromptVersion.version_number.desc())
+            .limit(1)
+        ).first()
+        version_number = previous.version_number + 1 if previous else 1
 
+        blob = self._blobs.put(content, base_hash=previous.content_hash if previous else None)
         version = PromptVersion(
             prompt_id=prompt.id,
             version_number=version_number,
-            content=content,
-            content_hash=self._content_hash(content),
+            content_hash=blob.content_hash,
             note=note,
         )
+        version.blob = blob
         self._session.add(version)
-        if tags:
-            for tag_name in tags:
-                version.tags.append(self._get_or_create_tag(tag_name))
 
-        self._session.flush()
+        try:
+            self._session.flush()
+        except IntegrityError:
+            # The number was read under the write lock, so the clash is with
+            # a row the caller's own transaction holds.  Nothing is rolled
+            # back here, so the caller decides what to keep.
+            raise ValueError(
+                f"Version {version_number} of prompt '{prompt_name}' conflicts with a version"
+                " already in this transaction."
+            ) from None
+        if tags:
+            self._write_tags(version.id, set(tags), set())
+        self._index_versions([(version.id, prompt.id, version_number, content)])
         return version
 
+    def add_many(self, records: Iterable[str | Mapping[str, Any]]) -> list[AddResult]:
+        """Add many versions, with the same semantics as :meth:`add_version`.
+
+        *records* are JSON lines (blank lines are skipped) or already decoded
+        mappings with ``name``, ``content`` and optional ``tags`` and
+        ``note``.  They are consumed lazily in batches; each batch resolves
+        prompts, predecessors, blobs and tags with one query apiece and
+        inserts versions and tag links with executemany.  Invalid records are
+        reported and skipped.  Nothing is committed here, so the caller
+        decides whether the whole run is one transaction.
+        """
+        results: list[AddResult] = []
+        numbered = (
+            (index, record)
+            for index, record in enumerate(records, start=1)
+            if not (isinstance(record, str) and not record.strip())
+        )
+        while batch := list(islice(numbered, _ADD_MANY_BATCH)):
+            results.extend(self._add_batch(batch))
+        return results
+
+    def _add_batch(self, batch: list[tuple[int, str | Mapping[str, Any]]]) -> list[AddResult]:
+        from pydantic import ValidationError
+
+        from pv.schemas import AddRecord
+
+        results: dict[int, AddResult] = {}
+        valid: list[tuple[int, AddRecord]] = []
+        for index, raw in batch:
+            try:
+                data = json.loads(raw) if isinstance(raw, str) else raw
+                valid.append((index, AddRecord.model_validate(data)))
+            except json.JSONDecodeError as exc:
+                results[index] = AddResult(index, None, error=f"Invalid JSON: {exc.msg}")
+            except ValidationError as exc:
+                name = data.get("name") if isinstance(data, Mapping) else None
+                results[index] = AddResult(index, name, error=_describe(exc))
+        if valid:
+            for index, result in self._insert_records(valid):
+                results[index] = result
+        return [results[index] for index, _ in batch]
+
+    def _insert_records(self, records: list[tuple[int, Any]]) -> list[tuple[int, AddResult]]:
+        names = {record.name for _, record in records}
+        prompt_ids = self._ids_by_name(Prompt, names)
+
+        # Latest (version_number, content_hash) of every prompt in the batch.
+        latest_number = (
+            select(PromptVersion.prompt_id, func.max(PromptVersion.version_number).label("n"))
+            .where(PromptVersion.prompt_id.in_(prompt_ids.values()))
+            .group_by(PromptVersion.prompt_id)
+            .subquery()
+        )
+        latest: dict[int, tuple[int, str | None]] = {
+            row.prompt_id: (row.version_number, row.content_hash)
+            for row in self._session.execute(
+                select(
+                    PromptVersion.prompt_id,
+                    PromptVersion.version_number,
+                    PromptVersion.content_hash,
+                ).join(
+                    latest_number,
+                    (PromptVersion.prompt_id == latest_number.c.prompt_id)
+                    & (PromptVersion.version_number == latest_number.c.n),
+                )
+            )
+        }
+
+        # Number versions in input order; each record's predecessor is the
+        # previous record for the same prompt, or the stored latest version.
+        planned: list[_NewVersion] = []
+        for _, record in records:
+            prompt_id = prompt_ids[record.name]
+            number, previous_hash = latest.get(prompt_id, (0, None))
+            planned.append(
+                _NewVersion(
+                    prompt_id, number + 1, record.content, previous_hash, record.note, record.tags
+                )
+            )
+            latest[prompt_id] = (number + 1, self._content_hash(record.content))
+
+        hashes = self._write_versions(planned)
+        return [
+            (index, AddResult(index, record.name, new.version_number, digest))
+            for (index, record), new, digest in zip(records, planned, hashes, strict=True)
+        ]
+
+    def _write_versions(self, rows: list[_NewVersion]) -> list[str]:
+        """Insert *rows* with their blobs and tag links; return their content hashes."""
+        hashes = self._blobs.put_many([(row.content, row.base_hash) for row in rows])
+        now = _utcnow()
+        # A plain executemany: SQLite can only return ids in parameter order
+        # by inserting row by row, so the new ids are looked up after.
+        self._session.execute(
+            insert(PromptVersion),
+            [
+                {
+                    "prompt_id": row.prompt_id,
+                    "version_number": row.version_number,
+                    "content_hash": digest,
+                    "note": row.note,
+                    "created_at": row.created_at or now,
+                }
+                for row, digest in zip(rows, hashes, strict=True)
+            ],
+        )
+
+        version_ids = {
+            (prompt_id, number): version_id
+            for version_id, prompt_id, number in self._session.execute(
+                select(
+                    PromptVersion.id, PromptVersion.prompt_id, PromptVersion.version_number
+                ).where(
+                    tuple_(PromptVersion.prompt_id, PromptVersion.version_number).in_(
+                        [(row.prompt_id, row.version_number) for row in rows]
+                    )
+                )
+            )
+        }
+        self._index_versions(
+            [
+                (
+                    version_ids[row.prompt_id, row.version_number],
+                    row.prompt_id,
+                    row.version_number,
+                    row.content,
+                )
+                for row in rows
+            ]
+        )
+
+        tagged = [row for row in rows if row.tags]
+        if tagged:
+            names = {tag for row in tagged for tag in row.tags}
+            tag_ids = self._tag_ids(names, create=names)
+            self._session.execute(
+                insert(prompt_version_tags),
+                [
+                    {
+                        "version_id": version_ids[row.prompt_id, row.version_number],
+                        "tag_id": tag_ids[tag],
+                    }
+                    for row in tagged
+                    for tag in dict.fromkeys(row.tags)
+                ],
+            )
+        return hashes
+
+    def _index_versions(self, rows: list[tuple[int, int, int, str]]) -> None:
+        """Update the secondary indexes for newly written versions.
+
+        *rows* are ``(version_id, prompt_id, version_number, content)``.
+        """
+        self._search.add((version_id, content) for version_id, _, _, content in rows)
+        self._origins.record(rows)
+
+    def _ids_by_name(self, model: type[Prompt] | type[Tag], names: set[str]) -> dict[str, int]:
+        """Return ``{name: id}`` for *names*, inserting rows that don't exist yet."""
+        if not names:
+            return {}
+        found = self._session.execute(select(model.name, model.id).where(model.name.in_(names)))
+        ids: dict[str, int] = {name: id_ for name, id_ in found}
+        missing = sorted(names - ids.keys())
+        if missing:
+            created = self._session.execute(
+                insert(model).returning(model.name, model.id, sort_by_parameter_order=True),
+                [{"name": name} for name in missing],
+            )
+            ids.update((name, id_) for name, id_ in created)
+        return ids
+
     def get_version(self, prompt_name: str, version_number: int) -> PromptVersion:
         """Fetch a specific version of a prompt."""
         prompt = self.get_prompt(prompt_name)
@@ -137,6 +504,41 @@ class PromptService:
             raise ValueError(f"No versions found for prompt '{prompt_name}'.")
         return version
 
+    def get_tagged_version(self, prompt_name: str, tag_name: str) -> PromptVersion:
+        """Fetch the latest version of a prompt carrying *tag_name*.
+
+        One query: the tag's version ids come from the ``(tag_id,
+        version_id)`` index and the prompt's versions are walked newest
+        first until one of them matches.
+        """
+        tagged = (
+            select(prompt_version_tags.c.version_id)
+            .join(Tag, Tag.id == prompt_version_tags.c.tag_id)
+            .where(Tag.name == tag_name)
+        )
+        version = (
+            self._session.execute(
+                select(PromptVersion)
+                .join(Prompt, Prompt.id == PromptVersion.prompt_id)
+                .options(selectinload(PromptVersion.tags))
+                .where(Prompt.name == prompt_name, PromptVersion.id.in_(tagged))
+                .order_by(PromptVersion.version_number.desc())
+                .limit(1)
+            )
+            .scalars()
+            .first()
+        )
+        if version is None:
+            self.get_prompt(prompt_name)
+            raise ValueError(f"No version of prompt '{prompt_name}' is tagged '{tag_name}'.")
+        return version
+
+    def resolve_version(self, prompt_name: str, selector: str) -> PromptVersion:
+        """Fetch a version by number (all digits) or else by tag name."""
+        if selector.isdigit():
+            return self.get_version(prompt_name, int(selector))
+        return self.get_tagged_version(prompt_name, selector)
+
     def list_versions(self, prompt_name: str) -> list[PromptVersion]:
         """List all versions of a prompt."""
         prompt = self.get_prompt(prompt_name)
@@ -160,19 +562,88 @@ class PromptService:
         prompt_name: str,
         v1: int,
         v2: int,
+        settings: DiffSettings | None = None,
+        context: int = 3,
     ) -> str:
-        """Return a unified diff between two versions of a prompt."""
+        """Return a unified diff between two versions of a prompt.
+
+        *settings* pick the algorithm and the cutoffs past which a coarse
+        diff is returned instead (see :mod:`pv.diffing`).  Exact diffs are
+        cached by the pair of content hashes, algorithm and *context*, so
+        repeated diffs of the same bodies, in any prompt, skip decoding and
+        diffing; the caller commits to keep new entries.
+        """
+        settings = settings or DiffSettings()
+        if context < 0:
+            raise ValueError("Context must not be negative.")
+        ver1 = self.get_version(prompt_name, v1)
+        ver2 = self.get_version(prompt_name, v2)
+        if ver1.content_hash == ver2.content_hash:
+            return ""
+        key = (ver1.content_hash, ver2.content_hash, settings.algorithm, context)
+        hunks = self._diffs.get(*key) if settings.cache_size else None
+        if hunks is None:
+            lines1 = ver1.content.splitlines(keepends=True)
+            lines2 = ver2.content.splitlines(keepends=True)
+            opcodes, exact = diff_opcodes(
+                lines1,
+                lines2,
+                settings.algorithm,
+                timeout=settings.timeout,
+                max_lines=settings.max_lines,
+            )
+            hunks = "".join(format_hunks(lines1, lines2, opcodes, context))
+            if exact and settings.cache_size:
+                self._diffs.put(*key, hunks, settings.cache_size)
+        if not hunks:
+            return ""
+        return "".join(format_unified([hunks], f"{prompt_name} v{v1}", f"{prompt_name} v{v2}"))
+
+    def diff_tokens(
+        self,
+        prompt_name: str,
+        v1: int,
+        v2: int,
+        granularity: str = "word",
+        settings: DiffSettings | None = None,
+    ) -> TokenDiff:
+        """Diff two versions of a prompt by words, characters, tokens or lines.
+
+        Tokenized bodies are cached by content hash, so a body compared
+        with many others is decoded and tokenized once.  *settings* apply
+        as in :meth:`diff_versions`, with ``max_lines`` counting tokens.
+        Raises ``ValueError`` for an unknown *granularity*.
+        """
+        check_granularity(granularity)
+        settings = settings or DiffSettings()
         ver1 = self.get_version(prompt_name, v1)
         ver2 = self.get_version(prompt_name, v2)
-        lines1 = ver1.content.splitlines(keepends=True)
-        lines2 = ver2.content.splitlines(keepends=True)
-        diff = difflib.unified_diff(
-            lines1,
-            lines2,
-            fromfile=f"{prompt_name} v{v1}",
-            tofile=f"{prompt_name} v{v2}",
+        old = _token_cache.tokens(ver1.content_hash, granularity, lambda: ver1.content)
+        new = _token_cache.tokens(ver2.content_hash, granularity, lambda: ver2.content)
+        return diff_tokens(
+            old,
+            new,
+            granularity,
+            algorithm=settings.algorithm,
+            timeout=settings.timeout,
+            max_lines=settings.max_lines,
         )
-        return "".join(diff)
+
+    # ------------------------------------------------------------------
+    # Blame
+    # ------------------------------------------------------------------
+
+    def blame(self, prompt_name: str, version_number: int | None = None) -> list[BlameLine]:
+        """Attribute each line of a version (default: latest) to the version that added it.
+
+        Reads the line-origin map stored when the version was written (see
+        :mod:`pv.services.blame`) instead of replaying the history.
+        """
+        if version_number is None:
+            version = self.get_latest_version(prompt_name)
+        else:
+            version = self.get_version(prompt_name, version_number)
+        return self._origins.blame(version)
 
     # ------------------------------------------------------------------
     # Rollback
@@ -189,51 +660,516 @@ class PromptService:
     # Export
     # ------------------------------------------------------------------
 
-    def export_prompt(self, prompt_name: str) -> str:
-        """Export all versions of a prompt as JSON."""
-        prompt = self.get_prompt(prompt_name)
-        versions = self.list_versions(prompt_name)
-        data = {
-            "name": prompt.name,
-            "created_at": prompt.created_at.isoformat() if prompt.created_at else None,
-            "versions": [
-                {
-                    "version_number": v.version_number,
-                    "content": v.content,
-                    "content_hash": v.content_hash,
-                    "note": v.note,
-                    "tags": [t.name for t in v.tags],
-                    "created_at": v.created_at.isoformat() if v.created_at else None,
-                }
-                for v in versions
-            ],
-        }
-        return json.dumps(data, indent=2)
+    @overload
+    def export_prompt(
+        self,
+        prompt_name: str,
+        format: Literal["json", "ndjson"] = ...,
+        compress: None = ...,
+        tag: str | None = ...,
+    ) -> str: ...
+
+    @overload
+    def export_prompt(
+        self,
+        prompt_name: str,
+        format: str = ...,
+        compress: str | None = ...,
+        tag: str | None = ...,
+    ) -> str | bytes: ...
+
+    def export_prompt(
+        self,
+        prompt_name: str,
+        format: str = "json",
+        compress: str | None = None,
+        tag: str | None = None,
+    ) -> str | bytes:
+        """Export all versions of a prompt, or only the one tagged *tag*.
 
-    def export_to_file(self, prompt_name: str, path: Path) -> Path:
-        """Export prompt JSON to a file."""
-        data = self.export_prompt(prompt_name)
-        path.write_text(data, encoding="utf-8")
+        Returns text for uncompressed ``json`` and ``ndjson`` and bytes
+        otherwise; see :mod:`pv.export_formats` for the formats.
+        """
+        from pv.export_formats import is_binary
+
+        buffer = io.BytesIO()
+        self.write_export(prompt_name, buffer, format, compress, tag)
+        if is_binary(format, compress):
+            return buffer.getvalue()
+        return buffer.getvalue().decode("utf-8")
+
+    def export_to_file(
+        self,
+        prompt_name: str,
+        path: Path,
+        format: str = "json",
+        compress: str | None = None,
+        tag: str | None = None,
+    ) -> Path:
+        """Export a prompt to a file."""
+        from pv.export_formats import check_export_options
+
+        check_export_options(format, compress)
+        if tag is not None:
+            self.get_tagged_version(prompt_name, tag)
+        else:
+            self.get_prompt(prompt_name)
+        with path.open("wb") as out:
+            self.write_export(prompt_name, out, format, compress, tag)
         return path
 
+    def write_export(
+        self,
+        prompt_name: str,
+        out: IO[bytes],
+        format: str = "json",
+        compress: str | None = None,
+        tag: str | None = None,
+    ) -> None:
+        """Write the export of *prompt_name* to *out* one version at a time.
+
+        Versions are streamed from the database in chunks and through the
+        compressor, so memory does not grow with the length of the history.
+        The ``json`` format is exactly ``json.dumps(document, indent=2)``.
+        With *tag*, the document holds only the latest version carrying it.
+        """
+        from pv.export_formats import check_export_options, compressed, write_document
+
+        check_export_options(format, compress)
+        if tag is not None:
+            version = self.get_tagged_version(prompt_name, tag)
+            prompt = version.prompt
+            versions: Iterable[PromptVersion] = [version]
+        else:
+            prompt = self.get_prompt(prompt_name)
+            versions = self._stream_versions(prompt.id)
+        entries = (_export_entry(version) for version in versions)
+        with compressed(out, compress) as sink:
+            write_document(sink, _export_header(prompt), entries, format)
+
+    def _stream_versions(self, prompt_id: int) -> Iterator[PromptVersion]:
+        """Yield a prompt's versions in order, loading them in chunks."""
+        decoder = SequentialDecoder()
+        for version in self._session.scalars(
+            select(PromptVersion)
+            .options(joinedload(PromptVersion.blob), selectinload(PromptVersion.tags))
+            .where(PromptVersion.prompt_id == prompt_id)
+            .order_by(PromptVersion.version_number)
+            .execution_options(yield_per=_EXPORT_CHUNK)
+        ):
+            decoder.decode(version.blob)
+            yield version
+
+    def export_all(
+        self,
+        target: Path,
+        since: datetime.datetime | None = None,
+        workers: int = 4,
+        format: str = "json",
+        compress: str | None = None,
+    ) -> ExportStats:
+        """Export every prompt (or those changed at or after *since*) to *target*.
+
+        *target* is a directory (one ``<name>.json`` per prompt, or the
+        suffix of *format* and *compress*), a ``.zip`` or a
+        ``.tar``/``.tar.gz``/``.tgz``/``.tar.xz`` archive.  Each file holds
+        exactly what :meth:`export_prompt` returns for that prompt.
+
+        All rows are read on this thread inside one transaction, so the
+        export is a consistent snapshot; a pool of *workers* threads encodes
+        the documents and writes them.  A prompt counts as changed
+        if it or any of its versions was created at or after *since*.
+        """
+        from concurrent.futures import Future, ThreadPoolExecutor
+
+        from pv.export_formats import (
+            check_export_options,
+            compressed,
+            export_suffix,
+            write_document,
+        )
+        from pv.services.export_writers import export_filename, open_writer
+
+        check_export_options(format, compress)
+        suffix = export_suffix(format, compress)
+        since = _naive_utc(since)
+        prompts = select(Prompt).order_by(Prompt.name)
+        if since is not None:
+            prompts = prompts.where(
+                (Prompt.created_at >= since)
+                | Prompt.id.in_(
+                    select(PromptVersion.prompt_id).where(PromptVersion.created_at >= since)
+                )
+            )
+        selected = self._session.scalars(prompts).all()
+
+        writer = open_writer(target)
+        versions = 0
+        written = 0
+        # (filename, future) in prompt order.  Workers serialize, and also
+        # write when the writer allows it; otherwise this thread writes the
+        # results in order, which keeps archives reproducible.
+        pending: deque[tuple[str, Future[bytes]]] = deque()
+
+        def serialize(
+            filename: str, header: dict[str, Any], entries: list[dict[str, Any]]
+        ) -> bytes:
+            buffer = io.BytesIO()
+            with compressed(buffer, compress) as sink:
+                write_document(sink, header, entries, format)
+            data = buffer.getvalue()
+            if writer.concurrent:
+                writer.add(filename, data)
+            return data
+
+        def finish_one() -> int:
+            filename, future = pending.popleft()
+            data = future.result()
+            if not writer.concurrent:
+                writer.add(filename, data)
+            return len(data)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                for prompt, rows in self._versions_by_prompt(selected):
+                    entries = [_export_entry(version) for version in rows]
+                    versions += len(rows)
+                    filename = export_filename(prompt.name, suffix)
+                    job = pool.submit(serialize, filename, _export_header(prompt), entries)
+                    pending.append((filename, job))
+                    # Bound the documents held in memory while workers catch up.
+                    while len(pending) > 2 * workers:
+                        written += finish_one()
+                while pending:
+                    written += finish_one()
+        finally:
+            writer.close()
+        return ExportStats(prompts=len(selected), versions=versions, bytes=written)
+
+    def _versions_by_prompt(
+        self, prompts: Sequence[Prompt]
+    ) -> Iterator[tuple[Prompt, list[PromptVersion]]]:
+        """Pair each of *prompts* (sorted by name) with its versions, in one query."""
+        ids = [prompt.id for prompt in prompts]
+        rows = iter(
+            self._session.scalars(
+                select(PromptVersion)
+                .join(Prompt)
+                .options(joinedload(PromptVersion.blob), selectinload(PromptVersion.tags))
+                .where(PromptVersion.prompt_id.in_(ids))
+                .order_by(Prompt.name, PromptVersion.version_number)
+                .execution_options(yield_per=_EXPORT_CHUNK)
+            )
+        )
+        row = next(rows, None)
+        for prompt in prompts:
+            versions: list[PromptVersion] = []
+            while row is not None and row.prompt_id == prompt.id:
+                versions.append(row)
+                row = next(rows, None)
+            yield prompt, versions
+
+    def import_prompts(
+        self, stream: IO[bytes], batch_size: int = _IMPORT_BATCH, format: str = "json"
+    ) -> Iterator[ImportStats]:
+        """Import ``pv export`` documents from *stream*, one batch at a time.
+
+        The stream is decoded incrementally as *format* (gzip and zstd are
+        detected; see :mod:`pv.export_formats`) and may hold several exports
+        back to back.  Version numbers, content hashes,
+        notes, tags and timestamps are preserved; every body is checked
+        against its hash.  Versions that already exist with the same hash are
+        skipped, so re-running an import is harmless; one that exists with a
+        different hash is an error.
+
+        Rows are flushed every *batch_size* versions and the running totals
+        are yielded, so the caller can commit each batch.  Raises
+        :class:`ValueError` on malformed input; batches already yielded are
+        unaffected.
+        """
+        from pydantic import ValidationError
+
+        from pv.export_formats import check_export_options, iter_documents
+        from pv.schemas import ExportPrompt, ExportVersion
+
+        check_export_options(format, None)
+        stats = ImportStats()
+        pending: list[_NewVersion] = []
+        # Version hashes per prompt, stored or pending, so a prompt repeated
+        # later in the stream is checked against rows not yet written.
+        known: dict[int, dict[int, str]] = {}
+        for fields, raw_versions in iter_documents(stream, format):
+            try:
+                header = ExportPrompt.model_validate(fields)
+            except ValidationError as exc:
+                raise ValueError(f"Invalid export: {_describe(exc)}") from None
+            prompt_id, created = self._import_prompt(header)
+            if prompt_id not in known:
+                known[prompt_id] = dict(
+                    self._session.execute(
+                        select(PromptVersion.version_number, PromptVersion.content_hash).where(
+                            PromptVersion.prompt_id == prompt_id
+                        )
+                    ).all()
+                )
+            stored = known[prompt_id]
+            previous_hash = stored[max(stored)] if stored else None
+            stats = replace(stats, prompts=stats.prompts + created)
+
+            for raw in raw_versions:
+                try:
+                    record = ExportVersion.model_validate(raw)
+                except ValidationError as exc:
+                    raise ValueError(
+                        f"Invalid version in export of '{header.name}': {_describe(exc)}"
+                    ) from None
+                label = f"'{header.name}' v{record.version_number}"
+                if self._content_hash(record.content) != record.content_hash:
+                    raise ValueError(f"Content of {label} does not match its hash.")
+                existing = stored.get(record.version_number)
+                if existing == record.content_hash:
+                    stats = replace(stats, skipped=stats.skipped + 1)
+                    continue
+                if existing is not None:
+                    raise ValueError(f"{label} already exists with different content.")
+                stored[record.version_number] = record.content_hash
+                pending.append(
+                    _NewVersion(
+                        prompt_id,
+                        record.version_number,
+                        record.content,
+                        previous_hash,
+                        record.note,
+                        record.tags,
+                        _naive_utc(record.created_at),
+                    )
+                )
+                previous_hash = record.content_hash
+                if len(pending) >= batch_size:
+                    self._write_versions(pending)
+                    self._session.flush()
+                    stats = replace(stats, versions=stats.versions + len(pending))
+                    pending = []
+                    yield stats
+        if pending:
+            self._write_versions(pending)
+            self._session.flush()
+            stats = replace(stats, versions=stats.versions + len(pending))
+        yield stats
+
+    def _import_prompt(self, header: ExportPrompt) -> tuple[int, bool]:
+        """Return ``(id, created)`` for the exported prompt, inserting it if new."""
+        prompt_id = self._session.execute(
+            select(Prompt.id).where(Prompt.name == header.name)
+        ).scalar_one_or_none()
+        if prompt_id is not None:
+            return prompt_id, False
+        values: dict[str, Any] = {"name": header.name}
+        if header.created_at is not None:
+            values["created_at"] = _naive_utc(header.created_at)
+        return self._session.execute(
+            insert(Prompt).values(values).returning(Prompt.id)
+        ).scalar_one(), True
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def search(
+        self,
+        query: str,
+        latest_only: bool = False,
+        tags: Sequence[str] = (),
+        limit: int = 20,
+    ) -> list[SearchHit]:
+        """Full-text search over version bodies and notes, best matches first.
+
+        See :meth:`pv.services.search.SearchIndex.search` for the query syntax.
+        """
+        return self._search.search(query, latest_only=latest_only, tags=tags, limit=limit)
+
+    def grep(
+        self,
+        pattern: str,
+        ignore_case: bool = False,
+        fixed: bool = False,
+        latest_only: bool = False,
+        tags: Sequence[str] = (),
+    ) -> Iterator[GrepMatch]:
+        """Yield the lines of stored versions matching the regex *pattern*.
+
+        Candidates come from the trigram index; see
+        :meth:`pv.services.search.SearchIndex.grep`.
+        """
+        return self._search.grep(
+            pattern, ignore_case=ignore_case, fixed=fixed, latest_only=latest_only, tags=tags
+        )
+
+    def find_duplicates(self, threshold: float = 0.9) -> list[DuplicateCluster]:
+        """Return clusters of near-duplicate versions across different prompts.
+
+        See :meth:`pv.services.dupes.DuplicateFinder.clusters`.
+        """
+        return DuplicateFinder(self._session).clusters(threshold)
+
+    def find_versions(
+        self,
+        tags_all: Sequence[str] = (),
+        tags_any: Sequence[str] = (),
+        latest_only: bool = False,
+        name_prefix: str | None = None,
+    ) -> list[FoundVersion]:
+        """Return the versions carrying every tag of *tags_all* and one of *tags_any*.
+
+        *latest_only* keeps only versions that are their prompt's newest and
+        *name_prefix* only prompts whose name starts with it; results are
+        ordered by name and version.  This is a single query.  It starts
+        from the versions carrying the first tag of *tags_all* (through the
+        ``(tag_id, version_id)`` index), or else those carrying any of
+        *tags_any*, or else from the prompts, and probes the remaining tags
+        through the association table's primary key, so list the most
+        selective tag first.
+        """
+        pvt = prompt_version_tags
+        tags = (
+            select(func.group_concat(Tag.name, _TAG_SEPARATOR))
+            .select_from(pvt)
+            .join(Tag, Tag.id == pvt.c.tag_id)
+            .where(pvt.c.version_id == PromptVersion.id)
+            .scalar_subquery()
+        )
+        statement = select(
+            Prompt.name, PromptVersion.version_number, tags, PromptVersion.created_at
+        ).join(Prompt, Prompt.id == PromptVersion.prompt_id)
+
+        def carrying(names: Collection[str]) -> ColumnElement[bool]:
+            return exists().where(
+                pvt.c.version_id == PromptVersion.id,
+                pvt.c.tag_id.in_(select(Tag.id).where(Tag.name.in_(names))),
+            )
+
+        required = list(dict.fromkeys(tags_all))
+        wanted = sorted(set(tags_any))
+        driving = [required[0]] if required else wanted
+        if driving:
+            statement = statement.where(
+                PromptVersion.id.in_(
+                    select(pvt.c.version_id)
+                    .join(Tag, Tag.id == pvt.c.tag_id)
+                    .where(Tag.name.in_(driving))
+                )
+            )
+        for name in required[1:]:
+            statement = statement.where(carrying([name]))
+        if required and wanted:
+            statement = statement.where(carrying(wanted))
+        if latest_only:
+            newer = aliased(PromptVersion)
+            statement = statement.where(
+                PromptVersion.version_number
+                == select(func.max(newer.version_number))
+                .where(newer.prompt_id == PromptVersion.prompt_id)
+                .scalar_subquery()
+            )
+        if name_prefix:
+            low, high = _prefix_range(name_prefix)
+            statement = statement.where(Prompt.name >= low)
+            if high is not None:
+                statement = statement.where(Prompt.name < high)
+        statement = statement.order_by(Prompt.name, PromptVersion.version_number)
+        return [
+            FoundVersion(
+                name,
+                number,
+                tuple(sorted(names.split(_TAG_SEPARATOR))) if names else (),
+                created_at,
+            )
+            for name, number, names, created_at in self._session.execute(statement)
+        ]
+
     # ------------------------------------------------------------------
     # Tag management
     # ------------------------------------------------------------------
 
     def add_tag(self, prompt_name: str, version_number: int, tag_name: str) -> None:
         """Add a tag to a specific version."""
-        version = self.get_version(prompt_name, version_number)
-        tag = self._get_or_create_tag(tag_name)
-        if tag not in version.tags:
-            version.tags.append(tag)
-            self._session.flush()
+        self.apply_tags(prompt_name, version_number, add=[tag_name])
 
     def remove_tag(self, prompt_name: str, version_number: int, tag_name: str) -> None:
         """Remove a tag from a specific version."""
-        version = self.get_version(prompt_name, version_number)
-        tag = self._session.execute(select(Tag).where(Tag.name == tag_name)).scalar_one_or_none()
-        if tag is None:
-            raise ValueError(f"Tag '{tag_name}' not found.")
-        if tag in version.tags:
-            version.tags.remove(tag)
-            self._session.flush()
+        self.apply_tags(prompt_name, version_number, remove=[tag_name])
+
+    def apply_tags(
+        self,
+        prompt_name: str,
+        version_number: int,
+        add: Iterable[str] = (),
+        remove: Iterable[str] = (),
+    ) -> None:
+        """Add and remove tags on a version in a fixed number of statements.
+
+        A tag in both *add* and *remove* ends up removed.  Removing a tag
+        the version does not carry is a no-op; removing a tag that does not
+        exist at all raises ``ValueError`` and changes nothing.
+        """
+        version_id = self._session.execute(
+            select(PromptVersion.id)
+            .join(Prompt, Prompt.id == PromptVersion.prompt_id)
+            .where(Prompt.name == prompt_name, PromptVersion.version_number == version_number)
+        ).scalar_one_or_none()
+        if version_id is None:
+            self.get_prompt(prompt_name)
+            raise ValueError(f"Version {version_number} not found for prompt '{prompt_name}'.")
+        self._write_tags(version_id, set(add), set(remove))
+
+    def _write_tags(self, version_id: int, add: set[str], remove: set[str]) -> None:
+        """Link *add* to and unlink *remove* from a version, set-wise.
+
+        Tags are resolved before anything is written, so an unknown tag in
+        *remove* raises ``ValueError`` without creating any of *add*.
+        """
+        tag_ids = self._tag_ids(add | remove)
+        unknown = sorted(remove - add - tag_ids.keys())
+        if unknown:
+            raise ValueError(f"Tag '{unknown[0]}' not found.")
+        missing = add - tag_ids.keys()
+        if missing:
+            tag_ids.update(self._tag_ids(missing, create=missing))
+        if add:
+            self._session.execute(
+                sqlite_insert(prompt_version_tags).on_conflict_do_nothing(),
+                [{"version_id": version_id, "tag_id": tag_ids[name]} for name in sorted(add)],
+            )
+        if remove:
+            self._session.execute(
+                prompt_version_tags.delete().where(
+                    prompt_version_tags.c.version_id == version_id,
+                    prompt_version_tags.c.tag_id.in_([tag_ids[name] for name in remove]),
+                )
+            )
+        # The links were written behind the ORM's back.
+        version = self._session.identity_map.get(
+            self._session.identity_key(PromptVersion, version_id)
+        )
+        if version is not None:
+            self._session.expire(version, ["tags"])
+
+    def _tag_ids(self, names: Collection[str], create: Collection[str] = ()) -> dict[str, int]:
+        """Return ``{name: id}`` for *names*, first inserting any of *create* that are new.
+
+        The insert is one ``INSERT ... ON CONFLICT DO NOTHING``, so tags
+        created concurrently by another writer are not an error.
+        """
+        if create:
+            self._session.execute(
+                sqlite_insert(Tag.__table__).on_conflict_do_nothing(index_elements=["name"]),
+                [{"name": name} for name in sorted(create)],
+            )
+        if not names:
+            return {}
+        return {
+            name: id_
+            for name, id_ in self._session.execute(
+                select(Tag.name, Tag.id).where(Tag.name.in_(names))
+            )
+        }
@@ -0,0 +1,318 @@
+"""Full-text and substring search over version bodies and notes (SQLite FTS5)."""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any
+
+from sqlalchemy import Integer, Row, bindparam, column, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, joinedload
+
+from pv.models.prompt import Prompt, PromptVersion
+from pv.models.search import CONTENT_FTS, CONTENT_TRIGRAM, NOTE_FTS
+from pv.services.blob_store import SequentialDecoder
+
+# The regex parser is private but stable; it tells which literals a match needs.
+_sre_parser: Any = re._parser  # type: ignore[attr-defined]
+_sre: Any = re._constants  # type: ignore[attr-defined]
+_REPEATS = (_sre.MAX_REPEAT, _sre.MIN_REPEAT, _sre.POSSESSIVE_REPEAT)
+
+_INDEX_BATCH = 500
+_GREP_CHUNK = 200
+_SNIPPET_WIDTH = 60
+_OPERATORS = {"AND", "OR", "NOT", "NEAR"}
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    """One version matching a search, best first."""
+
+    name: str
+    version_number: int
+    score: float
+    snippet: str
+    field: str
+
+
+@dataclass(frozen=True)
+class GrepMatch:
+    """One line of a version matching a ``grep`` pattern.
+
+    ``spans`` are the ``(start, end)`` offsets of the matches in ``line``.
+    """
+
+    name: str
+    version_number: int
+    line_number: int
+    line: str
+    spans: tuple[tuple[int, int], ...]
+
+
+class SearchIndex:
+    """Maintains the contentless body indexes and queries them.
+
+    ``content_fts`` and ``content_trigram`` are contentless, so whoever
+    writes a version adds its body here, and removing a row needs the body
+    it was indexed with.  Notes are indexed by triggers and need nothing
+    from this class.
+    """
+
+    def __init__(self, session: Session) -> None:
+        self._session = session
+
+    def add(self, rows: Iterable[tuple[int, str]]) -> None:
+        """Index ``(version_id, content)`` pairs."""
+        self._write("INSERT INTO {table}(rowid, content) VALUES (:id, :content)", rows)
+
+    def remove(self, rows: Iterable[tuple[int, str]]) -> None:
+        """Drop ``(version_id, content)`` pairs, passing the indexed content."""
+        self._write(
+            "INSERT INTO {table}({table}, rowid, content) VALUES ('delete', :id, :content)", rows
+        )
+
+    def _write(self, template: str, rows: Iterable[tuple[int, str]]) -> None:
+        pending = iter(rows)
+        while batch := list(islice(pending, _INDEX_BATCH)):
+            params = [{"id": id_, "content": content} for id_, content in batch]
+            for table in (CONTENT_FTS, CONTENT_TRIGRAM):
+                self._session.execute(text(template.format(table=table)), params)
+
+    def search(
+        self,
+        query: str,
+        latest_only: bool = False,
+        tags: Sequence[str] = (),
+        limit: int = 20,
+    ) -> list[SearchHit]:
+        """Return the best *limit* versions matching *query*, ranked by BM25.
+
+        *query* uses FTS5 syntax (``foo AND bar``, ``"exact phrase"``,
+        ``pre*``); if it doesn't parse, its words are searched as plain
+        terms instead.  A version's score sums its body and note scores.
+        *latest_only* keeps only each prompt's newest version and *tags*
+        keeps only versions carrying all of them.  Raises ``ValueError``
+        for an empty or unusable query.
+        """
+        if not query.strip():
+            raise ValueError("Search query must not be empty.")
+        try:
+            rows = self._ranked(query, latest_only, tags, limit)
+        except OperationalError:
+            try:
+                rows = self._ranked(_quote_terms(query), latest_only, tags, limit)
+            except OperationalError:
+                raise ValueError(f"Invalid search query: {query!r}.") from None
+
+        versions = {
+            version.id: version
+            for version in self._session.execute(
+                select(PromptVersion)
+                .options(joinedload(PromptVersion.blob))
+                .where(PromptVersion.id.in_([row.id for row in rows]))
+            ).scalars()
+        }
+        pattern = _terms_pattern(query)
+        hits = []
+        for row in rows:
+            version = versions[row.id]
+            source = version.note if row.field == "note" and version.note else version.content
+            hits.append(
+                SearchHit(
+                    row.name, row.version_number, -row.score, _snippet(source, pattern), row.field
+                )
+            )
+        return hits
+
+    def _ranked(
+        self, query: str, latest_only: bool, tags: Sequence[str], limit: int
+    ) -> list[Row[Any]]:
+        # bm25() is lower-is-better, so the best versions sort first and
+        # ``field`` names whichever of body and note matched better.  Filters
+        # only look at version ids, so ranking never joins prompt_versions
+        # and just the top *limit* hits are joined for their names.
+        filters, params = _id_filters(latest_only, tags)
+        params.update(query=query, limit=limit)
+        statement = text(
+            f"WITH c(id, score) AS (SELECT rowid, bm25({CONTENT_FTS}) FROM {CONTENT_FTS}"
+            f" WHERE {CONTENT_FTS} MATCH :query),"
+            f" n(id, score) AS (SELECT rowid, bm25({NOTE_FTS}) FROM {NOTE_FTS}"
+            f" WHERE {NOTE_FTS} MATCH :query),"
+            " ranked(id, score, field) AS ("
+            " SELECT c.id, c.score + coalesce(n.score, 0),"
+            " CASE WHEN n.score < c.score THEN 'note' ELSE 'content' END"
+            " FROM c LEFT JOIN n ON n.id = c.id"
+            " UNION ALL"
+            " SELECT id, score, 'note' FROM n WHERE id NOT IN ("
+            f"SELECT rowid FROM {CONTENT_FTS} WHERE {CONTENT_FTS} MATCH :query))"
+            " SELECT r.id, p.name, v.version_number, r.score, r.field FROM ("
+            "SELECT * FROM ranked"
+            + (" WHERE " + " AND ".join(filters) if filters else "")
+            + " ORDER BY score, id LIMIT :limit) r"
+            " JOIN prompt_versions v ON v.id = r.id JOIN prompts p ON p.id = v.prompt_id"
+            " ORDER BY r.score, r.id"
+        )
+        if tags:
+            statement = statement.bindparams(bindparam("tags", expanding=True))
+        return list(self._session.execute(statement, params))
+
+    def grep(
+        self,
+        pattern: str,
+        ignore_case: bool = False,
+        fixed: bool = False,
+        latest_only: bool = False,
+        tags: Sequence[str] = (),
+    ) -> Iterator[GrepMatch]:
+        """Return an iterator over the lines of versions matching regex *pattern*.
+
+        Literal runs of three or more characters that any match must
+        contain are looked up in ``content_trigram`` first, so only versions
+        holding all of them are decoded and scanned; a pattern without such
+        literals scans every version.  *fixed* treats *pattern* as a plain
+        string.  Matches come in prompt name and version order.  Raises
+        ``ValueError`` for an invalid pattern.
+        """
+        flags = re.IGNORECASE if ignore_case else 0
+        try:
+            regex = re.compile(re.escape(pattern) if fixed else pattern, flags)
+        except re.error as exc:
+            raise ValueError(f"Invalid pattern: {exc}.") from None
+        query = trigram_query(regex)
+
+        filters, params = _id_filters(latest_only, tags)
+        if query is None:
+            source = "SELECT id FROM prompt_versions"
+        else:
+            source = (
+                f"SELECT rowid AS id FROM {CONTENT_TRIGRAM} WHERE {CONTENT_TRIGRAM} MATCH :query"
+            )
+            params["query"] = query
+        candidates = text(
+            f"SELECT id FROM ({source})" + (" WHERE " + " AND ".join(filters) if filters else "")
+        )
+        if tags:
+            candidates = candidates.bindparams(bindparam("tags", expanding=True))
+        return self._scan(regex, candidates.columns(column("id", Integer)), params)
+
+    def _scan(
+        self, regex: re.Pattern[str], candidates: Any, params: dict[str, object]
+    ) -> Iterator[GrepMatch]:
+        rows = self._session.execute(
+            select(PromptVersion, Prompt.name)
+            .join(Prompt)
+            .options(joinedload(PromptVersion.blob))
+            .where(PromptVersion.id.in_(candidates))
+            .order_by(Prompt.name, PromptVersion.version_number)
+            .execution_options(yield_per=_GREP_CHUNK),
+            params,
+        )
+        decoder = SequentialDecoder()
+        for version, name in rows:
+            content = decoder.decode(version.blob).decode("utf-8")
+            for number, line in enumerate(content.splitlines(), start=1):
+                spans = tuple(match.span() for match in regex.finditer(line))
+                if spans:
+                    yield GrepMatch(name, version.version_number, number, line, spans)
+
+
+def _id_filters(latest_only: bool, tags: Sequence[str]) -> tuple[list[str], dict[str, object]]:
+    """SQL conditions on a version ``id`` column, with their parameters."""
+    filters = []
+    params: dict[str, object] = {}
+    if latest_only:
+        filters.append(
+            "id IN (SELECT v.id FROM prompt_versions v JOIN ("
+            "SELECT prompt_id, max(version_number) AS n FROM prompt_versions"
+            " GROUP BY prompt_id) m ON m.prompt_id = v.prompt_id AND m.n = v.version_number)"
+        )
+    if tags:
+        filters.append(
+            "id IN (SELECT pvt.version_id FROM prompt_version_tags pvt"
+            " JOIN tags t ON t.id = pvt.tag_id WHERE t.name IN :tags"
+            " GROUP BY pvt.version_id HAVING count(*) = :tag_count)"
+        )
+        wanted = sorted(set(tags))
+        params.update(tags=wanted, tag_count=len(wanted))
+    return filters, params
+
+
+def trigram_query(regex: re.Pattern[str]) -> str | None:
+    """Return an FTS5 trigram query every match of *regex* satisfies.
+
+    It ANDs the literal runs of three or more characters that a match must
+    contain (ORing them across alternatives), or is ``None`` if there are
+    none and every version has to be scanned.
+    """
+    clauses = _required_literals(_sre_parser.parse(regex.pattern, regex.flags))
+    if not clauses:
+        return None
+    return " AND ".join(
+        "(" + " OR ".join(map(_fts_string, clause)) + ")"
+        if len(clause) > 1
+        else _fts_string(clause[0])
+        for clause in clauses
+    )
+
+
+def _required_literals(parsed: Any) -> list[list[str]]:
+    """Return clauses (lists of alternative literals) that a match must satisfy."""
+    clauses: list[list[str]] = []
+    run: list[str] = []
+
+    def flush() -> None:
+        if len(run) >= 3:
+            clauses.append(["".join(run)])
+        run.clear()
+
+    for op, av in parsed:
+        if op is _sre.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is _sre.SUBPATTERN:
+            clauses.extend(_required_literals(av[-1]))
+        elif op is _sre.ATOMIC_GROUP:
+            clauses.extend(_required_literals(av))
+        elif op in _REPEATS and av[0] >= 1:
+            clauses.extend(_required_literals(av[2]))
+        elif op is _sre.BRANCH:
+            # Each alternative must contribute a literal for the branch to narrow anything.
+            alternatives = [_required_literals(branch) for branch in av[1]]
+            if all(alternatives):
+                clauses.append([literal for branch in alternatives for literal in branch[0]])
+    flush()
+    return clauses
+
+
+def _fts_string(literal: str) -> str:
+    return '"' + literal.replace('"', '""') + '"'
+
+
+def _quote_terms(query: str) -> str:
+    """Turn *query* into plain terms: every word double-quoted, FTS5-escaped."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+def query_terms(query: str) -> list[str]:
+    """Return the words of *query*, without FTS5 operators and punctuation."""
+    return [word for word in re.findall(r"\w+", query) if word not in _OPERATORS]
+
+
+def _terms_pattern(query: str) -> re.Pattern[str] | None:
+    words = query_terms(query)
+    if not words:
+        return None
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + ")", re.IGNORECASE)
+
+
+def _snippet(source: str, pattern: re.Pattern[str] | None) -> str:
+    """Return a one-line excerpt of *source* around the first match of *pattern*."""
+    match = pattern.search(source) if pattern else None
+    start = max(match.start() - _SNIPPET_WIDTH, 0) if match else 0
+    end = min(start + 2 * _SNIPPET_WIDTH, len(source))
+    snippet = " ".join(source[start:end].split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(source) else "")
@@ -3,8 +3,13 @@
 from __future__ import annotations
 
 import json
+import os
+import sqlite3
+import subprocess
+import sys
 from pathlib import Path
 
+import pytest
 from typer.testing import CliRunner, Result
 
 from pv.cli import app
@@ -78,6 +83,60 @@ class TestAdd:
         result = _invoke("add", "p", db=db)
         assert result.exit_code == 1
 
+    def test_add_waits_for_another_writer(self, tmp_path: Path) -> None:
+        import threading
+
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        holder = sqlite3.connect(db, isolation_level=None, check_same_thread=False)
+        holder.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.2, holder.commit).start()
+        result = _invoke("add", "p", "--content", "x", db=db)
+        holder.close()
+        assert result.exit_code == 0
+        assert "took the write lock after" in result.output
+
+    def test_add_gives_up_on_a_held_lock(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        monkeypatch.setenv("PV_WRITE_TIMEOUT", "0.1")
+        holder = sqlite3.connect(db, isolation_level=None)
+        holder.execute("BEGIN IMMEDIATE")
+        try:
+            result = _invoke("add", "p", "--content", "x", db=db)
+        finally:
+            holder.close()
+        assert result.exit_code == 1
+        assert "locked by another writer" in result.output
+
+
+class TestAddMany:
+    def test_from_file(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        src = tmp_path / "batch.jsonl"
+        src.write_text(
+            '{"name": "p", "content": "v1"}\n{"name": "p", "content": "v2", "tags": ["prod"]}\n'
+        )
+        result = _invoke("add-many", str(src), "--json", db=db)
+        assert result.exit_code == 0
+        rows = [json.loads(line) for line in result.output.splitlines()]
+        assert [row["version_number"] for row in rows] == [1, 2]
+        shown = _invoke("show", "p", "--json", db=db)
+        assert json.loads(shown.output)["content"] == "v2"
+
+    def test_from_stdin_with_failures(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        result = runner.invoke(
+            app,
+            ["add-many", "--db", str(db)],
+            input='{"name": "p", "content": "ok"}\n{"name": "p"}\n',
+        )
+        assert result.exit_code == 1
+        assert "1 added, 1 failed" in result.output
+        assert _invoke("show", "p", db=db).exit_code == 0
+
 
 class TestList:
     def test_list_empty(self, tmp_path: Path) -> None:
@@ -103,6 +162,8 @@ class TestList:
         data = json.loads(result.output)
         assert len(data) == 1
         assert data[0]["name"] == "p1"
+        assert data[0]["versions"] == 1
+        assert data[0]["latest"] == 1
 
 
 class TestLog:
@@ -151,6 +212,16 @@ class TestShow:
         data = json.loads(result.output)
         assert data["content"] == "content"
 
+    def test_show_tag(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("add", "p", "-c", "v1-text", "--tag", "prod", db=db)
+        _invoke("add", "p", "-c", "v2-text", db=db)
+        result = _invoke("show", "p", "--tag", "prod", db=db)
+        assert result.exit_code == 0
+        assert "v1-text" in result.output
+        assert _invoke("show", "p", "--tag", "staging", db=db).exit_code == 1
+        assert _invoke("show", "p", "--tag", "prod", "--version", "1", db=db).exit_code == 1
+
 
 class TestDiff:
     def test_diff(self, tmp_path: Path) -> None:
@@ -161,6 +232,173 @@ class TestDiff:
         result = _invoke("diff", "p", "1", "2", db=db)
         assert result.exit_code == 0
 
+    def test_diff_by_tag(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("add", "p", "-c", "line1\nline2\n", "--tag", "prod", db=db)
+        _invoke("add", "p", "-c", "line1\nchanged\n", "--tag", "staging", db=db)
+        result = _invoke("diff", "p", "prod", "staging", "--json", db=db)
+        assert result.exit_code == 0
+        data = json.loads(result.output)
+        assert (data["from"], data["to"]) == (1, 2)
+        result = _invoke("diff", "p", "prod", "2", db=db)
+        assert result.exit_code == 0
+        assert "+changed" in result.output
+        assert _invoke("diff", "p", "prod", "canary", db=db).exit_code == 1
+
+    def test_diff_algorithm(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        _invoke("add", "p", "-c", "line1\nline2\n", db=db)
+        _invoke("add", "p", "-c", "line1\nchanged\n", db=db)
+        result = _invoke("diff", "p", "1", "2", "--algorithm", "patience", db=db)
+        assert result.exit_code == 0
+        assert "+changed" in result.output
+        result = _invoke("diff", "p", "1", "2", "--algorithm", "bogus", db=db)
+        assert result.exit_code == 1
+        assert "Unknown diff algorithm" in result.output
+
+    def test_diff_cache_survives_and_readonly_skips_it(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        _invoke("add", "p", "-c", "line1\nline2\n", db=db)
+        _invoke("add", "p", "-c", "line1\nchanged\n", db=db)
+        first = _invoke("diff", "p", "1", "2", "-U", "1", db=db)
+        with sqlite3.connect(db) as conn:
+            assert conn.execute("SELECT context FROM diff_cache").fetchall() == [(1,)]
+        monkeypatch.setenv("PV_DB_PROFILE", "readonly")
+        assert _invoke("diff", "p", "1", "2", "-U", "1", db=db).output == first.output
+        result = _invoke("diff", "p", "1", "2", db=db)
+        assert result.exit_code == 0
+        assert "+changed" in result.output
+        with sqlite3.connect(db) as conn:
+            assert conn.execute("SELECT count(*) FROM diff_cache").fetchone() == (1,)
+
+    def test_diff_granularity(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        _invoke("add", "p", "-c", "Be brief and polite.\n", db=db)
+        _invoke("add", "p", "-c", "Be thorough and polite.\n", db=db)
+        result = _invoke("diff", "p", "1", "2", "--granularity", "word", db=db)
+        assert result.exit_code == 0
+        assert "Be briefthorough and polite." in result.output
+        result = _invoke("diff", "p", "1", "2", "-g", "char", "--json", db=db)
+        assert result.exit_code == 0
+        data = json.loads(result.output)
+        assert data["granularity"] == "char"
+        assert "".join(op["new_text"] for op in data["opcodes"]) == "Be thorough and polite.\n"
+
+
+class TestBlame:
+    def test_blame(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        _invoke("add", "p", "-c", "intro\nold rule\n", db=db)
+        _invoke("add", "p", "-c", "intro\nnew rule\n", db=db)
+        result = _invoke("blame", "p", db=db)
+        assert result.exit_code == 0
+        first, second = result.output.splitlines()
+        assert first.startswith("v1 ") and first.endswith("1 intro")
+        assert second.startswith("v2 ") and second.endswith("2 new rule")
+        result = _invoke("blame", "p", "-v", "1", "--json", db=db)
+        data = json.loads(result.output)
+        assert [(line["version"], line["line"]) for line in data] == [
+            (1, "intro"),
+            (1, "old rule"),
+        ]
+
+    def test_blame_missing_prompt(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        result = _invoke("blame", "nope", db=db)
+        assert result.exit_code == 1
+
+
+class TestFind:
+    def test_find(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("add", "p", "-c", "v1", "--tag", "prod", "--tag", "eu", db=db)
+        _invoke("add", "p", "-c", "v2", "--tag", "prod", db=db)
+        _invoke("add", "q", "-c", "v1", "--tag", "prod", "--tag", "eu", db=db)
+        result = _invoke("find", "--tag", "prod", "--tag", "eu", "--json", db=db)
+        assert result.exit_code == 0
+        data = json.loads(result.output)
+        assert [(d["name"], d["version"], d["tags"]) for d in data] == [
+            ("p", 1, ["eu", "prod"]),
+            ("q", 1, ["eu", "prod"]),
+        ]
+        result = _invoke("find", "--tag", "prod", "--tag", "eu", "--latest", "--json", db=db)
+        assert [d["name"] for d in json.loads(result.output)] == ["q"]
+        result = _invoke("find", "--tag", "prod", db=db)
+        assert result.exit_code == 0
+        assert "prod" in result.output
+        result = _invoke("find", "--tag", "missing", db=db)
+        assert "No matches" in result.output
+
+
+class TestSearch:
+    def test_search(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        _invoke("add", "p", "-c", "You are a helpful assistant.", db=db)
+        _invoke("add", "q", "-c", "Translate to French.", db=db)
+        result = _invoke("search", "assistant", "--json", db=db)
+        assert result.exit_code == 0
+        hits = json.loads(result.output)
+        assert [(h["name"], h["version"]) for h in hits] == [("p", 1)]
+        assert "helpful assistant" in hits[0]["snippet"]
+
+    def test_no_matches(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        result = _invoke("search", "missing", db=db)
+        assert result.exit_code == 0
+        assert "No matches" in result.output
+
+
+class TestGrep:
+    def test_grep(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        _invoke("add", "p", "-c", "Hello {{var_name}}\nsecond line", db=db)
+        result = _invoke("grep", "{{var_", "-F", db=db)
+        assert result.exit_code == 0
+        assert "p v1:1: Hello {{var_name}}" in result.output
+        result = _invoke("grep", "line$", "--json", db=db)
+        assert json.loads(result.output) == [
+            {
+                "name": "p",
+                "version": 1,
+                "line_number": 2,
+                "line": "second line",
+                "spans": [[7, 11]],
+            }
+        ]
+
+    def test_invalid_pattern(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        result = _invoke("grep", "(", db=db)
+        assert result.exit_code == 1
+        assert "Invalid pattern" in result.output
+
+
+class TestDupes:
+    def test_dupes(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        body = "Answer questions about orders, shipping and returns in under three sentences."
+        _invoke("init", db=db)
+        _invoke("add", "a", "-c", body, db=db)
+        _invoke("add", "b", "-c", body, db=db)
+        _invoke("add", "c", "-c", "Something else entirely, about cooking pasta.", db=db)
+        result = _invoke("dupes", "--json", db=db)
+        assert result.exit_code == 0
+        assert [c["prompts"] for c in json.loads(result.output)] == [["a", "b"]]
+        result = _invoke("dupes", "--threshold", "0.95", db=db)
+        assert result.exit_code == 0
+        assert "Near-duplicates" in result.output
+
 
 class TestRollback:
     def test_rollback(self, tmp_path: Path) -> None:
@@ -208,6 +446,99 @@ class TestExport:
         assert result.exit_code == 0
         assert out.exists()
 
+    def test_export_tag(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("add", "p", "-c", "hello", "--tag", "prod", db=db)
+        _invoke("add", "p", "-c", "world", db=db)
+        result = _invoke("export", "p", "--tag", "prod", db=db)
+        assert result.exit_code == 0
+        data = json.loads(result.output)
+        assert [v["content"] for v in data["versions"]] == ["hello"]
+
+    def test_stdout_is_plain_json(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("add", "p", "-c", "[bold]not markup[/bold] " + "x" * 200, db=db)
+        result = _invoke("export", "p", db=db)
+        assert result.exit_code == 0
+        data = json.loads(result.output)
+        assert data["versions"][0]["content"].startswith("[bold]not markup[/bold] xxx")
+        assert result.output == json.dumps(data, indent=2) + "\n"
+
+
+class TestMaintain:
+    def test_recompress(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        for i in range(5):
+            _invoke("add", f"p{i}", "-c", f"shared preamble line\nshared tail\n{i}\n", db=db)
+        result = _invoke("maintain", "--train-dict", "--recompress", db=db)
+        assert result.exit_code == 0
+        assert "Recompressed 5 blobs" in result.output
+        shown = _invoke("show", "p3", "--json", db=db)
+        assert json.loads(shown.output)["content"].endswith("3\n")
+
+    def test_requires_an_action(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        assert _invoke("maintain", db=db).exit_code == 1
+
+
+class TestImport:
+    def test_round_trip_between_databases(self, tmp_path: Path) -> None:
+        src, dst = tmp_path / "src.db", tmp_path / "dst.db"
+        _invoke("add", "p", "-c", "v1", "-t", "prod", db=src)
+        _invoke("add", "p", "-c", "v2", db=src)
+        out = tmp_path / "p.json"
+        _invoke("export", "p", "-o", str(out), db=src)
+
+        result = _invoke("import", str(out), db=dst)
+        assert result.exit_code == 0
+        assert "Imported 2 versions" in result.output
+        assert json.loads(out.read_text()) == json.loads(_invoke("export", "p", db=dst).output)
+
+    def test_export_all_then_import_directory(self, tmp_path: Path) -> None:
+        src, dst = tmp_path / "src.db", tmp_path / "dst.db"
+        for name in ("a", "b/c"):
+            _invoke("add", name, "-c", f"body of {name}", db=src)
+        result = _invoke("export", "--all", "-o", str(tmp_path / "backup"), db=src)
+        assert result.exit_code == 0
+        assert "Exported 2 prompts" in result.output
+
+        assert _invoke("import", str(tmp_path / "backup"), db=dst).exit_code == 0
+        listed = json.loads(_invoke("list", "--json", db=dst).output)
+        assert sorted(p["name"] for p in listed) == ["a", "b/c"]
+
+    def test_compressed_ndjson_round_trip(self, tmp_path: Path) -> None:
+        src, dst = tmp_path / "src.db", tmp_path / "dst.db"
+        _invoke("add", "p", "-c", "v1", db=src)
+        _invoke("add", "p", "-c", "v2", "-t", "prod", db=src)
+        out = tmp_path / "p.ndjson.gz"
+        result = _invoke(
+            "export", "p", "--format", "ndjson", "--compress", "gzip", "-o", str(out), db=src
+        )
+        assert result.exit_code == 0
+
+        assert _invoke("import", str(out), db=dst).exit_code == 0
+        assert _invoke("export", "p", db=dst).output == _invoke("export", "p", db=src).output
+
+    def test_export_all_with_format(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("add", "p", "-c", "v1", db=db)
+        backup = tmp_path / "backup"
+        result = _invoke("export", "--all", "--format", "ndjson", "-o", str(backup), db=db)
+        assert result.exit_code == 0
+        assert [path.name for path in backup.iterdir()] == ["p.ndjson"]
+
+    def test_export_all_requires_output(self, tmp_path: Path) -> None:
+        assert _invoke("export", "--all", db=tmp_path / "test.db").exit_code == 1
+
+    def test_reports_bad_file(self, tmp_path: Path) -> None:
+        bad = tmp_path / "bad.json"
+        bad.write_text('{"name": "p", "versions": [')
+        result = _invoke("import", str(bad), db=tmp_path / "test.db")
+        assert result.exit_code == 1
+        assert "Expecting value" in result.output
+
 
 class TestDelete:
     def test_delete_with_yes(self, tmp_path: Path) -> None:
@@ -217,3 +548,52 @@ class TestDelete:
         result = _invoke("delete", "p", "--yes", db=db)
         assert result.exit_code == 0
         assert "Deleted" in result.output or "✓" in result.output
+
+
+class TestStartup:
+    """Import-time budget, measured with ``python -X importtime``."""
+
+    # Generous enough for a cold CI runner; today's figure is roughly a third.
+    BUDGET_US = 400_000
+
+    @staticmethod
+    def _importtime(code: str) -> dict[str, int]:
+        """Run *code* in a fresh interpreter; return cumulative import time per module."""
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in sys.path if p)}
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=False,
+        )
+        assert proc.returncode == 0, proc.stderr
+        times: dict[str, int] = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = (part.strip() for part in line.split("|"))
+            if cumulative.isdigit():
+                times[name.strip()] = int(cumulative)
+        return times
+
+    def test_version_avoids_heavy_imports(self) -> None:
+        times = self._importtime(
+            "import sys; from pv.cli import app; sys.argv = ['pv', '--version']\n"
+            "try:\n    app()\nexcept SystemExit as e:\n    assert not e.code"
+        )
+        heavy = {"sqlalchemy", "alembic", "pv.database", "pv.services", "rich.console"}
+        assert heavy.isdisjoint(times)
+        assert times["pv.cli"] < self.BUDGET_US
+
+    def test_show_skips_alembic(self, tmp_path: Path) -> None:
+        db = tmp_path / "test.db"
+        _invoke("init", db=db)
+        _invoke("add", "p", "-c", "hello", db=db)
+        times = self._importtime(
+            "import sys; from pv.cli import app\n"
+            f"sys.argv = ['pv', 'show', 'p', '--db', {str(db)!r}]\n"
+            "try:\n    app()\nexcept SystemExit as e:\n    assert not e.code"
+        )
+        assert "sqlalchemy" in times
+        assert not any(name.split(".")[0] == "alembic" for name in times)
@@ -0,0 +1,47 @@
+"""Tests for the compression codecs."""
+
+from __future__ import annotations
+
+import pytest
+
+from pv.compression import check_codec, compress, decompress, train_dictionary
+
+_PREAMBLE = b'You are a helpful assistant. Always answer in JSON.\nSchema: {"a": 1}\n'
+
+
+def _samples(n: int = 200) -> list[bytes]:
+    return [_PREAMBLE + f"Task {i}: summarise document {i * 7}.\n".encode() for i in range(n)]
+
+
+class TestCodecs:
+    @pytest.mark.parametrize("codec", ["none", "zlib", "zstd"])
+    def test_round_trip(self, codec: str) -> None:
+        if codec == "zstd":
+            pytest.importorskip("zstandard")
+        data = _PREAMBLE * 20
+        assert decompress(compress(data, codec), codec) == data
+
+    def test_unknown_codec_rejected(self) -> None:
+        with pytest.raises(ValueError, match="Unknown codec"):
+            check_codec("lzma")
+
+
+class TestDictionaries:
+    def test_zlib_dictionary_shrinks_short_bodies(self) -> None:
+        samples = _samples()
+        dictionary = train_dictionary(samples, "zlib")
+        body = _PREAMBLE + b"Task 999: translate the text.\n"
+        with_dict = compress(body, "zlib", dictionary)
+        assert len(with_dict) < len(compress(body, "zlib"))
+        assert decompress(with_dict, "zlib", dictionary) == body
+
+    def test_zstd_dictionary_round_trip(self) -> None:
+        pytest.importorskip("zstandard")
+        samples = _samples(2000)
+        dictionary = train_dictionary(samples, "zstd", size=4096)
+        body = samples[5]
+        assert decompress(compress(body, "zstd", dictionary), "zstd", dictionary) == body
+
+    def test_no_repeats_rejected(self) -> None:
+        with pytest.raises(ValueError, match="no repeated content"):
+            train_dictionary([b"unique one\n", b"unique two\n"], "zlib")
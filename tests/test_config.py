@@ -0,0 +1,114 @@
+"""Tests for settings resolution."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from pv.config import (
+    DiffSettings,
+    StorageSettings,
+    WriteSettings,
+    diff_settings,
+    storage_settings,
+    write_settings,
+)
+
+
+@pytest.fixture()
+def config_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "config.toml"
+    monkeypatch.setenv("PV_CONFIG", str(path))
+    for var in (
+        "PV_STORAGE_MODE",
+        "PV_KEYFRAME_INTERVAL",
+        "PV_COMPRESSION",
+        "PV_DIFF_ALGORITHM",
+        "PV_DIFF_TIMEOUT",
+        "PV_DIFF_MAX_LINES",
+        "PV_DIFF_CACHE_SIZE",
+        "PV_WRITE_TIMEOUT",
+        "PV_RETRY_BACKOFF",
+    ):
+        monkeypatch.delenv(var, raising=False)
+    return path
+
+
+class TestStorageSettings:
+    def test_defaults_without_config(self, config_file: Path) -> None:
+        assert storage_settings() == StorageSettings()
+
+    def test_read_from_config_file(self, config_file: Path) -> None:
+        config_file.write_text('[storage]\nmode = "delta"\nkeyframe_interval = 4\n')
+        settings = storage_settings()
+        assert settings.mode == "delta"
+        assert settings.keyframe_interval == 4
+
+    def test_environment_overrides_config_file(
+        self, config_file: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        config_file.write_text('[storage]\nmode = "delta"\n')
+        monkeypatch.setenv("PV_STORAGE_MODE", "full")
+        assert storage_settings().mode == "full"
+
+    def test_invalid_values_rejected(
+        self, config_file: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("PV_KEYFRAME_INTERVAL", "often")
+        with pytest.raises(ValueError, match="must be an integer"):
+            storage_settings()
+
+    def test_malformed_config_file_rejected(self, config_file: Path) -> None:
+        config_file.write_text("[storage\n")
+        with pytest.raises(ValueError, match="Invalid config file"):
+            storage_settings()
+
+
+class TestDiffSettings:
+    def test_defaults_without_config(self, config_file: Path) -> None:
+        assert diff_settings() == DiffSettings()
+
+    def test_read_from_config_file(
+        self, config_file: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        config_file.write_text('[diff]\nalgorithm = "patience"\ntimeout = 0.5\n')
+        monkeypatch.setenv("PV_DIFF_MAX_LINES", "1000")
+        assert diff_settings() == DiffSettings("patience", 0.5, 1000)
+        monkeypatch.setenv("PV_DIFF_CACHE_SIZE", "0")
+        assert diff_settings().cache_size == 0
+
+    def test_invalid_values_rejected(
+        self, config_file: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("PV_DIFF_ALGORITHM", "quick")
+        with pytest.raises(ValueError, match="Unknown diff algorithm"):
+            diff_settings()
+        monkeypatch.setenv("PV_DIFF_ALGORITHM", "myers")
+        monkeypatch.setenv("PV_DIFF_TIMEOUT", "soon")
+        with pytest.raises(ValueError, match="must be a number"):
+            diff_settings()
+
+
+class TestWriteSettings:
+    def test_defaults_without_config(self, config_file: Path) -> None:
+        assert write_settings() == WriteSettings()
+
+    def test_read_from_config_file(
+        self, config_file: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        config_file.write_text("[database]\nwrite_timeout = 2.5\nretry_backoff = 0.01\n")
+        assert write_settings() == WriteSettings(2.5, 0.01)
+        monkeypatch.setenv("PV_WRITE_TIMEOUT", "0")
+        assert write_settings().timeout == 0
+
+    def test_invalid_values_rejected(
+        self, config_file: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("PV_WRITE_TIMEOUT", "forever")
+        with pytest.raises(ValueError, match="must be a number"):
+            write_settings()
+        monkeypatch.setenv("PV_WRITE_TIMEOUT", "1")
+        monkeypatch.setenv("PV_RETRY_BACKOFF", "0")
+        with pytest.raises(ValueError, match="must be positive"):
+            write_settings()
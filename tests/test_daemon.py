@@ -0,0 +1,166 @@
+"""Tests for ``pv daemon`` and command forwarding."""
+
+from __future__ import annotations
+
+import io
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from pv import daemon
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs Unix sockets")
+
+
+@pytest.fixture()
+def runtime(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "run"
+    monkeypatch.setenv("PV_RUNTIME_DIR", str(path))
+    monkeypatch.delenv("PV_NO_DAEMON", raising=False)
+    monkeypatch.delenv("PV_DB", raising=False)
+    return path
+
+
+@pytest.fixture()
+def running(tmp_db: Path, runtime: Path) -> Iterator[Path]:
+    """Start a daemon for *tmp_db* in a subprocess; yield the database path."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in sys.path if p)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "pv", "daemon", "--db", str(tmp_db)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    sock = daemon.socket_path(tmp_db)
+    deadline = time.monotonic() + 30
+    while not sock.exists():
+        assert proc.poll() is None, proc.stderr.read() if proc.stderr else ""
+        assert time.monotonic() < deadline, "daemon did not start"
+        time.sleep(0.05)
+    yield tmp_db
+    daemon.shutdown(tmp_db)
+    proc.wait(timeout=10)
+
+
+def _forward(capsys: pytest.CaptureFixture[str], *argv: str) -> tuple[int | None, str]:
+    code = daemon.forward(list(argv))
+    return code, capsys.readouterr().out
+
+
+def _forward_err(capsys: pytest.CaptureFixture[str], *argv: str) -> tuple[int | None, str, str]:
+    code = daemon.forward(list(argv))
+    captured = capsys.readouterr()
+    return code, captured.out, captured.err
+
+
+class TestForwarding:
+    def test_commands_served_by_daemon(
+        self, running: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        db = str(running)
+        code, out = _forward(capsys, "add", "p", "-c", "hello daemon", "--db", db)
+        assert code == 0
+        assert "v1" in out
+        code, out = _forward(capsys, "show", "p", "--db", db)
+        assert code == 0
+        assert "hello daemon" in out
+        code, out = _forward(capsys, "list", "--json", "--db", db)
+        assert code == 0
+        assert '"latest": 1' in out
+
+    def test_errors_keep_exit_codes(
+        self, running: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        code, out = _forward(capsys, "show", "missing", "--db", str(running))
+        assert code == 1
+        assert "not found" in out
+        code, out, err = _forward_err(capsys, "show", "--bogus", "--db", str(running))
+        assert code == 2
+        assert out == ""
+        assert "No such option" in err
+
+    def test_client_environment_applies(
+        self, running: Path, capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        db = str(running)
+        _forward(capsys, "add", "p", "-c", "one", "--db", db)
+        _forward(capsys, "add", "p", "-c", "two", "--db", db)
+        monkeypatch.setenv("PV_DIFF_ALGORITHM", "quick")
+        code, out = _forward(capsys, "diff", "p", "1", "2", "--db", db)
+        assert code == 1
+        assert "Unknown diff algorithm" in out
+        monkeypatch.delenv("PV_DIFF_ALGORITHM")
+        code, out = _forward(capsys, "diff", "p", "1", "2", "--db", db)
+        assert code == 0
+        assert "+two" in out
+
+    def test_other_profile_runs_directly(
+        self, running: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("PV_DB_PROFILE", "readonly")
+        assert daemon.forward(["show", "p", "--db", str(running)]) is None
+
+    def test_content_from_stdin(
+        self, running: Path, capsys: pytest.CaptureFixture[str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        db = str(running)
+        monkeypatch.setattr("sys.stdin", io.StringIO("piped body"))
+        code, _ = _forward(capsys, "add", "p", "--content=-", "--db", db)
+        assert code == 0
+        code, out = _forward(capsys, "show", "p", "--db", db)
+        assert "piped body" in out
+
+    def test_other_profile_keeps_stdin(
+        self, running: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("PV_DB_PROFILE", "readonly")
+        monkeypatch.setattr("sys.stdin", io.StringIO("piped body"))
+        assert daemon.forward(["add", "p", "-c", "-", "--db", str(running)]) is None
+        assert sys.stdin.read() == "piped body"
+
+    def test_unserved_commands_run_directly(self, running: Path) -> None:
+        assert daemon.forward(["delete", "p", "--yes", "--db", str(running)]) is None
+
+    def test_opt_out(self, running: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("PV_NO_DAEMON", "1")
+        assert daemon.forward(["show", "p", "--db", str(running)]) is None
+
+    def test_shutdown_removes_socket(self, running: Path) -> None:
+        assert daemon.shutdown(running)
+        deadline = time.monotonic() + 10
+        while daemon.socket_path(running).exists():
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+
+
+class TestWithoutDaemon:
+    def test_no_daemon_runs_directly(self, tmp_db: Path, runtime: Path) -> None:
+        assert daemon.forward(["show", "p", "--db", str(tmp_db)]) is None
+
+    def test_stale_socket_runs_directly(self, tmp_db: Path, runtime: Path) -> None:
+        daemon.socket_path(tmp_db).touch()
+        assert daemon.forward(["show", "p", "--db", str(tmp_db)]) is None
+
+    def test_stale_socket_keeps_stdin(
+        self, tmp_db: Path, runtime: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        daemon.socket_path(tmp_db).touch()
+        monkeypatch.setattr("sys.stdin", io.StringIO("piped body"))
+        assert daemon.forward(["add", "p", "-c", "-", "--db", str(tmp_db)]) is None
+        assert sys.stdin.read() == "piped body"
+
+    def test_unusable_socket_runs_directly(
+        self, tmp_db: Path, runtime: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        daemon.socket_path(tmp_db).touch()
+
+        def refuse(path: Path, request: dict[str, object]) -> dict[str, object]:
+            raise PermissionError(13, "Permission denied")
+
+        monkeypatch.setattr(daemon, "_exchange", refuse)
+        assert daemon.forward(["show", "p", "--db", str(tmp_db)]) is None
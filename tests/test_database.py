@@ -0,0 +1,257 @@
+"""Tests for engine setup and SQLite connection profiles."""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from pv.config import WriteSettings
+from pv.database import begin_write, get_engine, init_db, reset_engine
+from pv.services.prompt_service import PromptService
+
+
+@pytest.fixture(autouse=True)
+def _fresh_engine() -> Iterator[None]:
+    reset_engine()
+    yield
+    reset_engine()
+
+
+def _pragma(db: Path, name: str, profile: str | None = None) -> object:
+    with get_engine(db, profile).connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+class TestProfiles:
+    def test_safe_is_default(self, tmp_db: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.delenv("PV_DB_PROFILE", raising=False)
+        monkeypatch.setenv("PV_CONFIG", str(tmp_db.parent / "missing.toml"))
+        assert _pragma(tmp_db, "journal_mode") == "wal"
+        reset_engine()
+        assert _pragma(tmp_db, "synchronous") == 2  # FULL
+        reset_engine()
+        assert _pragma(tmp_db, "foreign_keys") == 1
+        reset_engine()
+        assert _pragma(tmp_db, "busy_timeout") == 5000
+
+    def test_fast_profile(self, tmp_db: Path) -> None:
+        assert _pragma(tmp_db, "synchronous", "fast") == 1  # NORMAL
+        reset_engine()
+        assert _pragma(tmp_db, "temp_store", "fast") == 2  # MEMORY
+        reset_engine()
+        assert _pragma(tmp_db, "cache_size", "fast") == -64000
+
+    def test_readonly_profile_rejects_writes(self, tmp_db: Path) -> None:
+        with (
+            get_engine(tmp_db, "readonly").connect() as conn,
+            pytest.raises(OperationalError, match="readonly"),
+        ):
+            conn.execute(text("CREATE TABLE t (x INTEGER)"))
+
+    def test_profile_from_environment(self, tmp_db: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setenv("PV_DB_PROFILE", "fast")
+        assert _pragma(tmp_db, "synchronous") == 1
+
+    def test_profile_from_config_file(
+        self, tmp_db: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        config = tmp_path / "config.toml"
+        config.write_text('[database]\nprofile = "fast"\n')
+        monkeypatch.delenv("PV_DB_PROFILE", raising=False)
+        monkeypatch.setenv("PV_CONFIG", str(config))
+        assert _pragma(tmp_db, "synchronous") == 1
+
+    def test_unknown_profile_rejected(self, tmp_db: Path) -> None:
+        with pytest.raises(ValueError, match="Unknown database profile"):
+            get_engine(tmp_db, "turbo")
+
+
+class TestSchemaCheck:
+    def test_schema_head_matches_migrations(self) -> None:
+        from alembic.script import ScriptDirectory
+
+        from pv.database import SCHEMA_HEAD, _alembic_cfg
+
+        script = ScriptDirectory.from_config(_alembic_cfg("sqlite://"))
+        assert script.get_current_head() == SCHEMA_HEAD
+
+    def test_init_skips_alembic_when_current(
+        self, tmp_db: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        from pv import database
+
+        database.init_db(tmp_db)
+        assert database.schema_revision(get_engine(tmp_db)) == database.SCHEMA_HEAD
+
+        def _fail(db_url: str) -> None:
+            raise AssertionError("migrations should not run")
+
+        monkeypatch.setattr(database, "_run_migrations", _fail)
+        database.init_db(tmp_db)
+
+    def test_init_migrates_outdated_database(self, tmp_db: Path) -> None:
+        from alembic import command as alembic_command
+
+        from pv import database
+
+        alembic_command.upgrade(database._alembic_cfg(f"sqlite:///{tmp_db}"), "0001")
+        assert database.schema_revision(get_engine(tmp_db)) == "0001"
+        database.init_db(tmp_db)
+        assert database.schema_revision(get_engine(tmp_db)) == database.SCHEMA_HEAD
+
+
+@pytest.fixture()
+def locked(tmp_db: Path) -> Iterator[sqlite3.Connection]:
+    """Hold *tmp_db*'s write lock from another connection until the test releases it."""
+    init_db(tmp_db)
+    reset_engine()
+    holder = sqlite3.connect(tmp_db, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    yield holder
+    if holder.in_transaction:
+        holder.execute("ROLLBACK")
+    holder.close()
+
+
+class TestBeginWrite:
+    def test_takes_lock_immediately(self, tmp_db: Path) -> None:
+        init_db(tmp_db)
+        with Session(get_engine(tmp_db)) as session:
+            assert begin_write(session) == 0
+            other = sqlite3.connect(tmp_db, timeout=0)
+            with pytest.raises(sqlite3.OperationalError, match="locked"):
+                other.execute("BEGIN IMMEDIATE")
+            other.close()
+            session.execute(text("CREATE TABLE t (x INTEGER)"))
+            session.commit()
+
+    def test_gives_up_after_retries(self, tmp_db: Path, locked: sqlite3.Connection) -> None:
+        with Session(get_engine(tmp_db)) as session:
+            with pytest.raises(ValueError, match=r"gave up after \d+ retries"):
+                begin_write(session, WriteSettings(timeout=0.1))
+            busy_timeout = session.connection().exec_driver_sql("PRAGMA busy_timeout").scalar()
+            assert busy_timeout == 5000
+
+    def test_retries_until_lock_is_released(
+        self, tmp_db: Path, locked: sqlite3.Connection
+    ) -> None:
+        release = threading.Timer(0.2, locked.execute, ["COMMIT"])
+        release.start()
+        with Session(get_engine(tmp_db)) as session:
+            assert begin_write(session) > 0
+            session.rollback()
+        release.join()
+
+    def test_open_write_transaction_is_left_alone(self, tmp_db: Path) -> None:
+        init_db(tmp_db)
+        with Session(get_engine(tmp_db)) as session:
+            session.execute(text("CREATE TABLE t (x INTEGER)"))
+            assert begin_write(session) == 0
+            session.commit()
+
+    def test_add_version_reads_number_under_lock(self, tmp_db: Path) -> None:
+        init_db(tmp_db)
+        engine = get_engine(tmp_db)
+        numbers: list[int] = []
+
+        def second_writer() -> None:
+            with Session(engine) as session:
+                numbers.append(PromptService(session).add_version("p", "two").version_number)
+                session.commit()
+
+        with Session(engine) as first:
+            PromptService(first).add_version("p", "one")
+            writer = threading.Thread(target=second_writer)
+            writer.start()
+            time.sleep(0.2)
+            first.commit()
+        writer.join()
+        assert numbers == [2]
+
+
+# Each writer adds versions of one shared prompt through the CLI, starting
+# together once every process has imported pv.
+_WRITER = """
+import json, sys, time
+from pathlib import Path
+from typer.testing import CliRunner
+from pv.cli import app
+
+db, name, count = sys.argv[1], sys.argv[2], int(sys.argv[3])
+runner = CliRunner()
+# Warm the imports and statement caches on a prompt of this writer's own.
+assert runner.invoke(app, ["add", f"warm-{name}", "-c", name, "--db", db]).exit_code == 0
+Path(db).with_name(f"ready-{name}").touch()
+while not Path(db).with_name("go").exists():
+    time.sleep(0.01)
+report = []
+for i in range(count):
+    start = time.monotonic()
+    result = runner.invoke(app, ["add", "shared", "-c", f"{name}-{i}", "--db", db])
+    report.append([result.exit_code, time.monotonic() - start, result.output])
+print(json.dumps(report))
+"""
+
+
+class TestConcurrentWriters:
+    WRITERS = 8
+    VERSIONS = 4
+    # With eight processes sharing even a single core, one `pv add` takes
+    # under 3 s and about 20 lock retries at worst; the bounds leave room for
+    # a slow runner while catching writers that starve behind the others.
+    MAX_LATENCY = WriteSettings().timeout / 5
+    MAX_RETRIES = 100
+
+    def test_no_duplicates_and_bounded_latency(self, tmp_db: Path, tmp_path: Path) -> None:
+        init_db(tmp_db)
+        reset_engine()
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(p for p in sys.path if p),
+            "PV_NO_DAEMON": "1",
+            "PV_CONFIG": str(tmp_path / "missing.toml"),
+        }
+        writers = [
+            subprocess.Popen(
+                [sys.executable, "-c", _WRITER, str(tmp_db), f"w{n}", str(self.VERSIONS)],
+                env=env,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            for n in range(self.WRITERS)
+        ]
+        deadline = time.monotonic() + 120
+        while len(list(tmp_path.glob("ready-*"))) < self.WRITERS:
+            assert time.monotonic() < deadline, "writers did not start"
+            time.sleep(0.05)
+        (tmp_path / "go").touch()
+        reports = [json.loads(proc.communicate(timeout=300)[0]) for proc in writers]
+
+        runs = [run for report in reports for run in report]
+        assert [output for code, _, output in runs if code != 0] == []
+        assert max(seconds for _, seconds, _ in runs) < self.MAX_LATENCY
+        retries = [
+            int(n) for _, _, output in runs for n in re.findall(r"after (\d+) retr", output)
+        ]
+        assert max(retries, default=0) <= self.MAX_RETRIES
+
+        conn = sqlite3.connect(tmp_db)
+        rows = conn.execute(
+            "SELECT v.version_number FROM prompt_versions v JOIN prompts p ON p.id = v.prompt_id"
+            " WHERE p.name = 'shared' ORDER BY 1"
+        ).fetchall()
+        conn.close()
+        assert [number for (number,) in rows] == list(range(1, self.WRITERS * self.VERSIONS + 1))
@@ -0,0 +1,38 @@
+"""Tests for the binary delta codec."""
+
+from __future__ import annotations
+
+import pytest
+
+from pv.delta import apply_delta, make_delta
+
+
+def _body(n: int) -> bytes:
+    return "".join(f"line {i}\n" for i in range(n)).encode()
+
+
+class TestDelta:
+    @pytest.mark.parametrize(
+        ("base", "target"),
+        [
+            (b"", b""),
+            (b"", b"new\n"),
+            (b"old\n", b""),
+            (b"a\nb\nc\n", b"a\nB\nc\n"),
+            (b"a\nb\nc", b"c\nb\na"),
+            (b"x\r\ny\r\n", b"x\r\nz\r\ny\r\n"),
+            ("héllo\n".encode(), "héllo\nwörld\n".encode()),
+        ],
+    )
+    def test_round_trip(self, base: bytes, target: bytes) -> None:
+        assert apply_delta(base, make_delta(base, target)) == target
+
+    def test_small_edit_gives_small_delta(self) -> None:
+        base = _body(2000)
+        target = base.replace(b"line 1000\n", b"changed\n")
+        assert len(make_delta(base, target)) < 64
+
+    def test_wrong_base_rejected(self) -> None:
+        delta = make_delta(b"a\n", b"a\nb\n")
+        with pytest.raises(ValueError, match="base length"):
+            apply_delta(b"other\n", delta)
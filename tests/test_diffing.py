@@ -0,0 +1,167 @@
+"""Tests for the line diff algorithms."""
+
+from __future__ import annotations
+
+import difflib
+import random
+
+import pytest
+
+from pv.diffing import (
+    ALGORITHMS,
+    GRANULARITIES,
+    TokenCache,
+    diff_opcodes,
+    diff_tokens,
+    format_hunks,
+    format_unified,
+    tokenize,
+)
+
+
+def _lcs(a: list[str], b: list[str]) -> int:
+    row = [0] * (len(b) + 1)
+    for x in a:
+        previous = 0
+        for j, y in enumerate(b, start=1):
+            previous, row[j] = row[j], previous + 1 if x == y else max(row[j], row[j - 1])
+    return row[-1]
+
+
+def _random_pairs(count: int) -> list[tuple[list[str], list[str]]]:
+    rng = random.Random(7)
+    return [
+        (
+            [rng.choice("abcd") + "\n" for _ in range(rng.randint(0, 14))],
+            [rng.choice("abcd") + "\n" for _ in range(rng.randint(0, 14))],
+        )
+        for _ in range(count)
+    ]
+
+
+class TestDiffOpcodes:
+    @pytest.mark.parametrize("algorithm", ALGORITHMS)
+    def test_opcodes_rebuild_the_new_side(self, algorithm: str) -> None:
+        for a, b in _random_pairs(300):
+            opcodes, exact = diff_opcodes(a, b, algorithm)
+            assert exact
+            rebuilt = []
+            i = j = 0
+            for tag, i1, i2, j1, j2 in opcodes:
+                assert (i1, j1) == (i, j)
+                if tag == "equal":
+                    assert a[i1:i2] == b[j1:j2]
+                rebuilt.extend(b[j1:j2])
+                i, j = i2, j2
+            assert (i, j) == (len(a), len(b))
+            assert rebuilt == b
+
+    @pytest.mark.parametrize("algorithm", ["myers", "linear"])
+    def test_myers_finds_a_shortest_edit_script(self, algorithm: str) -> None:
+        for a, b in _random_pairs(300):
+            opcodes, _ = diff_opcodes(a, b, algorithm)
+            matched = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == "equal")
+            assert matched == _lcs(a, b)
+
+    def test_unknown_algorithm_rejected(self) -> None:
+        with pytest.raises(ValueError, match="Unknown diff algorithm"):
+            diff_opcodes([], [], "bogus")
+
+    def test_size_cutoff_falls_back_to_coarse_diff(self) -> None:
+        a = ["head\n", "x\n", "x\n", "y\n", "y\n", "tail\n"]
+        b = ["head\n", "y\n", "y\n", "x\n", "x\n", "tail\n"]
+        assert diff_opcodes(a, b)[0] != diff_opcodes(a, b, max_lines=11)[0]
+        opcodes, exact = diff_opcodes(a, b, max_lines=11)
+        assert not exact
+        assert [op[0] for op in opcodes] == ["equal", "replace", "equal"]
+
+    def test_time_cutoff_falls_back_to_coarse_diff(self) -> None:
+        rng = random.Random(3)
+        a = [f"{rng.randrange(20)}\n" for _ in range(3000)]
+        b = [f"{rng.randrange(20)}\n" for _ in range(3000)]
+        opcodes, exact = diff_opcodes(a, b, "myers", timeout=0.01)
+        assert not exact
+        assert opcodes[-1][2:5:2] == (len(a), len(b))
+
+
+def unified_diff(
+    a: list[str], b: list[str], old: str = "", new: str = "", algorithm: str = "histogram"
+) -> str:
+    """Format a diff the way PromptService.diff_versions does."""
+    opcodes, _ = diff_opcodes(a, b, algorithm)
+    return "".join(format_unified(format_hunks(a, b, opcodes), old, new))
+
+
+class TestUnifiedDiff:
+    def test_difflib_algorithm_matches_difflib(self) -> None:
+        for a, b in _random_pairs(200):
+            expected = "".join(difflib.unified_diff(a, b, "old", "new"))
+            assert unified_diff(a, b, "old", "new", algorithm="difflib") == expected
+
+    @pytest.mark.parametrize("algorithm", ALGORITHMS)
+    def test_same_format_as_difflib(self, algorithm: str) -> None:
+        a = [f"line {i}\n" for i in range(20)]
+        b = [*a[:5], "inserted\n", *a[5:14], *a[15:]]
+        expected = "".join(difflib.unified_diff(a, b, "p v1", "p v2"))
+        assert unified_diff(a, b, "p v1", "p v2", algorithm=algorithm) == expected
+
+    def test_no_changes_is_empty(self) -> None:
+        assert unified_diff(["same\n"], ["same\n"]) == ""
+
+
+_PARAGRAPH = "You are a helpful assistant.  Answer in 3 sentences, don't invent facts.\nThanks!\n"
+
+
+class TestTokenize:
+    @pytest.mark.parametrize("granularity", GRANULARITIES)
+    def test_tokens_join_back_to_text(self, granularity: str) -> None:
+        assert "".join(tokenize(_PARAGRAPH, granularity)) == _PARAGRAPH
+
+    def test_word_tokens(self) -> None:
+        assert tokenize("don't stop, now", "word") == [
+            "don", "'", "t", " ", "stop", ",", " ", "now"
+        ]  # fmt: skip
+
+    def test_model_style_tokens(self) -> None:
+        assert tokenize("it's 12345 tokens!", "token") == [
+            "it",
+            "'s",
+            " 123",
+            "45",
+            " tokens",
+            "!",
+        ]
+
+    def test_unknown_granularity_rejected(self) -> None:
+        with pytest.raises(ValueError, match="Unknown diff granularity"):
+            tokenize("text", "sentence")
+
+    def test_word_diff_isolates_the_edit(self) -> None:
+        old = tokenize(_PARAGRAPH, "word")
+        new = tokenize(_PARAGRAPH.replace("3", "two"), "word")
+        changes = [c for c in diff_tokens(old, new, "word").chunks() if c[0] != "equal"]
+        assert changes == [("replace", "3", "two")]
+
+
+class TestTokenCache:
+    def test_tokenizes_each_body_once(self) -> None:
+        cache = TokenCache()
+        loads = []
+
+        def load() -> str:
+            loads.append(1)
+            return _PARAGRAPH
+
+        first = cache.tokens("h1", "word", load)
+        assert cache.tokens("h1", "word", load) is first
+        cache.tokens("h1", "char", load)
+        assert len(loads) == 2
+
+    def test_evicts_least_recently_used(self) -> None:
+        cache = TokenCache(max_tokens=10)
+        cache.tokens("a", "char", lambda: "aaaa")
+        cache.tokens("b", "char", lambda: "bbbb")
+        cache.tokens("a", "char", lambda: "aaaa")
+        cache.tokens("c", "char", lambda: "cccc")
+        assert len(cache) == 2
+        cache.tokens("a", "char", lambda: pytest.fail("evicted"))
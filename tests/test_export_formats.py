@@ -0,0 +1,89 @@
+"""Tests for export encodings and stream compression."""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+from typing import Any
+
+import pytest
+
+from pv.export_formats import (
+    check_export_options,
+    compressed,
+    export_suffix,
+    format_of,
+    iter_documents,
+    write_document,
+)
+
+HEADER = {"name": "p", "created_at": "2024-06-01T00:00:00"}
+ENTRIES = [
+    {"version_number": i, "content": f"bödy {i}\n", "tags": ["t"] if i % 2 else []}
+    for i in range(1, 4)
+]
+
+
+def _encode(format: str, compress: str | None = None, copies: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with compressed(buffer, compress) as sink:
+        for _ in range(copies):
+            write_document(sink, HEADER, iter(ENTRIES), format)
+    return buffer.getvalue()
+
+
+def _decode(data: bytes, format: str) -> list[tuple[dict[str, Any], list[Any]]]:
+    return [
+        (fields, list(versions)) for fields, versions in iter_documents(io.BytesIO(data), format)
+    ]
+
+
+class TestFormats:
+    def test_json_matches_json_dumps(self) -> None:
+        expected = json.dumps({**HEADER, "versions": ENTRIES}, indent=2)
+        assert _encode("json").decode() == expected
+
+    def test_ndjson_is_one_compact_record_per_line(self) -> None:
+        lines = _encode("ndjson").decode().splitlines()
+        assert [json.loads(line) for line in lines] == [HEADER, *ENTRIES]
+        assert ": " not in lines[0]
+
+    @pytest.mark.parametrize("format", ["json", "ndjson", "msgpack"])
+    @pytest.mark.parametrize("compress", [None, "gzip", "zstd"])
+    def test_round_trip(self, format: str, compress: str | None) -> None:
+        if format == "msgpack":
+            pytest.importorskip("msgpack")
+        if compress == "zstd":
+            pytest.importorskip("zstandard")
+        documents = _decode(_encode(format, compress, copies=2), format)
+        assert [fields["name"] for fields, _ in documents] == ["p", "p"]
+        assert all(versions == ENTRIES for _, versions in documents)
+
+    def test_gzip_is_reproducible(self) -> None:
+        data = _encode("ndjson", "gzip")
+        assert gzip.decompress(data) == _encode("ndjson")
+        assert data == _encode("ndjson", "gzip")
+
+    def test_ndjson_needs_a_prompt_record_first(self) -> None:
+        with pytest.raises(ValueError, match="expected a prompt record"):
+            _decode(b'{"version_number": 1}\n', "ndjson")
+
+    def test_ndjson_reports_bad_line(self) -> None:
+        with pytest.raises(ValueError, match="line 2"):
+            _decode(b'{"name": "p"}\n{oops\n', "ndjson")
+
+
+class TestOptions:
+    def test_unknown_options_rejected(self) -> None:
+        with pytest.raises(ValueError, match="Unknown export format"):
+            check_export_options("yaml", None)
+        with pytest.raises(ValueError, match="Unknown compression"):
+            check_export_options("json", "bz2")
+
+    def test_suffixes(self) -> None:
+        assert export_suffix("ndjson", "zstd") == ".ndjson.zst"
+        assert format_of("backup/p.ndjson.zst") == "ndjson"
+        assert format_of("p.JSONL") == "ndjson"
+        assert format_of("p.msgpack.gz") == "msgpack"
+        assert format_of("notes.txt") is None
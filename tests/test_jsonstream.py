@@ -0,0 +1,55 @@
+"""Tests for the incremental export reader."""
+
+from __future__ import annotations
+
+import io
+import json
+from typing import Any
+
+import pytest
+
+from pv.jsonstream import iter_exports
+
+DOCS: list[dict[str, Any]] = [
+    {
+        "name": "a",
+        "created_at": None,
+        "versions": [
+            {"version_number": i, "content": "héllo\n" * i, "score": 12345.5, "n": 10**i}
+            for i in range(1, 6)
+        ],
+    },
+    {"name": "b", "versions": []},
+    {"name": "c"},
+]
+
+
+def _read(text: str, chunk_size: int) -> list[tuple[dict[str, Any], list[Any]]]:
+    return [
+        (fields, list(versions))
+        for fields, versions in iter_exports(io.StringIO(text), chunk_size)
+    ]
+
+
+class TestIterExports:
+    @pytest.mark.parametrize("chunk_size", [1, 2, 7, 4096])
+    def test_reads_concatenated_exports(self, chunk_size: int) -> None:
+        text = "\n".join(json.dumps(doc, indent=2) for doc in DOCS)
+        result = _read(text, chunk_size)
+        assert [fields["name"] for fields, _ in result] == ["a", "b", "c"]
+        assert result[0][1] == DOCS[0]["versions"]
+        assert result[1][1] == result[2][1] == []
+
+    def test_unread_versions_are_skipped(self) -> None:
+        exports = iter_exports(io.StringIO(json.dumps(DOCS[0]) + json.dumps(DOCS[1])), 3)
+        _, versions = next(exports)
+        next(versions)
+        fields, _ = next(exports)
+        assert fields["name"] == "b"
+
+    @pytest.mark.parametrize(
+        "text", ['{"name": "a", "versions": [1,]}', '{"name": ', "[1]", '{"a": 1 "b": 2}']
+    )
+    def test_malformed_input_rejected(self, text: str) -> None:
+        with pytest.raises(ValueError, match="Invalid export JSON"):
+            _read(text, 2)
@@ -0,0 +1,298 @@
+"""Tests for the Alembic migrations."""
+
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+from alembic import command as alembic_command
+
+from pv.database import _alembic_cfg
+
+
+def _upgrade(db: Path, revision: str) -> None:
+    alembic_command.upgrade(_alembic_cfg(f"sqlite:///{db}"), revision)
+
+
+def _downgrade(db: Path, revision: str) -> None:
+    alembic_command.downgrade(_alembic_cfg(f"sqlite:///{db}"), revision)
+
+
+def _seed_versions(db: Path, bodies: list[str]) -> None:
+    """Insert one prompt with a version per body using the 0001 schema."""
+    import hashlib
+
+    conn = sqlite3.connect(str(db))
+    conn.execute("INSERT INTO prompts (id, name) VALUES (1, 'p')")
+    for number, body in enumerate(bodies, start=1):
+        conn.execute(
+            "INSERT INTO prompt_versions (prompt_id, version_number, content, content_hash)"
+            " VALUES (1, ?, ?, ?)",
+            (number, body, hashlib.sha256(body.encode("utf-8")).hexdigest()),
+        )
+    conn.commit()
+    conn.close()
+
+
+def test_migrations_do_not_import_the_application() -> None:
+    # Their helpers are pinned in alembic/migration_support.py instead.
+    root = Path(__file__).resolve().parent.parent / "alembic"
+    for script in [root / "migration_support.py", *(root / "versions").glob("*.py")]:
+        source = script.read_text(encoding="utf-8")
+        assert "from pv" not in source and "import pv" not in source, script.name
+
+
+class TestContentBlobs:
+    def test_upgrade_dedupes_bodies(self, tmp_path: Path) -> None:
+        db = tmp_path / "m.db"
+        _upgrade(db, "0001")
+        _seed_versions(db, ["alpha", "beta", "alpha", "alpha"])
+        _upgrade(db, "0002")
+
+        conn = sqlite3.connect(str(db))
+        assert conn.execute("SELECT count(*) FROM content_blobs").fetchone()[0] == 2
+        rows = conn.execute(
+            "SELECT v.version_number, CAST(b.data AS TEXT) FROM prompt_versions v"
+            " JOIN content_blobs b ON b.content_hash = v.content_hash"
+            " ORDER BY v.version_number"
+        ).fetchall()
+        conn.close()
+        assert rows == [(1, "alpha"), (2, "beta"), (3, "alpha"), (4, "alpha")]
+
+    def test_downgrade_restores_content(self, tmp_path: Path) -> None:
+        db = tmp_path / "m.db"
+        _upgrade(db, "0001")
+        _seed_versions(db, ["héllo", "world"])
+        _upgrade(db, "0002")
+        _downgrade(db, "0001")
+
+        conn = sqlite3.connect(str(db))
+        rows = conn.execute(
+            "SELECT content FROM prompt_versions ORDER BY version_number"
+        ).fetchall()
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+        conn.close()
+        assert rows == [("héllo",), ("world",)]
+        assert "content_blobs" not in tables
+
+
+class TestDeltaBlobs:
+    def test_downgrade_expands_deltas(self, tmp_path: Path) -> None:
+        from pv.delta import make_delta
+
+        db = tmp_path / "m.db"
+        _upgrade(db, "0001")
+        _seed_versions(db, ["base\nline\n", "base\nline\nmore\n"])
+        _upgrade(db, "0003")
+        conn = sqlite3.connect(str(db))
+        (first, second) = conn.execute(
+            "SELECT content_hash FROM prompt_versions ORDER BY version_number"
+        ).fetchall()
+        conn.execute(
+            "UPDATE content_blobs SET data = ?, base_hash = ?, depth = 1 WHERE content_hash = ?",
+            (make_delta(b"base\nline\n", b"base\nline\nmore\n"), first[0], second[0]),
+        )
+        conn.commit()
+        conn.close()
+
+        _downgrade(db, "0001")
+        conn = sqlite3.connect(str(db))
+        rows = conn.execute(
+            "SELECT content FROM prompt_versions ORDER BY version_number"
+        ).fetchall()
+        conn.close()
+        assert rows == [("base\nline\n",), ("base\nline\nmore\n",)]
+
+
+class TestBlobCompression:
+    def test_downgrade_decompresses(self, tmp_path: Path) -> None:
+        import zlib
+
+        db = tmp_path / "m.db"
+        _upgrade(db, "0001")
+        _seed_versions(db, ["squeeze me " * 20])
+        _upgrade(db, "0004")
+        conn = sqlite3.connect(str(db))
+        conn.execute(
+            "UPDATE content_blobs SET data = ?, codec = 'zlib'",
+            (zlib.compress(("squeeze me " * 20).encode()),),
+        )
+        conn.commit()
+        conn.close()
+
+        _downgrade(db, "0001")
+        conn = sqlite3.connect(str(db))
+        content = conn.execute("SELECT content FROM prompt_versions").fetchone()[0]
+        conn.close()
+        assert content == "squeeze me " * 20
+
+
+class TestUniqueVersionNumbers:
+    def test_upgrade_renumbers_duplicates(self, tmp_path: Path) -> None:
+        db = tmp_path / "m.db"
+        _upgrade(db, "0001")
+        _seed_versions(db, ["a", "b", "c"])
+        conn = sqlite3.connect(str(db))
+        conn.execute("UPDATE prompt_versions SET version_number = 2 WHERE content = 'c'")
+        conn.commit()
+        conn.close()
+
+        _upgrade(db, "0005")
+        conn = sqlite3.connect(str(db))
+        rows = conn.execute(
+            "SELECT v.version_number, CAST(b.data AS TEXT) FROM prompt_versions v"
+            " JOIN content_blobs b ON b.content_hash = v.content_hash ORDER BY v.version_number"
+        ).fetchall()
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute(
+                "INSERT INTO prompt_versions (prompt_id, version_number, content_hash)"
+                " SELECT prompt_id, 1, content_hash FROM prompt_versions LIMIT 1"
+            )
+        conn.close()
+        assert rows == [(1, "a"), (2, "b"), (3, "c")]
+
+
+class TestFullTextSearch:
+    def test_upgrade_indexes_existing_versions(self, tmp_path: Path) -> None:
+        from pv.delta import make_delta
+
+        db = tmp_path / "m.db"
+        _upgrade(db, "0001")
+        _seed_versions(db, ["You are a helpful assistant.\n", "You are a terse assistant.\n"])
+        _upgrade(db, "0005")
+        conn = sqlite3.connect(str(db))
+        conn.execute("UPDATE prompt_versions SET note = 'tighten tone' WHERE version_number = 2")
+        (first, second) = conn.execute(
+            "SELECT content_hash FROM prompt_versions ORDER BY version_number"
+        ).fetchall()
+        conn.execute(
+            "UPDATE content_blobs SET data = ?, base_hash = ?, depth = 1 WHERE content_hash = ?",
+            (
+                make_delta(b"You are a helpful assistant.\n", b"You are a terse assistant.\n"),
+                first[0],
+                second[0],
+            ),
+        )
+        conn.commit()
+        conn.close()
+
+        _upgrade(db, "0006")
+        conn = sqlite3.connect(str(db))
+
+        def matches(table: str, query: str) -> list[int]:
+            return [
+                row[0]
+                for row in conn.execute(
+                    "SELECT v.version_number FROM prompt_versions v"
+                    f" JOIN {table} f ON f.rowid = v.id WHERE {table} MATCH ?"
+                    " ORDER BY v.version_number",
+                    (query,),
+                )
+            ]
+
+        assert matches("content_fts", "assistant") == [1, 2]
+        assert matches("content_fts", "terse") == [2]
+        assert matches("note_fts", "tone") == [2]
+        conn.close()
+
+    def test_downgrade_drops_indexes(self, tmp_path: Path) -> None:
+        db = tmp_path / "m.db"
+        _upgrade(db, "0006")
+        _downgrade(db, "0005")
+        conn = sqlite3.connect(str(db))
+        names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+        conn.close()
+        assert not {n for n in names if "fts" in n}
+
+
+class TestTrigramIndex:
+    def test_upgrade_indexes_existing_versions(self, tmp_path: Path) -> None:
+        db = tmp_path / "m.db"
+        _upgrade(db, "0001")
+        _seed_versions(db, ["Hello {{var_name}}", "plain text"])
+        _upgrade(db, "0007")
+        conn = sqlite3.connect(str(db))
+        rows = conn.execute(
+            "SELECT v.version_number FROM prompt_versions v"
+            " JOIN content_trigram t ON t.rowid = v.id WHERE content_trigram MATCH '\"{{var_\"'"
+        ).fetchall()
+        conn.close()
+        assert rows == [(1,)]
+
+
+class TestMinHash:
+    def test_upgrade_signs_existing_blobs(self, tmp_path: Path) -> None:
+        db = tmp_path / "m.db"
+        _upgrade(db, "0001")
+        _seed_versions(db, ["Answer briefly and politely.", "", "Answer briefly and politely!"])
+        _upgrade(db, "0008")
+        conn = sqlite3.connect(str(db))
+        signed = conn.execute("SELECT count(*) FROM content_blobs WHERE minhash IS NOT NULL")
+        bands = conn.execute("SELECT count(DISTINCT content_hash) FROM minhash_bands")
+        assert signed.fetchone()[0] == 2
+        assert bands.fetchone()[0] == 2
+        conn.close()
+
+        _downgrade(db, "0007")
+        conn = sqlite3.connect(str(db))
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(content_blobs)")}
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+        conn.close()
+        assert "minhash" not in columns
+        assert "minhash_bands" not in tables
+
+
+class TestDiffCache:
+    def test_upgrade_and_downgrade(self, tmp_path: Path) -> None:
+        db = tmp_path / "m.db"
+        _upgrade(db, "0009")
+        conn = sqlite3.connect(str(db))
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        conn.close()
+        assert {"ix_diff_cache_hash_b", "ix_diff_cache_used_at"} <= indexes
+
+        _downgrade(db, "0008")
+        conn = sqlite3.connect(str(db))
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+        conn.close()
+        assert "diff_cache" not in tables
+
+
+class TestLineOrigins:
+    def test_upgrade_replays_histories(self, tmp_path: Path) -> None:
+        from pv.services.blame import decode_origins
+
+        db = tmp_path / "m.db"
+        _upgrade(db, "0001")
+        _seed_versions(db, ["a\nb", "a\nc", "", "a\nc\nd"])
+        _upgrade(db, "0010")
+        conn = sqlite3.connect(str(db))
+        rows = conn.execute(
+            "SELECT o.data FROM line_origins o JOIN prompt_versions v ON v.id = o.version_id"
+            " ORDER BY v.version_number"
+        ).fetchall()
+        conn.close()
+        assert [decode_origins(data) for (data,) in rows] == [[1, 1], [1, 2], [], [4, 4, 4]]
+
+        _downgrade(db, "0009")
+        conn = sqlite3.connect(str(db))
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+        conn.close()
+        assert "line_origins" not in tables
+
+
+class TestTagVersionIndex:
+    def test_upgrade_and_downgrade(self, tmp_path: Path) -> None:
+        db = tmp_path / "m.db"
+        _upgrade(db, "0011")
+        conn = sqlite3.connect(str(db))
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        conn.close()
+        assert "ix_prompt_version_tags_tag_version" in indexes
+
+        _downgrade(db, "0010")
+        conn = sqlite3.connect(str(db))
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        conn.close()
+        assert "ix_prompt_version_tags_tag_version" not in indexes
@@ -0,0 +1,46 @@
+"""Tests for MinHash signatures."""
+
+from __future__ import annotations
+
+from pv.minhash import BANDS, NUM_BINS, band_buckets, signature, similarity
+
+_BODY = (
+    "You are a support assistant for an online store. Answer questions about orders,"
+    " shipping and returns. Keep answers under three sentences and never invent policy."
+)
+
+
+class TestMinHash:
+    def test_signature_shape(self) -> None:
+        sig = signature(_BODY)
+        assert sig is not None
+        assert len(sig) == NUM_BINS * 4
+        assert len(band_buckets(sig)) == BANDS
+
+    def test_blank_body_has_no_signature(self) -> None:
+        assert signature("") is None
+        assert signature(" \n\t") is None
+
+    def test_case_and_whitespace_are_ignored(self) -> None:
+        assert signature(_BODY) == signature("  " + _BODY.upper().replace(" ", "\n "))
+
+    def test_similarity_tracks_edits(self) -> None:
+        sig = signature(_BODY)
+        small = signature(_BODY.replace("three", "four"))
+        other = signature("Summarise the article below in five bullet points for executives.")
+        assert sig is not None and small is not None and other is not None
+        assert similarity(sig, sig) == 1.0
+        assert similarity(sig, small) > 0.85
+        assert similarity(sig, other) < 0.3
+
+    def test_near_duplicates_share_a_band(self) -> None:
+        a = signature(_BODY)
+        b = signature(_BODY + " Thank you.")
+        assert a is not None and b is not None
+        assert set(enumerate(band_buckets(a))) & set(enumerate(band_buckets(b)))
+
+    def test_short_bodies(self) -> None:
+        sig = signature("hi")
+        assert sig is not None
+        assert sig == signature("HI")
+        assert sig != signature("ho")
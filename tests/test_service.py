@@ -2,12 +2,39 @@
 
 from __future__ import annotations
 
+import datetime
+import gc
+import io
 import json
+import re
 from pathlib import Path
 
 import pytest
-
-from pv.services.prompt_service import PromptService
+from sqlalchemy import event, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from pv.config import DiffSettings, StorageSettings
+from pv.diffing import ALGORITHMS
+from pv.minhash import BANDS
+from pv.models.prompt import (
+    ContentBlob,
+    Prompt,
+    PromptVersion,
+    Tag,
+    diff_cache,
+    line_origins,
+    minhash_bands,
+)
+from pv.services.blame import decode_origins, encode_origins
+from pv.services.blob_store import SequentialDecoder, content_hash
+from pv.services.dupes import DuplicateFinder
+from pv.services.prompt_service import ImportStats, PromptService
+from pv.services.search import trigram_query
+
+
+def _blob_count(service: PromptService) -> int:
+    return service._session.execute(select(func.count()).select_from(ContentBlob)).scalar_one()
 
 
 class TestCreatePrompt:
@@ -39,6 +66,26 @@ class TestAddVersion:
         assert ver.note == "Initial"
         assert {t.name for t in ver.tags} == {"prod", "v1"}
 
+    def test_does_not_load_version_history(self, service: PromptService) -> None:
+        from sqlalchemy import inspect
+
+        for body in ("a", "b", "c"):
+            ver = service.add_version("p", body)
+        assert ver.version_number == 3
+        assert "versions" in inspect(service.get_prompt("p")).unloaded
+
+    def test_duplicate_version_number_rejected(
+        self, service: PromptService, session: Session
+    ) -> None:
+        first = service.add_version("p", "v1")
+        session.add(
+            PromptVersion(
+                prompt_id=first.prompt_id, version_number=1, content_hash=first.content_hash
+            )
+        )
+        with pytest.raises(IntegrityError):
+            session.flush()
+
     def test_auto_creates_prompt(self, service: PromptService) -> None:
         ver = service.add_version("new-prompt", "some content")
         assert ver.version_number == 1
@@ -46,6 +93,177 @@ class TestAddVersion:
         assert prompt.name == "new-prompt"
 
 
+class TestAddMany:
+    def test_adds_versions_in_input_order(self, service: PromptService) -> None:
+        service.add_version("a", "one")
+        results = service.add_many(
+            [
+                json.dumps({"name": "a", "content": "two", "tags": ["prod"], "note": "n"}),
+                json.dumps({"name": "b", "content": "first"}),
+                json.dumps({"name": "a", "content": "one"}),
+            ]
+        )
+        assert [(r.name, r.version_number) for r in results] == [("a", 2), ("b", 1), ("a", 3)]
+        versions = service.list_versions("a")
+        assert [v.content for v in versions] == ["one", "two", "one"]
+        assert [t.name for t in versions[1].tags] == ["prod"]
+        assert versions[1].note == "n"
+        assert versions[0].content_hash == versions[2].content_hash
+
+    def test_reports_invalid_records(self, service: PromptService) -> None:
+        results = service.add_many(
+            [
+                '{"name": "a", "content": "x"}',
+                "",
+                "{oops",
+                {"name": "b"},
+                {"name": "c", "content": "y"},
+            ]
+        )
+        assert [r.index for r in results] == [1, 3, 4, 5]
+        assert [r.ok for r in results] == [True, False, False, True]
+        assert "Invalid JSON" in (results[1].error or "")
+        assert "content" in (results[2].error or "")
+        assert [p.name for p in service.list_prompts()] == ["a", "c"]
+
+    def test_reuses_existing_tags_and_blobs(self, service: PromptService) -> None:
+        service.add_version("a", "same", tags=["prod"])
+        service.add_many([{"name": "b", "content": "same", "tags": ["prod", "prod"]}])
+        assert _blob_count(service) == 1
+        assert [t.name for t in service.get_version("b", 1).tags] == ["prod"]
+
+    def test_delta_mode_chains_within_batch(self, session: Session) -> None:
+        service = PromptService(session, StorageSettings(mode="delta", keyframe_interval=2))
+        service.add_many(
+            [{"name": "p", "content": f"line {i}\nshared body\n" * 20} for i in range(5)]
+        )
+        depths = [v.blob.depth for v in service.list_versions("p")]
+        assert depths == [0, 1, 0, 1, 0]
+        assert service.get_version("p", 4).content == "line 3\nshared body\n" * 20
+
+
+class TestContentDedup:
+    def test_identical_bodies_share_a_blob(self, service: PromptService) -> None:
+        v1 = service.add_version("a", "same body")
+        v2 = service.add_version("b", "same body")
+        service.add_version("a", "other body")
+        assert _blob_count(service) == 2
+        assert v1.content_hash == v2.content_hash
+
+    def test_rollback_reuses_blob(self, service: PromptService) -> None:
+        service.add_version("p", "v1-body")
+        service.add_version("p", "v2-body")
+        service.rollback("p", 1)
+        assert _blob_count(service) == 2
+
+    def test_delete_prunes_unshared_blobs(self, service: PromptService) -> None:
+        service.add_version("a", "shared")
+        service.add_version("a", "only-a")
+        service.add_version("b", "shared")
+        service.delete_prompt("a")
+        hashes = set(service._session.execute(select(ContentBlob.content_hash)).scalars())
+        assert hashes == {service._content_hash("shared")}
+        assert service.get_latest_version("b").content == "shared"
+
+
+class TestDeltaStorage:
+    @pytest.fixture()
+    def delta_service(self, session: Session) -> PromptService:
+        return PromptService(session, StorageSettings(mode="delta", keyframe_interval=3))
+
+    @staticmethod
+    def _body(n: int, edit: str = "") -> str:
+        return "".join(f"shared line {i}\n" for i in range(200)) + f"tail {n} {edit}\n"
+
+    def test_versions_stored_as_deltas_with_keyframes(self, delta_service: PromptService) -> None:
+        for n in range(1, 8):
+            delta_service.add_version("p", self._body(n))
+        depths = [delta_service.get_version("p", n).blob.depth for n in range(1, 8)]
+        assert depths == [0, 1, 2, 0, 1, 2, 0]
+
+    def test_reads_reconstruct_content(
+        self, delta_service: PromptService, session: Session
+    ) -> None:
+        for n in range(1, 6):
+            delta_service.add_version("p", self._body(n))
+        session.expire_all()
+        assert delta_service.get_version("p", 5).content == self._body(5)
+        exported = json.loads(delta_service.export_prompt("p"))
+        assert [v["content"] for v in exported["versions"]] == [self._body(n) for n in range(1, 6)]
+        assert "+tail 3 \n" in delta_service.diff_versions("p", 2, 3)
+
+    def test_sequential_decoding_reuses_previous_body(
+        self, delta_service: PromptService, session: Session
+    ) -> None:
+        digests = [delta_service.add_version("p", self._body(n)).content_hash for n in range(1, 4)]
+        session.commit()
+        session.expunge_all()
+        statements: list[str] = []
+        event.listen(
+            session.get_bind(),
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        decoder = SequentialDecoder()
+        bodies = []
+        for digest in digests:
+            blob = session.get(ContentBlob, digest)
+            assert blob is not None
+            loaded = len(statements)
+            bodies.append(decoder.decode(blob).decode("utf-8"))
+            # Nothing else holds the previous blob, so any reload would show here.
+            assert len(statements) == loaded
+            del blob
+            gc.collect()
+        assert bodies == [self._body(n) for n in range(1, 4)]
+
+    def test_prune_keeps_bases_of_live_deltas(
+        self, delta_service: PromptService, session: Session
+    ) -> None:
+        delta_service.add_version("a", self._body(1))
+        delta_service.add_version("b", self._body(1))
+        delta_service.add_version("b", self._body(2))
+        delta_service.delete_prompt("a")
+        session.expire_all()
+        assert delta_service.get_version("b", 2).content == self._body(2)
+        delta_service.delete_prompt("b")
+        assert _blob_count(delta_service) == 0
+
+
+class TestCompression:
+    _BODY = "You are a careful assistant. Reply in JSON.\n" * 40
+
+    def test_bodies_compressed_transparently(
+        self, service: PromptService, session: Session
+    ) -> None:
+        ver = service.add_version("p", self._BODY)
+        assert ver.blob.codec == "zlib"
+        assert len(ver.blob.data) < ver.blob.size
+        session.expire_all()
+        assert service.get_version("p", 1).content == self._BODY
+
+    def test_incompressible_bodies_stored_plain(self, service: PromptService) -> None:
+        assert service.add_version("p", "hi").blob.codec == "none"
+
+    def test_recompress_with_trained_dictionary(
+        self, service: PromptService, session: Session
+    ) -> None:
+        from pv.services.blob_store import BlobStore
+
+        plain = PromptService(session, StorageSettings(compression="none"))
+        for i in range(50):
+            plain.add_version(f"p{i}", self._BODY + f"task {i}\n")
+        blobs = BlobStore(session)
+        dictionary = blobs.train_dictionary("zlib")
+        stats = blobs.recompress("zlib")
+        assert stats.blobs == 50
+        assert stats.bytes_after < stats.bytes_before
+        session.expire_all()
+        ver = service.get_version("p7", 1)
+        assert ver.blob.dict_id == dictionary.id
+        assert ver.content == self._BODY + "task 7\n"
+
+
 class TestGetVersion:
     def test_get_specific_version(self, service: PromptService) -> None:
         service.add_version("p", "v1-content")
@@ -64,6 +282,28 @@ class TestGetVersion:
         with pytest.raises(ValueError, match="not found"):
             service.get_version("p", 99)
 
+    def test_get_tagged_version_picks_latest_carrier(self, service: PromptService) -> None:
+        service.add_version("p", "v1", tags=["prod"])
+        service.add_version("p", "v2", tags=["prod"])
+        service.add_version("p", "v3", tags=["staging"])
+        service.add_version("q", "other", tags=["prod"])
+        assert service.get_tagged_version("p", "prod").content == "v2"
+        assert service.get_tagged_version("q", "prod").content == "other"
+
+    def test_get_tagged_version_errors(self, service: PromptService) -> None:
+        service.add_version("p", "v1", tags=["prod"])
+        service.add_version("q", "v1")
+        with pytest.raises(ValueError, match="is tagged 'prod'"):
+            service.get_tagged_version("q", "prod")
+        with pytest.raises(ValueError, match="Prompt 'missing' not found"):
+            service.get_tagged_version("missing", "prod")
+
+    def test_resolve_version(self, service: PromptService) -> None:
+        service.add_version("p", "v1", tags=["prod"])
+        service.add_version("p", "v2")
+        assert service.resolve_version("p", "2").content == "v2"
+        assert service.resolve_version("p", "prod").content == "v1"
+
 
 class TestListVersions:
     def test_list_versions(self, service: PromptService) -> None:
@@ -89,6 +329,196 @@ class TestDiff:
         result = service.diff_versions("p", 1, 2)
         assert result == ""
 
+    def test_diff_algorithms_agree_on_simple_edits(self, service: PromptService) -> None:
+        service.add_version("p", "".join(f"shot {i}\n" for i in range(50)))
+        service.add_version("p", "".join(f"shot {i}\n" for i in range(50) if i != 20))
+        results = {
+            service.diff_versions("p", 1, 2, DiffSettings(algorithm=algorithm))
+            for algorithm in ALGORITHMS
+        }
+        assert len(results) == 1
+        assert "-shot 20" in results.pop()
+
+    def test_diff_falls_back_when_too_large(self, service: PromptService) -> None:
+        service.add_version("p", "a\nb\nb\nc\nc\n")
+        service.add_version("p", "a\nc\nc\nb\nb\n")
+        result = service.diff_versions("p", 1, 2, DiffSettings(max_lines=5))
+        assert "-b\n-b\n-c\n-c\n+c\n+c\n+b\n+b\n" in result
+        # Coarse diffs are not cached.
+        assert "-b\n-b\n" not in service.diff_versions("p", 1, 2)
+
+    def test_diff_tokens_by_word(self, service: PromptService) -> None:
+        service.add_version("p", "Reply politely and briefly to every customer question.\n")
+        service.add_version("p", "Reply politely and in detail to every customer question.\n")
+        result = service.diff_tokens("p", 1, 2, "word")
+        changes = [c for c in result.chunks() if c[0] != "equal"]
+        assert changes == [("replace", "briefly", "in detail")]
+        with pytest.raises(ValueError, match="granularity"):
+            service.diff_tokens("p", 1, 2, "paragraph")
+
+
+class TestDiffCache:
+    def _entries(self, session: Session) -> list[tuple[str, int]]:
+        rows = session.execute(select(diff_cache.c.algorithm, diff_cache.c.context))
+        return sorted(tuple(row) for row in rows)
+
+    def test_repeat_diff_is_served_from_cache(
+        self, service: PromptService, session: Session, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        service.add_version("p", "line1\nline2\n")
+        service.add_version("p", "line1\nmodified\n")
+        first = service.diff_versions("p", 1, 2)
+        assert self._entries(session) == [("histogram", 3)]
+        monkeypatch.setattr(
+            "pv.services.prompt_service.diff_opcodes", lambda *a, **k: pytest.fail("recomputed")
+        )
+        session.expire_all()
+        assert service.diff_versions("p", 1, 2) == first
+
+    def test_hits_across_prompts_sharing_bodies(
+        self, service: PromptService, session: Session
+    ) -> None:
+        for name in ("a", "b"):
+            service.add_version(name, "shared v1\n")
+            service.add_version(name, "shared v2\n")
+        service.diff_versions("a", 1, 2)
+        result = service.diff_versions("b", 1, 2)
+        assert result.startswith("--- b v1\n+++ b v2\n")
+        assert len(self._entries(session)) == 1
+
+    def test_keyed_by_algorithm_and_context(
+        self, service: PromptService, session: Session
+    ) -> None:
+        service.add_version("p", "".join(f"{i}\n" for i in range(20)))
+        service.add_version("p", "".join(f"{i}\n" for i in range(20) if i != 10))
+        assert "@@ -10,3 +10,2 @@" in service.diff_versions("p", 1, 2, context=1)
+        service.diff_versions("p", 1, 2, DiffSettings(algorithm="myers"))
+        service.diff_versions("p", 1, 2, DiffSettings(cache_size=0), context=5)
+        assert self._entries(session) == [("histogram", 1), ("myers", 3)]
+
+    def test_evicts_least_recently_used_beyond_size(
+        self, service: PromptService, session: Session
+    ) -> None:
+        versions = [service.add_version("p", f"version {i}\n") for i in range(4)]
+        service.diff_versions("p", 1, 2)
+        service.diff_versions("p", 1, 3)
+        session.execute(update(diff_cache).values(used_at=diff_cache.c.used_at - 7200))
+        service.diff_versions("p", 1, 2)
+        sizes = session.execute(select(diff_cache.c.size)).scalars().all()
+        assert len(set(sizes)) == 1
+        service.diff_versions("p", 1, 4, DiffSettings(cache_size=2 * sizes[0]))
+        kept = session.execute(select(diff_cache.c.hash_b)).scalars().all()
+        assert sorted(kept) == sorted([versions[1].content_hash, versions[3].content_hash])
+
+    def test_recent_hit_writes_nothing(self, service: PromptService, session: Session) -> None:
+        service.add_version("p", "one\n")
+        service.add_version("p", "two\n")
+        service.diff_versions("p", 1, 2)
+        session.commit()
+        statements: list[str] = []
+        event.listen(
+            session.get_bind(),
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        service.diff_versions("p", 1, 2)
+        assert all(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+
+    def test_pruned_with_blobs(self, service: PromptService, session: Session) -> None:
+        service.add_version("p", "one\n")
+        service.add_version("p", "two\n")
+        service.diff_versions("p", 1, 2)
+        service.delete_prompt("p")
+        assert self._entries(session) == []
+
+
+class TestBlame:
+    @staticmethod
+    def _origins(service: PromptService, name: str, version: int | None = None) -> list[int]:
+        return [line.version_number for line in service.blame(name, version)]
+
+    def test_attributes_lines_to_introducing_version(self, service: PromptService) -> None:
+        service.add_version("p", "a\nb\nc\n")
+        service.add_version("p", "a\nB\nc\nd\n")
+        service.add_version("p", "a\nB\nd\n")
+        lines = service.blame("p")
+        assert [(b.line_number, b.version_number, b.line) for b in lines] == [
+            (1, 1, "a"),
+            (2, 2, "B"),
+            (3, 2, "d"),
+        ]
+        assert lines[0].created_at is not None
+        assert self._origins(service, "p", 1) == [1, 1, 1]
+
+    def test_maps_are_stored_when_versions_are_written(
+        self, service: PromptService, session: Session, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        service.add_version("p", "a\n")
+        service.add_many(
+            [
+                {"name": "p", "content": "a\nb\n"},
+                {"name": "q", "content": "x\n"},
+                {"name": "p", "content": "a\nb\nc\n"},
+            ]
+        )
+        assert session.execute(select(func.count()).select_from(line_origins)).scalar_one() == 4
+        monkeypatch.setattr(
+            "pv.services.blame.advance_origins", lambda *a: pytest.fail("replayed history")
+        )
+        assert self._origins(service, "p") == [1, 2, 3]
+        assert self._origins(service, "q") == [1]
+
+    def test_maps_do_not_depend_on_machine_load(
+        self, service: PromptService, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Every clock reading is a minute later than the last, as on a machine
+        # too loaded to finish any diff before a deadline.
+        clock = iter(range(0, 10**6, 60))
+        monkeypatch.setattr("pv.diffing.time.monotonic", lambda: next(clock))
+        service.add_version("p", "x\na\nb\na\nb\ny\n")
+        service.add_version("p", "z\na\nb\na\nb\nw\n")
+        assert self._origins(service, "p") == [2, 1, 1, 1, 1, 2]
+
+    def test_missing_maps_are_rebuilt(self, service: PromptService, session: Session) -> None:
+        for body in ("a\n", "a\nb\n", "c\na\nb\n", "c\na\n"):
+            service.add_version("p", body)
+        session.execute(line_origins.delete())
+        assert self._origins(service, "p", 3) == [3, 1, 2]
+        assert session.execute(select(func.count()).select_from(line_origins)).scalar_one() == 3
+        assert self._origins(service, "p") == [3, 1]
+
+    def test_rollback_reintroduces_lines(self, service: PromptService) -> None:
+        service.add_version("p", "keep\nold\n")
+        service.add_version("p", "keep\nnew\n")
+        service.rollback("p", 1)
+        assert self._origins(service, "p") == [1, 3]
+
+    def test_import_into_gap_rebuilds_later_maps(self, service: PromptService) -> None:
+        for body in ("a\n", "a\nb\n", "a\nb\nc\n"):
+            service.add_version("p", body)
+        exported = json.loads(service.export_prompt("p"))
+        service.delete_prompt("p")
+        exported["versions"] = [exported["versions"][0], exported["versions"][2]]
+        list(service.import_prompts(io.BytesIO(json.dumps(exported).encode())))
+        assert self._origins(service, "p") == [1, 3, 3]
+        exported["versions"] = [json.loads(service.export_prompt("p"))["versions"][0]]
+        exported["versions"][0].update(
+            version_number=2, content="a\nb\n", content_hash=content_hash("a\nb\n")
+        )
+        list(service.import_prompts(io.BytesIO(json.dumps(exported).encode())))
+        assert self._origins(service, "p") == [1, 2, 3]
+
+    def test_encoding_round_trips(self) -> None:
+        origins = [1, 1, 1, 4, 2, 2, 4]
+        assert len(encode_origins(origins)) == 4 * 8
+        assert decode_origins(encode_origins(origins)) == origins
+        assert decode_origins(encode_origins([])) == []
+
+    def test_unknown_version(self, service: PromptService) -> None:
+        service.add_version("p", "a")
+        with pytest.raises(ValueError, match="not found"):
+            service.blame("p", 5)
+
 
 class TestRollback:
     def test_rollback_creates_new_version(self, service: PromptService) -> None:
@@ -116,6 +546,342 @@ class TestExport:
         data = json.loads(path.read_text())
         assert data["name"] == "p"
 
+    def test_export_tagged_version(self, service: PromptService, tmp_path: Path) -> None:
+        service.add_version("p", "content-v1", tags=["prod"])
+        service.add_version("p", "content-v2")
+        result = json.loads(service.export_prompt("p", tag="prod"))
+        assert result["name"] == "p"
+        assert [v["content"] for v in result["versions"]] == ["content-v1"]
+        with pytest.raises(ValueError, match="is tagged 'staging'"):
+            service.export_to_file("p", tmp_path / "out.json", tag="staging")
+        assert not (tmp_path / "out.json").exists()
+
+    @pytest.mark.parametrize("count", [0, 1, 450])
+    def test_streamed_output_matches_json_dumps(self, service: PromptService, count: int) -> None:
+        service.create_prompt("p")
+        for i in range(count):
+            service.add_version(
+                "p", f'line "{i}"\n\ttabbed [bold]é\n', tags=["a", "b"] if i % 3 else [], note="n"
+            )
+        prompt = service.get_prompt("p")
+        expected = {
+            "name": "p",
+            "created_at": prompt.created_at.isoformat(),
+            "versions": [
+                {
+                    "version_number": v.version_number,
+                    "content": v.content,
+                    "content_hash": v.content_hash,
+                    "note": v.note,
+                    "tags": [t.name for t in v.tags],
+                    "created_at": v.created_at.isoformat(),
+                }
+                for v in service.list_versions("p")
+            ],
+        }
+        assert service.export_prompt("p") == json.dumps(expected, indent=2)
+
+    def test_text_and_binary_formats(self, service: PromptService) -> None:
+        service.add_version("p", "body")
+        ndjson = service.export_prompt("p", "ndjson")
+        assert isinstance(ndjson, str)
+        assert [json.loads(line)["name"] for line in ndjson.splitlines()[:1]] == ["p"]
+        assert isinstance(service.export_prompt("p", "json", "gzip"), bytes)
+
+    def test_export_to_file_missing_prompt(self, service: PromptService, tmp_path: Path) -> None:
+        path = tmp_path / "export.json"
+        with pytest.raises(ValueError, match="not found"):
+            service.export_to_file("missing", path)
+        assert not path.exists()
+
+
+class TestExportAll:
+    @pytest.fixture
+    def seeded(self, service: PromptService) -> PromptService:
+        service.create_prompt("empty")
+        for i in range(12):
+            service.add_version(f"team/p{i % 5}", f"body {i}", tags=["t"] if i % 2 else [])
+        return service
+
+    def test_directory(self, seeded: PromptService, tmp_path: Path) -> None:
+        stats = seeded.export_all(tmp_path / "out", workers=3)
+        assert (stats.prompts, stats.versions) == (6, 12)
+        files = sorted(path.name for path in (tmp_path / "out").iterdir())
+        assert files[0] == "empty.json"
+        assert (tmp_path / "out" / "team%2Fp3.json").read_text() == seeded.export_prompt("team/p3")
+
+    @pytest.mark.parametrize("archive", ["backup.zip", "backup.tar.gz"])
+    def test_archives_are_ordered(
+        self, seeded: PromptService, tmp_path: Path, archive: str
+    ) -> None:
+        import tarfile
+        import zipfile
+
+        path = tmp_path / archive
+        seeded.export_all(path, workers=3)
+        if archive.endswith(".zip"):
+            with zipfile.ZipFile(path) as zf:
+                names = zf.namelist()
+                body = zf.read("team%2Fp0.json").decode()
+        else:
+            with tarfile.open(path) as tf:
+                names = tf.getnames()
+                member = tf.extractfile("team%2Fp0.json")
+                assert member is not None
+                body = member.read().decode()
+        assert names == ["empty.json"] + [f"team%2Fp{i}.json" for i in range(5)]
+        assert body == seeded.export_prompt("team/p0")
+
+    def test_since(self, seeded: PromptService, session: Session, tmp_path: Path) -> None:
+        old = datetime.datetime(2020, 1, 1)
+        session.execute(update(Prompt).values(created_at=old))
+        session.execute(update(PromptVersion).values(created_at=old))
+        seeded.add_version("team/p1", "recent")
+        stats = seeded.export_all(tmp_path / "out", since=datetime.datetime(2021, 1, 1))
+        assert stats.prompts == 1
+        assert [path.name for path in (tmp_path / "out").iterdir()] == ["team%2Fp1.json"]
+
+
+class TestImport:
+    @staticmethod
+    def _import(service: PromptService, text: str, batch_size: int = 1000) -> ImportStats:
+        return list(service.import_prompts(io.BytesIO(text.encode()), batch_size))[-1]
+
+    def test_round_trips_export(self, service: PromptService, session: Session) -> None:
+        service.add_version("p", "one", tags=["prod"], note="first")
+        service.add_version("p", "two")
+        service.add_version("p", "one")
+        exported = service.export_prompt("p")
+        service.delete_prompt("p")
+
+        stats = self._import(service, exported, batch_size=2)
+        assert stats == ImportStats(prompts=1, versions=3, skipped=0)
+        assert service.export_prompt("p") == exported
+
+    def test_reimport_skips_existing_versions(self, service: PromptService) -> None:
+        service.add_version("p", "one")
+        stats = self._import(service, service.export_prompt("p"))
+        assert stats == ImportStats(prompts=0, versions=0, skipped=1)
+
+    def test_repeated_prompt_in_stream_skipped(self, service: PromptService) -> None:
+        service.add_version("p", "one")
+        service.add_version("p", "two")
+        exported = service.export_prompt("p")
+        service.delete_prompt("p")
+        stats = self._import(service, exported + exported)
+        assert stats == ImportStats(prompts=1, versions=2, skipped=2)
+        assert service.export_prompt("p") == exported
+
+    def test_yields_after_each_batch(self, service: PromptService) -> None:
+        for i in range(5):
+            service.add_version("p", f"v{i}")
+        exported = service.export_prompt("p")
+        service.delete_prompt("p")
+        progress = list(service.import_prompts(io.BytesIO(exported.encode()), batch_size=2))
+        assert [stats.versions for stats in progress] == [2, 4, 5]
+
+    def test_hash_mismatch_rejected(self, service: PromptService) -> None:
+        service.add_version("p", "one")
+        exported = service.export_prompt("p").replace('"one"', '"forged"')
+        service.delete_prompt("p")
+        with pytest.raises(ValueError, match="does not match its hash"):
+            self._import(service, exported)
+
+    def test_conflicting_version_rejected(self, service: PromptService) -> None:
+        service.add_version("p", "one")
+        exported = service.export_prompt("p")
+        service.delete_prompt("p")
+        service.add_version("p", "something else")
+        with pytest.raises(ValueError, match="already exists with different content"):
+            self._import(service, exported)
+
+    def test_invalid_version_rejected(self, service: PromptService) -> None:
+        text = json.dumps({"name": "p", "versions": [{"version_number": 0, "content": "x"}]})
+        with pytest.raises(ValueError, match="Invalid version in export of 'p'"):
+            self._import(service, text)
+
+
+class TestSearch:
+    def test_ranks_content_and_notes(self, service: PromptService) -> None:
+        service.add_version("greet", "Hello, you are a helpful assistant.")
+        service.add_version("greet", "Hello, you are a terse assistant.", note="more terse")
+        service.add_many([{"name": "summary", "content": "Summarize the text below."}])
+        hits = service.search("terse")
+        assert [(h.name, h.version_number) for h in hits] == [("greet", 2)]
+        assert "terse" in hits[0].snippet
+        assert {(h.name, h.version_number) for h in service.search("summarize OR helpful")} == {
+            ("summary", 1),
+            ("greet", 1),
+        }
+
+    def test_note_match(self, service: PromptService) -> None:
+        service.add_version("p", "body", note="ticket 42 follow-up")
+        (hit,) = service.search("ticket")
+        assert hit.field == "note"
+        assert hit.snippet == "ticket 42 follow-up"
+
+    def test_latest_only_and_tags(self, service: PromptService) -> None:
+        service.add_version("p", "alpha one", tags=["prod"])
+        service.add_version("p", "alpha two")
+        service.add_version("q", "alpha three", tags=["prod", "eu"])
+        latest = service.search("alpha", latest_only=True)
+        assert {(h.name, h.version_number) for h in latest} == {("p", 2), ("q", 1)}
+        tagged = service.search("alpha", tags=["prod"])
+        assert {(h.name, h.version_number) for h in tagged} == {("p", 1), ("q", 1)}
+        assert [h.name for h in service.search("alpha", tags=["prod", "eu"])] == ["q"]
+
+    def test_unparsable_query_falls_back_to_terms(self, service: PromptService) -> None:
+        service.add_version("p", "use the (json) output format")
+        assert [h.name for h in service.search('json "output')] == ["p"]
+
+    def test_empty_query_rejected(self, service: PromptService) -> None:
+        with pytest.raises(ValueError, match="must not be empty"):
+            service.search("  ")
+
+    def test_delete_removes_from_index(self, service: PromptService) -> None:
+        service.add_version("p", "findable text")
+        service.add_version("q", "findable too")
+        service.delete_prompt("p")
+        assert [h.name for h in service.search("findable")] == ["q"]
+
+    def test_imported_versions_are_indexed(self, service: PromptService) -> None:
+        service.add_version("p", "imported body")
+        exported = service.export_prompt("p")
+        service.delete_prompt("p")
+        list(service.import_prompts(io.BytesIO(exported.encode())))
+        assert [h.name for h in service.search("imported")] == ["p"]
+
+
+class TestGrep:
+    def test_substring_and_regex(self, service: PromptService) -> None:
+        service.add_version("greet", "Hello {{var_name}}\nBye {{other}}")
+        service.add_version("greet", "Hello {{var_user}}")
+        service.add_many([{"name": "cfg", "content": '{"key_a": 1}'}])
+        matches = list(service.grep(r"\{\{var_\w+\}\}"))
+        assert [(m.name, m.version_number, m.line_number) for m in matches] == [
+            ("greet", 1, 1),
+            ("greet", 2, 1),
+        ]
+        assert matches[0].spans == ((6, 18),)
+        assert [m.name for m in service.grep('"key_', fixed=True)] == ["cfg"]
+
+    def test_ignore_case_and_filters(self, service: PromptService) -> None:
+        service.add_version("p", "Alpha line", tags=["prod"])
+        service.add_version("p", "alpha again")
+        assert list(service.grep("ALPHA")) == []
+        assert len(list(service.grep("ALPHA", ignore_case=True))) == 2
+        assert [m.version_number for m in service.grep("alpha", latest_only=True)] == [2]
+        assert [m.version_number for m in service.grep("lpha", tags=["prod"])] == [1]
+
+    def test_pattern_without_literals_scans_everything(self, service: PromptService) -> None:
+        service.add_version("p", "no digits\nport 8080")
+        assert [m.line for m in service.grep(r"\d+")] == ["port 8080"]
+
+    def test_invalid_pattern(self, service: PromptService) -> None:
+        with pytest.raises(ValueError, match="Invalid pattern"):
+            service.grep("(")
+
+    def test_trigram_query(self) -> None:
+        assert trigram_query(re.compile(r"{{var_\w+}}")) == '"{{var_"'
+        assert trigram_query(re.compile(r"(hello|world)\s+x")) == '("hello" OR "world")'
+        assert trigram_query(re.compile(r"ab|cde")) is None
+        assert trigram_query(re.compile(r"(?:opt)?\d+")) is None
+
+
+class TestFindDuplicates:
+    BODY = (
+        "You are a support assistant for an online store. Answer questions about orders,"
+        " shipping and returns. Keep answers under three sentences and never invent policy."
+    )
+
+    def test_clusters_near_copies_across_prompts(self, service: PromptService) -> None:
+        service.add_version("support", self.BODY)
+        service.add_version("support-fork", self.BODY.replace("three", "four"))
+        service.add_many([{"name": "support-copy", "content": self.BODY}])
+        service.add_version("summary", "Summarise the article below in five bullet points.")
+        (cluster,) = service.find_duplicates(0.8)
+        assert cluster.prompts == ["support", "support-copy", "support-fork"]
+        assert cluster.versions == (("support", 1), ("support-copy", 1), ("support-fork", 1))
+        assert 0.8 <= cluster.similarity < 1.0
+
+    def test_long_history_candidates_stay_linear(
+        self, service: PromptService, session: Session
+    ) -> None:
+        versions = 300
+        service.add_many(
+            [{"name": "p", "content": f"{self.BODY} Revision {n}."} for n in range(versions)]
+        )
+        service.add_version("q", f"{self.BODY} Fork.")
+        candidates = list(DuplicateFinder(session)._similar_pairs(0.01))
+        # Pairing every version with every other would give ~45,000.
+        assert len(candidates) < versions * BANDS
+        (cluster,) = service.find_duplicates(0.8)
+        assert len(cluster.versions) == versions + 1
+
+    def test_exact_copies_and_same_prompt(self, service: PromptService) -> None:
+        service.add_version("a", self.BODY)
+        service.add_version("a", self.BODY + " Be polite.")
+        assert service.find_duplicates() == []
+        service.add_version("b", self.BODY)
+        (cluster,) = service.find_duplicates(1.0)
+        assert cluster.versions == (("a", 1), ("b", 1))
+        assert cluster.similarity == 1.0
+
+    def test_delete_prunes_bands(self, service: PromptService) -> None:
+        service.add_version("a", self.BODY)
+        service.add_version("b", self.BODY + " Thanks.")
+        service.delete_prompt("b")
+        assert service.find_duplicates(0.5) == []
+        count = select(func.count()).select_from(minhash_bands)
+        assert service._session.execute(count).scalar_one() == BANDS
+
+    def test_invalid_threshold(self, service: PromptService) -> None:
+        with pytest.raises(ValueError, match="Threshold"):
+            service.find_duplicates(0)
+
+
+class TestFindVersions:
+    @pytest.fixture()
+    def tagged(self, service: PromptService) -> PromptService:
+        service.add_version("billing/a", "a1", tags=["prod", "eu"])
+        service.add_version("billing/a", "a2", tags=["prod"])
+        service.add_version("billing/b", "b1", tags=["prod", "eu", "us"])
+        service.add_version("support", "s1", tags=["eu"])
+        service.add_version("support", "s2", tags=["prod", "eu"])
+        service.add_version("untagged", "u1")
+        return service
+
+    def test_all_tags(self, tagged: PromptService) -> None:
+        found = tagged.find_versions(tags_all=["prod", "eu"])
+        assert [(f.name, f.version_number) for f in found] == [
+            ("billing/a", 1),
+            ("billing/b", 1),
+            ("support", 2),
+        ]
+        assert found[1].tags == ("eu", "prod", "us")
+        assert tagged.find_versions(tags_all=["prod", "missing"]) == []
+
+    def test_latest_only(self, tagged: PromptService) -> None:
+        found = tagged.find_versions(tags_all=["eu", "prod"], latest_only=True)
+        assert [(f.name, f.version_number) for f in found] == [("billing/b", 1), ("support", 2)]
+        found = tagged.find_versions(latest_only=True)
+        assert [f.name for f in found] == ["billing/a", "billing/b", "support", "untagged"]
+        assert found[-1].tags == ()
+
+    def test_any_tags_and_prefix(self, tagged: PromptService) -> None:
+        found = tagged.find_versions(tags_any=["us", "missing"])
+        assert [(f.name, f.version_number) for f in found] == [("billing/b", 1)]
+        found = tagged.find_versions(tags_all=["prod"], tags_any=["eu", "us"], name_prefix="bill")
+        assert [(f.name, f.version_number) for f in found] == [("billing/a", 1), ("billing/b", 1)]
+        assert tagged.find_versions(name_prefix="billing/c") == []
+
+    def test_prefix_is_exact(self, service: PromptService) -> None:
+        for name in ["a", "a\U0010ffff", "a\U0010ffffb", "ab", "b", "\ud7ff", "\ue000"]:
+            service.add_version(name, "x")
+        found = service.find_versions(name_prefix="a\U0010ffff")
+        assert [f.name for f in found] == ["a\U0010ffff", "a\U0010ffffb"]
+        assert [f.name for f in service.find_versions(name_prefix="\ud7ff")] == ["\ud7ff"]
+
 
 class TestTagManagement:
     def test_add_tag(self, service: PromptService) -> None:
@@ -138,6 +904,34 @@ class TestTagManagement:
         assert "shared" in [t.name for t in v1.tags]
         assert "shared" in [t.name for t in v2.tags]
 
+    def test_apply_tags(self, service: PromptService) -> None:
+        service.add_version("p", "v1", tags=["old", "keep"])
+        service.apply_tags("p", 1, add=["new", "keep", "both"], remove=["old", "both"])
+        assert sorted(t.name for t in service.get_version("p", 1).tags) == ["keep", "new"]
+
+    def test_apply_tags_unknown_removal_changes_nothing(self, service: PromptService) -> None:
+        service.add_version("p", "v1")
+        with pytest.raises(ValueError, match="Tag 'nope' not found"):
+            service.apply_tags("p", 1, add=["new"], remove=["nope"])
+        with pytest.raises(ValueError, match="Version 9 not found"):
+            service.apply_tags("p", 9, add=["new"])
+        assert service.get_version("p", 1).tags == []
+        assert service._session.execute(select(Tag.name)).all() == []
+
+    def test_apply_tags_statement_count_is_flat(
+        self, service: PromptService, session: Session
+    ) -> None:
+        service.add_version("p", "v1", tags=["t0"])
+        statements: list[str] = []
+        event.listen(
+            session.get_bind(),
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+        service.apply_tags("p", 1, add=[f"t{i}" for i in range(1, 200)], remove=["t0"])
+        assert len(statements) <= 6
+        assert len(service.get_version("p", 1).tags) == 199
+
 
 class TestDeletePrompt:
     def test_delete_prompt(self, service: PromptService) -> None:
@@ -160,3 +954,18 @@ class TestListPrompts:
         service.add_version("beta", "b")
         names = [p.name for p in service.list_prompts()]
         assert names == ["alpha", "beta"]
+
+
+class TestListPromptSummaries:
+    def test_summaries(self, service: PromptService) -> None:
+        service.add_version("beta", "b1")
+        service.add_version("alpha", "a1")
+        service.add_version("alpha", "a2")
+        service.create_prompt("empty")
+        summaries = service.list_prompt_summaries()
+        assert [(s.name, s.versions, s.latest) for s in summaries] == [
+            ("alpha", 2, 2),
+            ("beta", 1, 1),
+            ("empty", 0, None),
+        ]
+        assert all(s.created_at is not None for s in summaries)